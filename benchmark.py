@@ -1,56 +1,699 @@
 #!/usr/bin/env python
 
-'''Different branches in this git repository represent
-   different approaches of speeding up pyglet's video decoding.
-   This script runs tools/profile_video.py with a number of test videos in each
-   branch and collects the results.
-   Depends on ffmpeg and awk binaries to be installed.
+'''Headless media benchmarks.
+
+Generates synthetic test clips (uncompressed AVI with a PCM audio track),
+or uses the video files given on the command line, and drives the media
+sources directly without opening a window.  Each benchmark runs in its own
+process so that peak memory use is reported per benchmark.  Results are
+printed and optionally written to a JSON file; pass a previous results file
+with ``--compare`` to see the difference between two revisions.
+
+Usage::
+
+    python benchmark.py -o new.json [--compare old.json] [video ...]
+
+Requires AVbin.
 '''
+
+import gc
+import math
 import os
+import platform
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser, Values
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def make_tone(sample_rate, channels, frequency=441):
+    '''Return one period of a 16-bit sine tone.'''
+    period = sample_rate // frequency
+    samples = [int(8000 * math.sin(2 * math.pi * i / period))
+               for i in range(period)]
+    return ''.join([struct.pack('<h', s) * channels for s in samples])
+
+def write_wav(filename, duration, sample_rate=44100, channels=2):
+    '''Write a 16-bit PCM WAV file containing a sine tone.'''
+    block_align = channels * 2
+    size = int(duration * sample_rate) * block_align
+    tone = make_tone(sample_rate, channels)
+    block = tone * (sample_rate // (len(tone) // block_align))
+
+    file = open(filename, 'wb')
+    try:
+        file.write('RIFF' + struct.pack('<I', 36 + size) + 'WAVE')
+        file.write('fmt ' + struct.pack('<IHHIIHH', 16, 1, channels,
+                                        sample_rate, sample_rate * block_align,
+                                        block_align, 16))
+        file.write('data' + struct.pack('<I', size))
+        remaining = size
+        while remaining > 0:
+            file.write(block[:remaining])
+            remaining -= len(block)
+    finally:
+        file.close()
+
+def write_avi(filename, width, height, frame_rate, duration,
+              sample_rate=44100, channels=2):
+    '''Write an uncompressed 24-bit RGB AVI with a 16-bit PCM sine tone.
+
+    The picture is a diagonal gradient that scrolls one pixel per frame.
+    '''
+    frame_count = int(duration * frame_rate)
+    pitch = (width * 3 + 3) & ~3
+    frame_size = pitch * height
+    block_align = channels * 2
+    samples_per_frame = sample_rate // frame_rate
+    audio_chunk_size = samples_per_frame * block_align
+
+    # One period of a 441 Hz tone, repeated to make each audio chunk.
+    tone = make_tone(sample_rate, channels)
+    audio_chunk = (tone * (audio_chunk_size // len(tone) + 1))[:audio_chunk_size]
+
+    gradient = ''.join([chr(x * 255 // width) + chr(x & 0xff) +
+                        chr(255 - x * 255 // width)
+                        for x in range(width)]) * 2
+
+    def frame(index):
+        rows = []
+        for y in range(height):
+            offset = ((index + y) % width) * 3
+            row = gradient[offset:offset + width * 3]
+            rows.append(row + '\0' * (pitch - len(row)))
+        return ''.join(rows)
+
+    def chunk(fourcc, data):
+        if len(data) & 1:
+            data += '\0'
+        return fourcc + struct.pack('<I', len(data)) + data
+
+    def list_chunk(fourcc, data):
+        return 'LIST' + struct.pack('<I', len(data) + 4) + fourcc + data
+
+    avih = struct.pack('<14I', 1000000 // frame_rate,
+                       frame_rate * (frame_size + audio_chunk_size), 0,
+                       0x10, frame_count, 0, 2, frame_size, width, height,
+                       0, 0, 0, 0)
+    video_strh = struct.pack('<4s4sIHHIIIIIIIIhhhh', 'vids', 'DIB ', 0, 0, 0,
+                             0, 1, frame_rate, 0, frame_count, frame_size,
+                             0xffffffff, 0, 0, 0, width, height)
+    video_strf = struct.pack('<IiiHHIIiiII', 40, width, height, 1, 24, 0,
+                             frame_size, 0, 0, 0, 0)
+    audio_strh = struct.pack('<4s4sIHHIIIIIIIIhhhh', 'auds', '\0' * 4, 0, 0,
+                             0, 0, block_align, sample_rate * block_align, 0,
+                             frame_count * samples_per_frame,
+                             audio_chunk_size, 0xffffffff, block_align,
+                             0, 0, 0, 0)
+    audio_strf = struct.pack('<HHIIHH', 1, channels, sample_rate,
+                             sample_rate * block_align, block_align, 16)
+    hdrl = list_chunk('hdrl',
+        chunk('avih', avih) +
+        list_chunk('strl', chunk('strh', video_strh) +
+                           chunk('strf', video_strf)) +
+        list_chunk('strl', chunk('strh', audio_strh) +
+                           chunk('strf', audio_strf)))
+
+    movi_size = 4 + frame_count * (16 + frame_size + audio_chunk_size)
+    riff_size = 4 + len(hdrl) + 8 + movi_size + 8 + frame_count * 32
 
-ignore_branches = "master".split()
-test_video_directory = os.path.expanduser("~/pyglet_test_videos")
-ignore_videos = ".DS_Store".split()
-framecount=50
-
-branches = os.popen("git branch").readlines()
-current_branch = [x[1:].strip() for x in branches if x[0]=="*"][0]
-branches = [x[1:].strip() for x in branches]
-branches = [x for x in branches if x not in ignore_branches]
-
-videos = os.listdir(test_video_directory)
-videos = [x for x in videos if x not in ignore_videos]
-
-def switch_branch(branch):
-     result = os.popen("git checkout %s"% branch).close()
-     if result is not None:
-         print "failed to switch to branch", branch
-         sys.exit(1)
-
-def video_info(path_to_video):
-    cmdline= r"""ffmpeg -i %s 2>&1|awk -F", |: " '/Video:/{print $3, $4}'""" % fullpath
-    p = os.popen(cmdline)
-    result = p.readlines()[0].strip()
-    exitcode = p.close()
-    if exitcode is not None:
-        raise Error()
+    file = open(filename, 'wb')
+    try:
+        file.write('RIFF' + struct.pack('<I', riff_size) + 'AVI ' + hdrl)
+        file.write('LIST' + struct.pack('<I', movi_size) + 'movi')
+        index = []
+        offset = 4
+        for i in range(frame_count):
+            file.write(chunk('00db', frame(i)))
+            index.append(struct.pack('<4sIII', '00db', 0x10, offset,
+                                     frame_size))
+            offset += 8 + frame_size
+            file.write(chunk('01wb', audio_chunk))
+            index.append(struct.pack('<4sIII', '01wb', 0x10, offset,
+                                     audio_chunk_size))
+            offset += 8 + audio_chunk_size
+        file.write(chunk('idx1', ''.join(index)))
+    finally:
+        file.close()
+
+def percentiles(values):
+    '''Return the 50th, 95th and 99th percentile and maximum of a list of
+    seconds, in milliseconds.'''
+    values = sorted(values)
+    if not values:
+        return {}
+    result = {}
+    for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+        i = min(int(len(values) * fraction), len(values) - 1)
+        result[name] = values[i] * 1000
+    result['max'] = values[-1] * 1000
+    return result
+
+def get_peak_rss():
+    '''Peak resident set size of this process, in kilobytes.'''
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024
+    return rss
+
+def get_allocations(sources):
+    '''Collect allocation counters of the media subsystem.'''
+    from pyglet.media import avbin
+
+    result = {'packet_buffers': avbin.get_packet_buffer_stats()}
+    allocations = reuses = 0
+    for source in sources:
+        pool = getattr(source, '_frame_buffers', None)
+        if pool is not None:
+            allocations += pool.allocations
+            reuses += pool.reuses
+    result['frame_buffer_allocations'] = allocations
+    result['frame_buffer_reuses'] = reuses
     return result
 
-def profile(path_to_video):
-    p = os.popen("python tools/profile_video.py --frames=%d %s" % (framecount, path_to_video))
-    result = p.readlines()[0].rstrip()
-    exitcode = p.close()
-    if exitcode is not None:
-        raise Error()
+def bench_video_decode(clip, options):
+    '''Decode every video frame of a clip as fast as possible.'''
+    from pyglet import media
+    from pyglet.media import avbin
+
+    source = avbin.AVbinSource(clip)
+    if not source.video_format:
+        return None
+
+    latencies = []
+    start = time.time()
+    while True:
+        frame_start = time.time()
+        image = source.get_next_video_frame()
+        if image is None:
+            break
+        latencies.append(time.time() - frame_start)
+        source.release_video_frame(image)
+    elapsed = time.time() - start
+
+    result = {
+        'frames': len(latencies),
+        'fps': len(latencies) / max(elapsed, 1e-9),
+        'frame_latency_ms': percentiles(latencies),
+    }
+    timings = media.get_video_timings()
+    if timings:
+        result['stages_ms'] = dict([
+            (stage, percentiles(timings.get_samples(stage)))
+            for stage in timings.get_summary()])
+    result.update(get_allocations([source]))
+    source.delete()
     return result
 
-for branch in branches:
-    switch_branch(branch)
-    for video in videos:
-        fullpath = test_video_directory + os.sep + video
-        info = video_info(fullpath)
-        result = profile(fullpath)
-        print "%-20s" % info, result
-        
-if branch != current_branch:
-    result = os.popen("git checkout %s"% current_branch).close()
\ No newline at end of file
+def bench_audio_decode(clip, options):
+    '''Decode the whole audio track of a clip.  Video frames are skipped
+    as audio is read, so that the video queue does not hold up the audio.'''
+    from pyglet.media import avbin
+
+    source = avbin.AVbinSource(clip)
+    if not source.audio_format:
+        return None
+
+    total = 0
+    latencies = []
+    start = time.time()
+    while True:
+        packet_start = time.time()
+        audio_data = source.get_audio_data(options.audio_chunk)
+        if audio_data is None:
+            break
+        latencies.append(time.time() - packet_start)
+        total += audio_data.length
+        if source.video_format:
+            source.skip_video_frames(audio_data.timestamp)
+    elapsed = time.time() - start
+
+    audio_duration = float(total) / source.audio_format.bytes_per_second
+    result = {
+        'bytes': total,
+        'bytes_per_second': total / max(elapsed, 1e-9),
+        'realtime_factor': audio_duration / max(elapsed, 1e-9),
+        'packet_latency_ms': percentiles(latencies),
+    }
+    result.update(get_allocations([source]))
+    source.delete()
+    return result
+
+def bench_render(clip, options):
+    '''Render a clip through a player to /dev/null with the offline render
+    driver, converting video frames to RGB, and report how many times
+    faster than real time it runs.'''
+    from pyglet import media
+    from pyglet.media import avbin, render
+
+    source = avbin.AVbinSource(clip)
+    driver = render.RenderDriver(os.devnull, os.devnull)
+    player = media.Player()
+    player.audio_driver = driver
+    player.queue(source)
+    player.play()
+
+    start = time.time()
+    duration = driver.render()
+    elapsed = time.time() - start
+    driver.close()
+    source.delete()
+    return {
+        'frames': driver.frames,
+        'realtime_factor': duration / max(elapsed, 1e-9),
+    }
+
+def bench_source_group_loop(clip, options):
+    '''Play a looping clip through a SourceGroup, pulling audio and video
+    as a player would, for `loops` iterations.'''
+    from pyglet import media
+    from pyglet.media import avbin
+
+    source = avbin.AVbinSource(clip)
+    group = media.SourceGroup(source.audio_format, source.video_format)
+    group.queue(source)
+    group.loop = True
+    end_time = source.duration * options.loops
+
+    frames = 0
+    latencies = []
+    start = time.time()
+    while True:
+        audio_data = group.get_audio_data(options.audio_chunk)
+        if audio_data is None:
+            break
+        if source.video_format:
+            while True:
+                timestamp = group.get_next_video_timestamp()
+                if timestamp is None or timestamp > audio_data.timestamp:
+                    break
+                frame_start = time.time()
+                image = group.get_next_video_frame()
+                latencies.append(time.time() - frame_start)
+                if image is not None:
+                    group.release_video_frame(image)
+                    frames += 1
+        if audio_data.timestamp >= end_time:
+            break
+    elapsed = time.time() - start
+
+    result = {
+        'frames': frames,
+        'fps': frames / max(elapsed, 1e-9),
+        'realtime_factor': end_time / max(elapsed, 1e-9),
+        'frame_latency_ms': percentiles(latencies),
+    }
+    result.update(get_allocations([source]))
+    source.delete()
+    return result
+
+def bench_long_audio(clip, options):
+    '''Play a long WAV file through AVbinSource into a simulated driver
+    that copies `audio_chunk` bytes per callback, consuming packets
+    partially as the PulseAudio driver does.'''
+    import ctypes
+    from pyglet.media import avbin
+
+    directory = tempfile.mkdtemp(prefix='pyglet-benchmark-')
+    try:
+        filename = os.path.join(directory, 'long.wav')
+        write_wav(filename, options.audio_duration)
+        source = avbin.AVbinSource(filename)
+        avbin._audio_buffer_pool.reset_stats()
+
+        device = ctypes.create_string_buffer(options.audio_chunk)
+        audio_format = source.audio_format
+        audio_data = None
+        total = 0
+        latencies = []
+        start = time.time()
+        while True:
+            callback_start = time.time()
+            written = 0
+            while written < options.audio_chunk:
+                if audio_data is None:
+                    audio_data = source.get_audio_data(options.audio_chunk)
+                    if audio_data is None:
+                        break
+                size = min(options.audio_chunk - written, audio_data.length)
+                ctypes.memmove(ctypes.addressof(device) + written,
+                               audio_data.get_pointer(), size)
+                written += size
+                if size < audio_data.length:
+                    audio_data.consume(size, audio_format)
+                else:
+                    audio_data.release()
+                    audio_data = None
+            if not written:
+                break
+            latencies.append(time.time() - callback_start)
+            total += written
+        elapsed = time.time() - start
+        source.delete()
+    finally:
+        shutil.rmtree(directory)
+
+    return {
+        'bytes': total,
+        'bytes_per_second': total / max(elapsed, 1e-9),
+        'realtime_factor': options.audio_duration / max(elapsed, 1e-9),
+        'callback_latency_ms': percentiles(latencies),
+        'audio_buffers': avbin.get_audio_buffer_stats(),
+    }
+
+def bench_sample_bank(clip, options):
+    '''Trigger sound effects from a sample bank and mix them.  The bus
+    plays through an offline driver that is never rendered, so that it is
+    only mixed directly by this thread.'''
+    from pyglet.media import mixer, procedural, render
+
+    bus = mixer.MixerBus(driver=render.RenderDriver())
+    bank = mixer.SampleBank(bus, max_voices=options.voices)
+    for i in range(8):
+        bank.add(i, procedural.Sine(0.05 * (i + 1), frequency=220 * (i + 1),
+                                    sample_rate=44100))
+
+    latencies = []
+    start = time.time()
+    for i in range(options.triggers):
+        trigger_start = time.time()
+        bank.play(i % 8, 0.5)
+        latencies.append(time.time() - trigger_start)
+    elapsed = time.time() - start
+
+    # Mix with two new sounds per block, which keeps most voices busy.
+    blocks = 400
+    voices = 0
+    mix_start = time.time()
+    for i in range(blocks):
+        bank.play(i % 8, 0.5)
+        bank.play((i + 3) % 8, 0.5)
+        voices += len(bus._voices)
+        bus.get_audio_data(1 << 20)
+    mix_elapsed = time.time() - mix_start
+    mixed_time = blocks * bus.block_time
+
+    return {
+        'triggers': options.triggers,
+        'triggers_per_second': options.triggers / max(elapsed, 1e-9),
+        'trigger_latency_ms': percentiles(latencies),
+        'steals': bank.steals,
+        'voices': options.voices,
+        'mean_active_voices': float(voices) / blocks,
+        'realtime_factor': mixed_time / max(mix_elapsed, 1e-9),
+    }
+
+def bench_audio_convert(clip, options):
+    '''Convert audio of several formats to 16-bit stereo at 44.1 kHz, as
+    `SourceGroup` does for sources not in the group's format, and report
+    the cost per second of audio and the samples converted per second.'''
+    import array
+    from pyglet import media
+    AudioFormat = media.AudioFormat
+
+    duration = 10
+    conversions = [
+        ('mono_8_22050', AudioFormat(1, 8, 22050), False),
+        ('stereo_16_48000', AudioFormat(2, 16, 48000), False),
+        ('stereo_24_44100', AudioFormat(2, 24, 44100), False),
+        ('surround_16_48000', AudioFormat(6, 16, 48000), False),
+        ('stereo_float_44100', AudioFormat(2, 32, 44100), True),
+    ]
+    audio_format = AudioFormat(2, 16, 44100)
+
+    costs = {}
+    samples_per_second = {}
+    for name, source_format, float_samples in conversions:
+        block_size = 4096 * source_format.bytes_per_sample
+        if float_samples:
+            tone = make_tone(source_format.sample_rate, source_format.channels)
+            block = array.array('f', [s / 32768. for s in 
+                array.array('h', tone)]).tostring()
+            block = block * (block_size // len(block) + 1)
+        else:
+            block = os.urandom(block_size)
+        block = block[:block_size]
+        blocks = duration * source_format.bytes_per_second // block_size
+
+        converter = media.AudioConverter(source_format, audio_format,
+                                         float_samples=float_samples)
+        start = time.time()
+        for i in range(blocks):
+            converter.convert(block)
+        elapsed = time.time() - start
+        converted_time = float(blocks * block_size) / \
+            source_format.bytes_per_second
+        costs[name] = elapsed * 1000 / converted_time
+        samples_per_second[name] = blocks * block_size // \
+            source_format.bytes_per_sample / max(elapsed, 1e-9)
+
+    return {
+        'ms_per_second': costs,
+        'samples_per_second': samples_per_second,
+        'realtime_factor': 1000 / max(max(costs.values()), 1e-9),
+    }
+
+def bench_procedural(clip, options):
+    '''Synthesise audio with each procedural generator and report samples
+    generated per second, per voice.'''
+    from pyglet.media import procedural
+
+    duration = 30
+    voices = 8
+    generators = [
+        ('sine', lambda: procedural.Sine(duration)),
+        ('saw', lambda: procedural.Saw(duration)),
+        ('square', lambda: procedural.Square(duration)),
+        ('white_noise', lambda: procedural.WhiteNoise(duration)),
+        ('sine_adsr', lambda: procedural.Sine(duration, 
+            envelope=procedural.ADSREnvelope(0.1, 0.2, 0.5))),
+        ('mix', lambda: procedural.Mix(
+            [procedural.Sine(duration, frequency=110 * (i + 1)) 
+             for i in range(voices)], [1. / voices] * voices)),
+    ]
+
+    rates = {}
+    for name, create in generators:
+        source = create()
+        samples = 0
+        start = time.time()
+        while True:
+            audio_data = source.get_audio_data(options.audio_chunk)
+            if not audio_data:
+                break
+            samples += audio_data.length // 2
+        elapsed = time.time() - start
+        if name == 'mix':
+            samples *= voices
+        rates[name] = samples / max(elapsed, 1e-9)
+
+    return {
+        'samples_per_second': rates,
+        'realtime_factor': min(rates.values()) / 44100.,
+    }
+
+#: Benchmarks run on each clip.
+benchmarks = ['video_decode', 'audio_decode', 'source_group_loop',
+              'render']
+
+#: Benchmarks that generate their own data, run once.
+standalone_benchmarks = ['long_audio', 'sample_bank', 'audio_convert',
+                         'procedural']
+
+#: Benchmarks that do not need AVbin.
+no_avbin_benchmarks = ['sample_bank', 'audio_convert', 'procedural']
+
+def run_child(name, clip, options):
+    '''Run a single benchmark in this process and print its result as JSON.'''
+    import pyglet
+    pyglet.options['shadow_window'] = False
+    from pyglet import media
+    if name not in no_avbin_benchmarks and not media.have_avbin:
+        print >> sys.stderr, 'AVbin is required'
+        sys.exit(1)
+
+    objects = len(gc.get_objects())
+    result = globals()['bench_' + name](clip, options)
+    if result is not None:
+        result['peak_rss_kb'] = get_peak_rss()
+        result['gc_objects'] = len(gc.get_objects()) - objects
+    print json.dumps(result)
+
+def run(name, clip, options):
+    '''Run a benchmark in a child process and return its result.'''
+    args = [sys.executable, os.path.abspath(__file__), '--child', name,
+            '--child-options', json.dumps(options.__dict__), clip or '']
+    process = subprocess.Popen(args, stdout=subprocess.PIPE)
+    output = process.communicate()[0]
+    if process.returncode != 0:
+        return {'error': 'exited with status %d' % process.returncode}
+    return json.loads(output.strip().splitlines()[-1])
+
+def get_revision():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        process = subprocess.Popen(['git', 'rev-parse', 'HEAD'],
+                                   cwd=directory, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        revision = process.communicate()[0].strip()
+    except OSError:
+        return None
+    return revision or None
+
+def format_result(result):
+    if result is None:
+        return 'skipped'
+    if 'error' in result:
+        return result['error']
+    parts = []
+    for key in ('fps', 'realtime_factor'):
+        if key in result:
+            parts.append('%s %.1f' % (key, result[key]))
+    if 'ms_per_second' in result:
+        parts.extend(['%s %.2f ms/s' % item 
+                      for item in sorted(result['ms_per_second'].items())])
+    if 'samples_per_second' in result:
+        parts.extend(['%s %.3g/s' % item 
+                      for item in sorted(result['samples_per_second'].items())])
+    if 'triggers_per_second' in result:
+        parts.append('triggers/s %.0f' % result['triggers_per_second'])
+    for key in ('frame_latency_ms', 'packet_latency_ms',
+                'callback_latency_ms', 'trigger_latency_ms'):
+        if result.get(key):
+            parts.append('p50 %.2f ms p99 %.2f ms' %
+                         (result[key]['p50'], result[key]['p99']))
+    if result.get('peak_rss_kb'):
+        parts.append('rss %d kB' % result['peak_rss_kb'])
+    return '  '.join(parts)
+
+def compare(results, baseline):
+    print
+    print 'Compared with %s:' % (baseline.get('revision') or 'baseline')
+    for clip, clip_results in results['results'].items():
+        for name, result in clip_results.items():
+            old = baseline['results'].get(clip, {}).get(name)
+            if not result or not old:
+                continue
+            for key in ('fps', 'realtime_factor', 'triggers_per_second',
+                        'peak_rss_kb'):
+                if result.get(key) and old.get(key):
+                    print '%-20s %-20s %-16s %10.1f -> %10.1f (%+.1f%%)' % (
+                        clip, name, key, old[key], result[key],
+                        (result[key] / old[key] - 1) * 100)
+
+def main():
+    usage = 'usage: %prog [options] [video ...]'
+    parser = OptionParser(usage=usage, description=__doc__.splitlines()[0])
+    parser.add_option('-o', '--output', dest='output',
+                      help='Write results to this JSON file')
+    parser.add_option('-c', '--compare', dest='compare',
+                      help='Compare with results from an earlier run')
+    parser.add_option('-b', '--benchmarks', dest='benchmarks',
+                      default=','.join(benchmarks + standalone_benchmarks),
+                      help='Comma-separated benchmarks to run '
+                           '(default: %default)')
+    parser.add_option('-s', '--size', dest='sizes', default='320x240,640x480',
+                      help='Comma-separated sizes of synthetic clips '
+                           '(default: %default)')
+    parser.add_option('-d', '--duration', dest='duration', default=4,
+                      type='int', help='Synthetic clip duration in seconds')
+    parser.add_option('-r', '--frame-rate', dest='frame_rate', default=25,
+                      type='int', help='Synthetic clip frame rate')
+    parser.add_option('-l', '--loops', dest='loops', default=3, type='int',
+                      help='Iterations of looping benchmarks')
+    parser.add_option('--audio-chunk', dest='audio_chunk', default=4096,
+                      type='int', help='Bytes requested per audio read')
+    parser.add_option('--audio-duration', dest='audio_duration', default=300,
+                      type='int', help='Length of long audio file in seconds')
+    parser.add_option('--triggers', dest='triggers', default=100000,
+                      type='int', help='Sample bank triggers')
+    parser.add_option('--voices', dest='voices', default=32, type='int',
+                      help='Sample bank voices')
+    parser.add_option('--child', dest='child', help='Internal use')
+    parser.add_option('--child-options', dest='child_options',
+                      help='Internal use')
+    options, args = parser.parse_args()
+
+    if options.child:
+        child_options = Values()
+        for key, value in json.loads(options.child_options).items():
+            setattr(child_options, str(key), value)
+        run_child(options.child, args[0] or None, child_options)
+        return
+
+    names = options.benchmarks.split(',')
+
+    clip_directory = None
+    clips = [(os.path.basename(arg), arg) for arg in args]
+    clip_names = [name for name in names if name not in standalone_benchmarks]
+    if not clip_names:
+        clips = []
+    elif not clips:
+        clip_directory = tempfile.mkdtemp(prefix='pyglet-benchmark-')
+        for size in options.sizes.split(','):
+            width, height = [int(n) for n in size.split('x')]
+            name = 'synthetic-%dx%d-%dfps' % (width, height,
+                                              options.frame_rate)
+            filename = os.path.join(clip_directory, name + '.avi')
+            write_avi(filename, width, height, options.frame_rate,
+                      options.duration)
+            clips.append((name, filename))
+
+    results = {
+        'revision': get_revision(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': {},
+    }
+    try:
+        for clip_name, filename in clips:
+            clip_results = results['results'][clip_name] = {}
+            for name in clip_names:
+                result = run(name, filename, options)
+                clip_results[name] = result
+                print '%-28s %-20s %s' % (clip_name, name,
+                                          format_result(result))
+
+        standalone_results = results['results']['standalone'] = {}
+        for name in names:
+            if name not in standalone_benchmarks:
+                continue
+            result = run(name, None, options)
+            standalone_results[name] = result
+            print '%-28s %-20s %s' % ('standalone', name,
+                                      format_result(result))
+    finally:
+        if clip_directory:
+            shutil.rmtree(clip_directory)
+
+    if options.output:
+        file = open(options.output, 'w')
+        try:
+            json.dump(results, file, indent=2, sort_keys=True)
+        finally:
+            file.close()
+
+    if options.compare:
+        file = open(options.compare)
+        try:
+            compare(results, json.load(file))
+        finally:
+            file.close()
+
+if __name__ == '__main__':
+    main()
@@ -114,6 +114,34 @@ if getattr(sys, 'frozen', None):
 #:     False.  Recommended for advanced devlopers only.
 #:
 #:     **Since:** pyglet 1.1
+#: video_decode_threads
+#:     Number of threads shared by all sources for decoding video.  Each
+#:     source decodes its frames in order on one thread at a time, so
+#:     additional threads help when several videos play at once.
+#:
+#:     **Since:** pyglet 1.2
+#: video_frame_buffers
+#:     Number of decoded video frame buffers each video source keeps for
+#:     reuse.  Frames are returned to the source once they have been
+#:     uploaded to the player's texture; frames beyond this number are
+#:     allocated as needed and left to the garbage collector.
+#:
+#:     **Since:** pyglet 1.2
+#: video_frame_cache
+#:     Maximum size, in bytes, of the cache of decoded video frames shared
+#:     by all video sources.  Frames that are played again, for example
+#:     when a short clip loops or is scrubbed back and forth, are taken from
+#:     the cache instead of being decoded again.  Frames are only reused
+#:     a whole run, from one keyframe to the next, at a time.  0 disables
+#:     the cache.
+#:
+#:     **Since:** pyglet 1.2
+#: video_timing_samples
+#:     Number of recent samples kept for each stage of the video pipeline
+#:     (demux, decode, texture upload, and so on).  See
+#:     `pyglet.media.get_video_timings`.  0 disables the timings.
+#:
+#:     **Since:** pyglet 1.2
 #: vsync
 #:     If set, the `pyglet.window.Window.vsync` property is ignored, and
 #:     this option overrides it (to either force vsync on or off).  If unset,
@@ -149,6 +177,10 @@ options = {
     'debug_x11': False,
     'graphics_vbo': True,
     'shadow_window': True,
+    'video_decode_threads': 2,
+    'video_frame_buffers': 8,
+    'video_frame_cache': 0,
+    'video_timing_samples': 256,
     'vsync': None,
     'xsync': True,
     'xlib_fullscreen_override_redirect': False,
@@ -174,6 +206,10 @@ _option_types = {
     'debug_x11': bool,
     'graphics_vbo': bool,
     'shadow_window': bool,
+    'video_decode_threads': int,
+    'video_frame_buffers': int,
+    'video_frame_cache': int,
+    'video_timing_samples': int,
     'vsync': bool,
     'xsync': bool,
     'xlib_fullscreen_override_redirect': bool,
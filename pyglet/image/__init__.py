@@ -1181,6 +1181,84 @@ class ImageDataRegion(ImageData):
         y += self.y
         return super(ImageDataRegion, self).get_region(x, y, width, height)
 
+class YUVImageData(ImageData):
+    '''An image in planar YUV 4:2:0 (I420) format.
+
+    The planes are available directly with `get_planes`, for example to
+    upload them to separate textures and convert with a fragment shader.
+    When the image is used like any other `ImageData` (blitted, or its data
+    requested in an RGB format), it is converted to RGBA on the CPU the
+    first time it is needed.  See `pyglet.image.yuv`.
+
+    Rows are stored top-to-bottom, but the pitch is reported as positive
+    (as for video frames decoded to RGB).
+
+    :Ivariables:
+        `planar_data` : str or ctypes array
+            Y, U and V planes, tightly packed, in that order.
+
+    :since: pyglet 1.2
+    '''
+    def __init__(self, width, height, data):
+        '''Initialise YUV image data.
+
+        :Parameters:
+            `width` : int
+                Width of image data
+            `height` : int
+                Height of image data
+            `data` : str or ctypes array
+                Y, U and V planes, tightly packed, in that order.
+
+        '''
+        super(YUVImageData, self).__init__(width, height, 'RGBA', None)
+        self.planar_data = data
+
+    def get_planes(self):
+        '''Get the Y, U and V planes of the image.
+
+        The U and V planes have half the width and height of the image,
+        rounded up.
+
+        :rtype: tuple of str
+        :return: ``(y, u, v)``
+        '''
+        from pyglet.image import yuv
+        return yuv.get_planes(self.planar_data, self.width, self.height)
+
+    def _ensure_rgb(self):
+        if self._current_data is None:
+            from pyglet.image import yuv
+            y, u, v = self.get_planes()
+            self._current_data = yuv.yuv420p_to_rgba(
+                self.width, self.height, y, u, v)
+
+    def get_data(self, format, pitch):
+        self._ensure_rgb()
+        return super(YUVImageData, self).get_data(format, pitch)
+
+    def set_data(self, format, pitch, data):
+        super(YUVImageData, self).set_data(format, pitch, data)
+        self.planar_data = None
+
+    def _set_data(self, data):
+        super(YUVImageData, self)._set_data(data)
+        self.planar_data = None
+
+    data = property(ImageData._get_data, _set_data)
+
+    def get_region(self, x, y, width, height):
+        self._ensure_rgb()
+        return super(YUVImageData, self).get_region(x, y, width, height)
+
+    def _convert(self, format, pitch):
+        self._ensure_rgb()
+        return super(YUVImageData, self)._convert(format, pitch)
+
+    def _ensure_string_data(self):
+        self._ensure_rgb()
+        super(YUVImageData, self)._ensure_string_data()
+
 class CompressedImageData(AbstractImage):
     '''Image representing some compressed data suitable for direct uploading
     to driver.
@@ -0,0 +1,178 @@
+# ----------------------------------------------------------------------------
+# pyglet
+# Copyright (c) 2006-2008 Alex Holkner
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions 
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of pyglet nor the names of its
+#    contributors may be used to endorse or promote products
+#    derived from this software without specific prior written
+#    permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ----------------------------------------------------------------------------
+
+
+'''Convert planar YUV images to RGB on the CPU.
+
+Video decoders commonly produce planar YUV 4:2:0 ("I420") images: a
+full-resolution luma (Y) plane followed by quarter-resolution U and V
+planes.  Displaying these requires conversion to RGB, either on the GPU or
+with `yuv420p_to_rgba`.
+
+The conversion follows ITU-R BT.601 with studio-range luma (16-235), as
+used by FFmpeg's software scaler.  It does not require a GL context, and is
+vectorised using the sample arithmetic of the standard `audioop` module: each
+step operates on a whole plane in C rather than on individual pixels in
+Python.
+
+Example usage::
+
+    y, u, v = get_planes(data, width, height)
+    rgba = yuv420p_to_rgba(width, height, y, u, v)
+    image = pyglet.image.ImageData(width, height, 'RGBA', rgba)
+
+'''
+
+__docformat__ = 'restructuredtext'
+__version__ = '$Id: $'
+
+import audioop
+import ctypes
+
+# Intermediate values are 16-bit signed samples holding the colour value
+# multiplied by _scale, which leaves headroom for out-of-gamut results
+# before clamping.
+_scale = 32
+
+def get_plane_sizes(width, height):
+    '''Get the dimensions of the planes of a YUV 4:2:0 image.
+
+    :Parameters:
+        `width` : int
+            Width of the image, in pixels.
+        `height` : int
+            Height of the image, in pixels.
+
+    :rtype: tuple
+    :return: ``(chroma_width, chroma_height, size)`` where `size` is the
+        total number of bytes of all three planes.
+    '''
+    chroma_width = (width + 1) >> 1
+    chroma_height = (height + 1) >> 1
+    return (chroma_width, chroma_height, 
+            width * height + 2 * chroma_width * chroma_height)
+
+def get_planes(data, width, height):
+    '''Split contiguous YUV 4:2:0 data into its three planes.
+
+    :Parameters:
+        `data` : str or ctypes array
+            Y, U and V planes, tightly packed, in that order.
+        `width` : int
+            Width of the image, in pixels.
+        `height` : int
+            Height of the image, in pixels.
+
+    :rtype: tuple of str
+    :return: ``(y, u, v)``
+    '''
+    chroma_width, chroma_height, size = get_plane_sizes(width, height)
+    if type(data) is not str:
+        data = ctypes.string_at(ctypes.addressof(data), size)
+    luma_size = width * height
+    chroma_size = chroma_width * chroma_height
+    return (data[:luma_size], 
+            data[luma_size:luma_size + chroma_size],
+            data[luma_size + chroma_size:size])
+
+def _to_samples(plane, factor, offset):
+    # Convert unsigned 8-bit plane to 16-bit samples of 
+    # (value * factor + offset) * _scale.
+    samples = audioop.lin2lin(audioop.bias(plane, 1, -128), 1, 2)
+    samples = audioop.mul(samples, 2, factor * _scale / 256.)
+    return audioop.bias(samples, 2, int((offset + 128 * factor) * _scale))
+
+def _to_bytes(samples):
+    # Convert 16-bit samples of (value * _scale) to unsigned 8-bit, clamping
+    # to 0-255.  Saturation of audioop.mul provides the clamp.
+    samples = audioop.bias(samples, 2, -128 * _scale + _scale // 2)
+    samples = audioop.mul(samples, 2, 256. / _scale)
+    return audioop.bias(audioop.lin2lin(samples, 2, 1), 1, 128)
+
+def _upsample(samples, chroma_width, width, height):
+    # Double 16-bit chroma samples horizontally and vertically.
+    samples = audioop.tostereo(samples, 2, 1, 1)
+    pitch = chroma_width * 4
+    row_size = width * 2
+    rows = []
+    for i in range(height):
+        start = (i >> 1) * pitch
+        rows.append(samples[start:start + row_size])
+    return ''.join(rows)
+
+def _interleave(a, b, width):
+    # Interleave samples of `width` bytes from two strings.
+    return audioop.add(audioop.tostereo(a, width, 1, 0),
+                       audioop.tostereo(b, width, 0, 1), width)
+
+def yuv420p_to_rgba(width, height, y, u, v):
+    '''Convert YUV 4:2:0 planes to packed RGBA.
+
+    Rows are converted in the order given; the alpha channel is opaque.
+
+    :Parameters:
+        `width` : int
+            Width of the image, in pixels.
+        `height` : int
+            Height of the image, in pixels.
+        `y` : str
+            Luma plane, ``width * height`` bytes.
+        `u` : str
+            Blue-difference chroma plane, at half resolution in each
+            dimension (rounded up).
+        `v` : str
+            Red-difference chroma plane, same size as `u`.
+
+    :rtype: str
+    :return: RGBA data, 4 bytes per pixel, ``width * 4`` bytes per row.
+    '''
+    chroma_width, chroma_height, size = get_plane_sizes(width, height)
+
+    luma = _to_samples(y, 255 / 219., -16 * 255 / 219.)
+
+    # Chroma contributions are computed at chroma resolution, then upsampled.
+    r = _to_samples(v, 1.596, -128 * 1.596)
+    g = audioop.add(_to_samples(u, -0.391, 128 * 0.391),
+                    _to_samples(v, -0.813, 128 * 0.813), 2)
+    b = _to_samples(u, 2.018, -128 * 2.018)
+
+    r = _to_bytes(audioop.add(luma, 
+        _upsample(r, chroma_width, width, height), 2))
+    g = _to_bytes(audioop.add(luma, 
+        _upsample(g, chroma_width, width, height), 2))
+    b = _to_bytes(audioop.add(luma, 
+        _upsample(b, chroma_width, width, height), 2))
+    a = '\xff' * (width * height)
+
+    return _interleave(_interleave(r, g, 1), _interleave(b, a, 1), 2)
@@ -72,19 +72,26 @@ of players, and so played many times simultaneously.
 __docformat__ = 'restructuredtext'
 __version__ = '$Id$'
 
+import array
 import atexit
+import audioop
+import bisect
 import ctypes
 import heapq
 import sys
 import threading
 import time
-import StringIO
+import traceback
+import zlib
 
 import pyglet
 
 _debug = pyglet.options['debug_media']
 _profile = pyglet.options['profile_media']
 
+# Update_texture's `time` argument hides the module.
+_timer = time.time
+
 class MediaException(Exception):
     pass
 
@@ -155,7 +162,7 @@ class MediaThread(object):
             print 'MediaThread.stop()'
         self.condition.acquire()
         self.stopped = True
-        self.condition.notify()
+        self.condition.notifyAll()
         self.condition.release()
         self._thread.join()
 
@@ -197,7 +204,12 @@ class WorkerThread(MediaThread):
             job = self.get_job()
             if not job:
                 break
-            job()
+            try:
+                job()
+            except:
+                # Report the error and carry on; the thread may be shared
+                # by other users who are waiting on their own jobs.
+                traceback.print_exc()
 
     def get_job(self):
         self.condition.acquire()
@@ -234,6 +246,216 @@ class WorkerThread(MediaThread):
     def _clear(self):
         del self._jobs[:]
 
+class WorkerPool(object):
+    '''A fixed number of worker threads shared by several job channels.
+
+    Each channel runs its jobs one at a time, in the order they were put;
+    jobs of different channels run concurrently on different workers.  This
+    lets many sources decode in parallel on separate cores without
+    reordering the work of any single source.
+
+    :Ivariables:
+        `condition` : threading.Condition
+            Lock condition on the pool and all of its channels.
+        `size` : int
+            Number of worker threads.
+
+    '''
+    def __init__(self, size):
+        self.size = size
+        self.condition = threading.Condition()
+
+        # Channels that have jobs and are not currently running one.
+        self._ready = []
+
+        self._threads = []
+        for i in range(size):
+            thread = MediaThread()
+            thread.condition = self.condition
+            thread.run = self._make_run(thread)
+            self._threads.append(thread)
+            thread.start()
+
+    def _make_run(self, thread):
+        return lambda: self._run(thread)
+
+    def _run(self, thread):
+        condition = self.condition
+        condition.acquire()
+        while True:
+            while not self._ready and not thread.stopped:
+                condition.wait()
+            if thread.stopped:
+                break
+
+            channel = self._ready.pop(0)
+            job = channel._jobs.pop(0)
+            channel._running = True
+
+            # Wake producers waiting for room in the channel.
+            condition.notifyAll()
+            condition.release()
+            try:
+                job()
+            except:
+                # Report the error and carry on, so that the worker does
+                # not exit holding the lock shared by every channel.
+                traceback.print_exc()
+            condition.acquire()
+            channel._running = False
+            if channel._jobs:
+                self._ready.append(channel)
+            condition.notifyAll()
+        condition.release()
+
+    def create_channel(self, max_jobs=None):
+        '''Create a new job channel on this pool.
+
+        :Parameters:
+            `max_jobs` : int
+                Maximum number of jobs waiting in the channel.  `put_job`
+                blocks while the channel is full.  If None (the default),
+                the channel is unbounded.
+
+        :rtype: `WorkerChannel`
+        '''
+        return WorkerChannel(self, max_jobs)
+
+    def stop(self):
+        '''Stop all worker threads and wait for them to terminate.'''
+        for thread in self._threads:
+            thread.stop()
+
+class WorkerChannel(object):
+    '''Ordered queue of jobs executed by a `WorkerPool`.
+
+    The interface matches `WorkerThread`, so a channel can be used wherever
+    a dedicated worker thread would be.
+    '''
+    def __init__(self, pool, max_jobs=None):
+        self.pool = pool
+        self.max_jobs = max_jobs
+        self.stopped = False
+        self._jobs = []
+        self._running = False
+
+    def start(self):
+        pass
+
+    def stop(self):
+        '''Discard all pending jobs and wait for a running job to finish.
+        No further jobs are accepted.'''
+        condition = self.pool.condition
+        condition.acquire()
+        self.stopped = True
+        self._clear()
+        while self._running:
+            condition.wait()
+        condition.notifyAll()
+        condition.release()
+
+    def put_job(self, job):
+        condition = self.pool.condition
+        condition.acquire()
+        while (self.max_jobs is not None and 
+               len(self._jobs) >= self.max_jobs and not self.stopped):
+            condition.wait()
+        if not self.stopped:
+            self._jobs.append(job)
+            if not self._running and self not in self.pool._ready:
+                self.pool._ready.append(self)
+            condition.notifyAll()
+        condition.release()
+
+    def clear_jobs(self):
+        condition = self.pool.condition
+        condition.acquire()
+        self._clear()
+        condition.notifyAll()
+        condition.release()
+
+    def _clear(self):
+        del self._jobs[:]
+        if self in self.pool._ready:
+            self.pool._ready.remove(self)
+
+def get_video_decode_pool():
+    '''Get the worker pool shared by all video decoders.
+
+    The pool is created on first use with the number of threads given by
+    the ``video_decode_threads`` option.
+
+    :since: pyglet 1.2
+
+    :rtype: `WorkerPool`
+    '''
+    global _video_decode_pool
+
+    if not _video_decode_pool:
+        _video_decode_pool = WorkerPool(
+            max(1, pyglet.options['video_decode_threads']))
+    return _video_decode_pool
+
+_video_decode_pool = None
+
+def _get_prefetch_thread():
+    # Worker thread that runs Source.prefetch jobs for all source groups.
+    global _prefetch_thread
+
+    if not _prefetch_thread:
+        _prefetch_thread = WorkerThread()
+        _prefetch_thread.start()
+    return _prefetch_thread
+
+_prefetch_thread = None
+
+class _PrefetchJob(object):
+    # Job that calls Source.prefetch on the prefetch thread.  An exception
+    # raised by the source is kept in `error` (as returned by sys.exc_info)
+    # for the source group to report.
+    def __init__(self, source):
+        self.source = source
+        self.error = None
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+        self._cancelled = False
+
+    def __call__(self):
+        self._lock.acquire()
+        try:
+            if self._cancelled:
+                return
+            self._started = True
+        finally:
+            self._lock.release()
+
+        try:
+            try:
+                self.source.prefetch()
+            except:
+                self.error = sys.exc_info()
+        finally:
+            self.done.set()
+
+    def wait(self, timeout):
+        # Wait up to `timeout` seconds for the job to finish.  A job that
+        # has not started by then is cancelled.  Return False if the
+        # prefetch is still running.
+        self.done.wait(timeout)
+        self._lock.acquire()
+        try:
+            if not self._started:
+                self._cancelled = True
+                return True
+        finally:
+            self._lock.release()
+        return self.done.isSet()
+
+    def join(self):
+        # Wait for a started job to finish.
+        self.done.wait()
+
 class AudioFormat(object):
     '''Audio details.
 
@@ -316,8 +538,11 @@ class AudioData(object):
     :Ivariables:
         `data` : str or ctypes array or pointer
             Sample data.
+        `offset` : int
+            Offset into `data` of the first sample not yet consumed, in
+            bytes.
         `length` : int
-            Size of sample data, in bytes.
+            Size of sample data remaining after `offset`, in bytes.
         `timestamp` : float
             Time of the first sample, in seconds.
         `duration` : float
@@ -327,8 +552,13 @@ class AudioData(object):
             timestamped relative to this audio packet.
 
     '''
-    def __init__(self, data, length, timestamp, duration, events):
+    # Pooled buffer holding `data`, if any; it must have a ``release``
+    # method, called when the data is no longer needed.
+    _buffer = None
+
+    def __init__(self, data, length, timestamp, duration, events, offset=0):
         self.data = data
+        self.offset = offset
         self.length = length
         self.timestamp = timestamp
         self.duration = duration
@@ -336,10 +566,14 @@ class AudioData(object):
 
     def consume(self, bytes, audio_format):
         '''Remove some data from beginning of packet.  All events are
-        cleared.'''
+        cleared.
+
+        The data is not copied; `offset` is advanced instead.
+        '''
         self.events = ()
         if bytes == self.length:
-            self.data = None
+            self.release()
+            self.offset = 0
             self.length = 0
             self.timestamp += self.duration
             self.duration = 0.
@@ -347,28 +581,911 @@ class AudioData(object):
         elif bytes == 0:
             return
 
-        if not isinstance(self.data, str):
-            # XXX Create a string buffer for the whole packet then
-            #     chop it up.  Could do some pointer arith here and
-            #     save a bit of data pushing, but my guess is this is
-            #     faster than fudging aruond with ctypes (and easier).
-            data = ctypes.create_string_buffer(self.length)
-            ctypes.memmove(data, self.data, self.length)
-            self.data = data
-        self.data = self.data[bytes:]
+        self.offset += bytes
         self.length -= bytes
         self.duration -= bytes / float(audio_format.bytes_per_second)
         self.timestamp += bytes / float(audio_format.bytes_per_second)
 
+    def release(self):
+        '''Give the packet's data back to the source that decoded it.
+
+        Drivers call this once the data has been copied out; the data must
+        not be used afterwards.  Packets that are never released are simply
+        garbage collected.
+
+        :since: pyglet 1.2
+        '''
+        self.data = None
+        if self._buffer is not None:
+            self._buffer.release()
+            self._buffer = None
+
+    def get_pointer(self):
+        '''Return a pointer to the data remaining after `offset`, without
+        copying it.  The pointer is only valid while this packet's `data`
+        is referenced.
+
+        :since: pyglet 1.2
+
+        :rtype: ctypes.c_void_p
+        '''
+        data = self.data
+        if isinstance(data, str):
+            address = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p).value
+        elif isinstance(data, ctypes.Array):
+            address = ctypes.addressof(data)
+        else:
+            address = ctypes.cast(data, ctypes.c_void_p).value
+        return ctypes.c_void_p(address + self.offset)
+
     def get_string_data(self):
         '''Return data as a string.'''
         if type(self.data) is str:
-            return self.data
+            if self.offset == 0 and self.length == len(self.data):
+                return self.data
+            return self.data[self.offset:self.offset + self.length]
 
         buf = ctypes.create_string_buffer(self.length)
-        ctypes.memmove(buf, self.data, self.length)
+        ctypes.memmove(buf, self.get_pointer(), self.length)
         return buf.raw
 
+class AudioConverter(object):
+    '''Convert PCM audio between sample rates, channel counts and sample
+    sizes, optionally changing its pitch.
+
+    Source data may have any number of channels (surround channels are
+    mixed down in the FFmpeg channel order), and 8, 16, 24 or 32-bit
+    integer or 32-bit float samples.  It is converted to 8 or 16-bit mono or
+    stereo.  The work is done on whole blocks by `audioop` and `array`
+    slicing; float samples are scaled by adjusting their exponents, and
+    only fall back to clamping one at a time if they exceed +-4.0.
+
+    Conversion state is kept between calls so that resampled blocks join
+    without clicks; call `reset` on a discontinuity (such as a seek).
+
+    :since: pyglet 1.2
+
+    :Ivariables:
+        `source_format` : `AudioFormat`
+            Format of data passed to `convert`.
+        `audio_format` : `AudioFormat`
+            Format of converted data.
+        `pitch` : float
+            Playback rate; 2.0 plays twice as fast, an octave higher.
+        `float_samples` : bool
+            True if the source samples are 32-bit floats.
+
+    '''
+    # Gains of each channel into the left and right outputs when mixing
+    # down, by channel count.
+    _downmix_gains = {
+        # FL FR FC
+        3: ((1., 0.), (0., 1.), (.707, .707)),
+        # FL FR BL BR
+        4: ((1., 0.), (0., 1.), (.707, 0.), (0., .707)),
+        # FL FR FC BL BR
+        5: ((1., 0.), (0., 1.), (.707, .707), (.707, 0.), (0., .707)),
+        # FL FR FC LFE BL BR
+        6: ((1., 0.), (0., 1.), (.707, .707), (0., 0.), 
+            (.707, 0.), (0., .707)),
+        # FL FR FC LFE BL BR SL SR
+        8: ((1., 0.), (0., 1.), (.707, .707), (0., 0.), 
+            (.707, 0.), (0., .707), (.707, 0.), (0., .707)),
+    }
+
+    def __init__(self, source_format, audio_format, pitch=1.0, 
+                 float_samples=False):
+        assert audio_format.sample_size in (8, 16)
+        assert audio_format.channels in (1, 2)
+        assert source_format.sample_size in (8, 16, 24, 32)
+        assert not float_samples or source_format.sample_size == 32
+        self.source_format = source_format
+        self.audio_format = audio_format
+        self.pitch = pitch
+        self.float_samples = float_samples
+        self._state = None
+        self._remainder = ''
+
+        channels = source_format.channels
+        if channels > 2:
+            gains = self._downmix_gains.get(channels)
+            if not gains:
+                gains = [((1., 0.), (0., 1.))[i % 2] for i in range(channels)]
+            # Scale so that full-scale input on every channel does not clip.
+            scale = 1. / max(sum([g[0] for g in gains]), 
+                             sum([g[1] for g in gains]))
+            self._gains = [(l * scale, r * scale) for l, r in gains]
+
+    def reset(self):
+        '''Forget resampling state.'''
+        self._state = None
+        self._remainder = ''
+
+    def set_pitch(self, pitch):
+        '''Change the pitch of subsequent data.'''
+        if pitch != self.pitch:
+            self.pitch = pitch
+            self._state = None
+
+    def convert(self, data):
+        '''Convert a string of samples.
+
+        Samples need not be split on a sample boundary; a trailing partial
+        sample is kept for the next call.
+
+        :rtype: str
+        '''
+        source_format = self.source_format
+        audio_format = self.audio_format
+
+        if self._remainder:
+            data = self._remainder + data
+        extra = len(data) % source_format.bytes_per_sample
+        if extra:
+            self._remainder = data[-extra:]
+            data = data[:-extra]
+        else:
+            self._remainder = ''
+
+        # Convert to 16-bit signed samples
+        if self.float_samples:
+            data = self._convert_float(data)
+        elif source_format.sample_size == 8:
+            # pyglet's 8-bit samples are unsigned; audioop's are signed.
+            data = audioop.lin2lin(audioop.bias(data, 1, -128), 1, 2)
+        elif source_format.sample_size == 24:
+            # Keep the two most significant bytes of each sample.
+            samples = bytearray(len(data) // 3 * 2)
+            samples[0::2] = data[1::3]
+            samples[1::2] = data[2::3]
+            data = str(samples)
+        elif source_format.sample_size == 32:
+            data = audioop.lin2lin(data, 4, 2)
+
+        channels = source_format.channels
+        if channels > 2:
+            data = self._downmix(data, channels)
+            channels = 2
+
+        if channels == 1 and audio_format.channels == 2:
+            data = audioop.tostereo(data, 2, 1, 1)
+        elif channels == 2 and audio_format.channels == 1:
+            data = audioop.tomono(data, 2, 0.5, 0.5)
+
+        rate = int(source_format.sample_rate * self.pitch)
+        if rate != audio_format.sample_rate or self._state is not None:
+            data, self._state = audioop.ratecv(data, 2, audio_format.channels,
+                rate, audio_format.sample_rate, self._state)
+
+        if audio_format.sample_size == 8:
+            data = audioop.bias(audioop.lin2lin(data, 2, 1), 1, 128)
+        return data
+
+    def _convert_float(self, data):
+        # Adding 29 to the exponent of each float scales it by 2 ** 29
+        # exactly, so that full scale truncates to the top of a 32-bit
+        # integer range saturated at +-4.0.  Truncation to integers is done
+        # by `map` without running any bytecode per sample.
+        try:
+            samples = array.array('f', audioop.bias(data, 4, 29 << 23))
+            data = array.array('i', map(int, samples)).tostring()
+            return audioop.lin2lin(audioop.mul(data, 4, 4.), 4, 2)
+        except (OverflowError, ValueError):
+            # Samples beyond +-4.0 or not finite; clamp each one.
+            samples = array.array('f', data)
+            return array.array('h', 
+                [int(max(-1., min(1., s)) * 32767) for s in samples]
+            ).tostring()
+
+    def _downmix(self, data, channels):
+        # Mix interleaved 16-bit samples of many channels down to stereo.
+        samples = array.array('h', data)
+        left = right = None
+        for i, (left_gain, right_gain) in enumerate(self._gains):
+            if not (left_gain or right_gain):
+                continue
+            channel = samples[i::channels].tostring()
+            if left_gain:
+                left = _add_scaled(left, channel, left_gain)
+            if right_gain:
+                right = _add_scaled(right, channel, right_gain)
+        return audioop.add(audioop.tostereo(left, 2, 1, 0),
+                           audioop.tostereo(right, 2, 0, 1), 2)
+
+    def get_source_bytes(self, bytes):
+        '''Estimate how many bytes of source data convert to `bytes` bytes.
+
+        :rtype: int
+        '''
+        source_format = self.source_format
+        frames = bytes // self.audio_format.bytes_per_sample
+        frames = int(frames * self.pitch * source_format.sample_rate /
+                     self.audio_format.sample_rate) + 1
+        return frames * source_format.bytes_per_sample
+
+def _add_scaled(mix, data, gain):
+    data = audioop.mul(data, 2, gain)
+    if mix is None:
+        return data
+    return audioop.add(mix, data, 2)
+
+class AudioRingBuffer(object):
+    '''Fixed-size ring of PCM data read ahead from a source group.
+
+    A fill thread shared by all ring buffers decodes from the source group
+    while a driver callback copies data out with `read`.  The reader takes
+    no locks and never decodes, so decoding jitter only shows up as a
+    change in fill level.  There must be only one reader.
+
+    :since: pyglet 1.2
+
+    :Ivariables:
+        `source_group` : `SourceGroup`
+            Source group to read from.
+        `size` : int
+            Capacity of the ring, in bytes.
+        `underruns` : int
+            Number of reads that found the ring empty before the end of the
+            source group.
+
+    '''
+    def __init__(self, source_group, size, on_fill=None):
+        '''Create a ring buffer.
+
+        :Parameters:
+            `source_group` : `SourceGroup`
+                Source group to read from.
+            `size` : int
+                Capacity in bytes; rounded down to a whole sample.
+            `on_fill` : callable
+                Function called with no arguments on the fill thread each
+                time data has been added or the end of the source group
+                has been reached.
+
+        '''
+        audio_format = source_group.audio_format
+        self.source_group = source_group
+        self.size = size - size % audio_format.bytes_per_sample
+        self.underruns = 0
+        self._on_fill = on_fill
+        self._buffer = (ctypes.c_byte * self.size)()
+        self._address = ctypes.addressof(self._buffer)
+
+        # Held while writing a packet, and while clearing.
+        self._fill_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Cursors count bytes since the last clear; the ring offset is the
+        # cursor modulo the size.  Only the writer advances the write cursor
+        # and only the reader advances the read cursor.
+        self._read_cursor = 0
+        self._write_cursor = 0
+        self._eos_cursor = None
+        self._pending = None
+        self._timestamps = []   # List of (cursor, timestamp)
+        self._events = []       # List of (cursor, MediaEvent)
+
+    def start(self):
+        '''Begin filling the ring on the fill thread.'''
+        _get_audio_fill_thread().add(self)
+
+    def stop(self):
+        '''Stop filling the ring.  Returns once any fill in progress has
+        finished.'''
+        _get_audio_fill_thread().remove(self)
+
+    def clear(self):
+        '''Discard buffered data, after the source group has been seeked.
+        Must not be called concurrently with `read`.'''
+        self._fill_lock.acquire()
+        self._clear()
+        self._fill_lock.release()
+
+    def seek(self, timestamp):
+        '''Seek the source group and discard buffered data.
+
+        The source group is not read by the fill thread until both are
+        done, so use this rather than seeking the group and calling
+        `clear` while the ring is started.  Must not be called
+        concurrently with `read`.
+        '''
+        self._fill_lock.acquire()
+        try:
+            self.source_group.seek(timestamp)
+            self._clear()
+        finally:
+            self._fill_lock.release()
+
+    def _clear(self):
+        # Called with the fill lock held.
+        if self._pending:
+            self._pending.release()
+        self._reset()
+
+    def fill(self):
+        '''Read from the source group until the ring is full or the source
+        group is exhausted.
+
+        :rtype: bool
+        :return: True if any data was added.
+        '''
+        at_eos = self._eos_cursor is not None
+        filled = False
+        while self._fill_packet():
+            filled = True
+        if self._on_fill and (filled or 
+                              not at_eos and self._eos_cursor is not None):
+            self._on_fill()
+        return filled
+
+    def _fill_packet(self):
+        # Write one packet, or the rest of the pending packet; return False
+        # if the ring is full or at EOS.
+        self._fill_lock.acquire()
+        try:
+            free = self.size - (self._write_cursor - self._read_cursor)
+            if self._eos_cursor is not None or free <= 0:
+                return False
+
+            audio_format = self.source_group.audio_format
+            audio_data = self._pending
+            self._pending = None
+            if audio_data is None:
+                audio_data = self.source_group.get_audio_data(free)
+                if audio_data is None:
+                    self._eos_cursor = self._write_cursor
+                    return False
+                cursor = self._write_cursor
+                self._timestamps.append((cursor, audio_data.timestamp))
+                for event in audio_data.events:
+                    self._events.append((cursor + int(event.timestamp * 
+                        audio_format.bytes_per_second), event))
+
+            length = min(free, audio_data.length)
+            self._write(audio_data.get_pointer().value, length)
+            if length < audio_data.length:
+                audio_data.consume(length, audio_format)
+                self._pending = audio_data
+            else:
+                audio_data.release()
+            return True
+        finally:
+            self._fill_lock.release()
+
+    def _write(self, address, length):
+        offset = self._write_cursor % self.size
+        first = min(length, self.size - offset)
+        ctypes.memmove(self._address + offset, address, first)
+        if first < length:
+            ctypes.memmove(self._address, address + first, length - first)
+        # Publish the data only once it has been copied.
+        self._write_cursor += length
+
+    def read(self, bytes, write):
+        '''Copy up to `bytes` bytes out of the ring.
+
+        :Parameters:
+            `bytes` : int
+                Maximum number of bytes to read.
+            `write` : callable
+                Function called with the address and length of each
+                contiguous region of data read (at most two).  It must copy
+                the data before returning.
+
+        :rtype: (int, list, list)
+        :return: Tuple of the number of bytes read; a list of
+            ``(offset, timestamp)`` giving the source group timestamp at
+            byte offsets into the data read, starting at offset 0; and a
+            list of ``(offset, event)`` for the `MediaEvent` instances
+            within the data read.
+        '''
+        audio_format = self.source_group.audio_format
+        start = self._read_cursor
+        available = self._write_cursor - start
+        if not available and bytes and self._eos_cursor is None:
+            self.underruns += 1
+        bytes = min(bytes, available)
+        bytes -= bytes % audio_format.bytes_per_sample
+        end = start + bytes
+        if not bytes:
+            return 0, [], []
+
+        offset = start % self.size
+        first = min(bytes, self.size - offset)
+        write(self._address + offset, first)
+        if first < bytes:
+            write(self._address, bytes - first)
+
+        markers = self._timestamps
+        while len(markers) > 1 and markers[1][0] <= start:
+            del markers[0]
+        cursor, timestamp = markers[0]
+        timestamps = [(0, timestamp + 
+            (start - cursor) / float(audio_format.bytes_per_second))]
+        for cursor, timestamp in markers[1:]:
+            if cursor >= end:
+                break
+            timestamps.append((cursor - start, timestamp))
+
+        events = []
+        while self._events and self._events[0][0] < end:
+            cursor, event = self._events.pop(0)
+            events.append((max(0, cursor - start), event))
+
+        self._read_cursor = end
+        return bytes, timestamps, events
+
+    eos = property(lambda self: self._eos_cursor is not None and 
+                                self._read_cursor >= self._eos_cursor,
+                   doc='''True if the whole source group has been read.
+
+    :type: bool
+    ''')
+
+    def get_stats(self):
+        '''Get the fill level and underrun count.
+
+        :rtype: dict
+        :return: Dictionary with keys ``size`` and ``fill`` (bytes),
+            ``fill_time`` (seconds of audio buffered) and ``underruns``.
+        '''
+        fill = self._write_cursor - self._read_cursor
+        return {
+            'size': self.size,
+            'fill': fill,
+            'fill_time': 
+                fill / float(self.source_group.audio_format.bytes_per_second),
+            'underruns': self.underruns,
+        }
+
+class _AudioFillThread(MediaThread):
+    # Fills every started AudioRingBuffer, waking when the fullest could
+    # have drained by a quarter.
+    _min_sleep_time = 0.005
+
+    def __init__(self):
+        super(_AudioFillThread, self).__init__()
+        self.rings = set()
+
+    def run(self):
+        self.condition.acquire()
+        while not self.stopped:
+            sleep_time = None
+            for ring in self.rings:
+                ring.fill()
+                period = ring.size / 4. / \
+                    ring.source_group.audio_format.bytes_per_second
+                if sleep_time is None or period < sleep_time:
+                    sleep_time = max(period, self._min_sleep_time)
+            self.condition.wait(sleep_time)
+        self.condition.release()
+
+    def add(self, ring):
+        self.condition.acquire()
+        self.rings.add(ring)
+        self.condition.notify()
+        self.condition.release()
+
+    def remove(self, ring):
+        self.condition.acquire()
+        self.rings.discard(ring)
+        self.condition.release()
+
+def _get_audio_fill_thread():
+    global _audio_fill_thread
+
+    if not _audio_fill_thread:
+        _audio_fill_thread = _AudioFillThread()
+        _audio_fill_thread.start()
+    return _audio_fill_thread
+
+_audio_fill_thread = None
+
+class VideoFrameBufferPool(object):
+    '''Ring of equally sized buffers for decoded video frames.
+
+    Sources that decode video into memory take a buffer with `get` for each
+    frame and give it back with `release` once the frame has been consumed
+    (see `Source.release_video_frame`).  At most `count` free buffers are
+    retained; when every buffer is in use a new one is allocated.
+
+    :Ivariables:
+        `size` : int
+            Size of each buffer, in bytes.
+        `count` : int
+            Maximum number of buffers retained for reuse.
+        `allocations` : int
+            Number of buffers allocated.
+        `reuses` : int
+            Number of times a released buffer was handed out again.
+
+    '''
+    def __init__(self, size, count=None):
+        if count is None:
+            count = pyglet.options['video_frame_buffers']
+        self.size = size
+        self.count = count
+        self.allocations = 0
+        self.reuses = 0
+        self._free = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        '''Get a buffer.
+
+        :rtype: ctypes array of ``c_uint8``
+        '''
+        self._lock.acquire()
+        if self._free:
+            buffer = self._free.pop()
+            self.reuses += 1
+        else:
+            buffer = None
+            self.allocations += 1
+        self._lock.release()
+
+        if buffer is None:
+            buffer = (ctypes.c_uint8 * self.size)()
+        return buffer
+
+    def release(self, buffer):
+        '''Return a buffer obtained from `get` to the pool.  The buffer must
+        not be used afterwards.
+
+        Buffers of a different size (for example, from another source's
+        pool) are ignored.
+        '''
+        if ctypes.sizeof(buffer) != self.size:
+            return
+
+        self._lock.acquire()
+        if len(self._free) < self.count:
+            self._free.append(buffer)
+        self._lock.release()
+
+    def clear(self):
+        '''Discard all free buffers.'''
+        self._lock.acquire()
+        del self._free[:]
+        self._lock.release()
+
+class VideoFrameCache(object):
+    '''Memory-bounded cache of decoded video frames.
+
+    Frames are keyed by an owner (usually a source) and the frame's
+    timestamp.  When the total size of cached frames exceeds `max_size`
+    the least recently used frames are evicted.  This lets looping or
+    scrubbing through a short clip reuse frames instead of decoding them
+    again.
+
+    Cached images are shared between every lookup, so they must not be
+    modified or returned to a `VideoFrameBufferPool`.
+
+    A decoder can only skip decoding a frame if it also skips every frame
+    that depends on it.  Decoders therefore record each run of frames from
+    one keyframe up to the next with `put_run`, and serve cached frames only
+    a whole run at a time, with `get_run`.
+
+    :since: pyglet 1.2
+
+    :Ivariables:
+        `max_size` : int
+            Maximum total size of cached frames, in bytes.
+        `size` : int
+            Current total size of cached frames, in bytes.
+        `hits` : int
+            Number of lookups that found a frame.
+        `misses` : int
+            Number of lookups that did not find a frame.
+        `evictions` : int
+            Number of frames evicted to stay within `max_size`.
+
+    '''
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._frames = {}
+        # Keys in order of use, least recently used first.
+        self._order = []
+        # Timestamps of each run of frames, keyed by (owner, timestamp of
+        # its first frame).
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def get(self, owner, timestamp):
+        '''Look up a frame.
+
+        :Parameters:
+            `owner` : object
+                Hashable identifier of the frame's source.
+            `timestamp` : float
+                Timestamp of the frame.
+
+        :rtype: `pyglet.image.AbstractImage`
+        :return: The cached frame, or None if it is not cached.
+        '''
+        key = (owner, timestamp)
+        self._lock.acquire()
+        entry = self._frames.get(key)
+        if entry is None:
+            self.misses += 1
+            image = None
+        else:
+            self.hits += 1
+            self._order.remove(key)
+            self._order.append(key)
+            image = entry[0]
+        self._lock.release()
+        return image
+
+    def put(self, owner, timestamp, image, size):
+        '''Add a frame to the cache.
+
+        :Parameters:
+            `owner` : object
+                Hashable identifier of the frame's source.
+            `timestamp` : float
+                Timestamp of the frame.
+            `image` : `pyglet.image.AbstractImage`
+                The decoded frame.
+            `size` : int
+                Size of the frame's data, in bytes.
+
+        '''
+        if size > self.max_size:
+            return
+
+        key = (owner, timestamp)
+        self._lock.acquire()
+        if key in self._frames:
+            self.size -= self._frames[key][1]
+            self._order.remove(key)
+        self._frames[key] = (image, size)
+        self._order.append(key)
+        self.size += size
+        while self.size > self.max_size:
+            # A run cannot be served once its keyframe is evicted.
+            key = self._order[0]
+            self._runs.pop(key, None)
+            self._remove(key)
+            self.evictions += 1
+        self._lock.release()
+
+    def put_run(self, owner, timestamps):
+        '''Record a run of frames that can be decoded independently of any
+        other frames: a keyframe and the frames up to the next keyframe.
+
+        The frames themselves are added with `put`, before or after the run
+        is recorded.
+
+        :Parameters:
+            `owner` : object
+                Hashable identifier of the frames' source.
+            `timestamps` : list of float
+                Timestamps of the frames of the run, in decoding order,
+                beginning with the keyframe.
+
+        '''
+        self._lock.acquire()
+        self._runs[(owner, timestamps[0])] = tuple(timestamps)
+        self._lock.release()
+
+    def get_run(self, owner, timestamp):
+        '''Look up all frames of the run beginning with a keyframe.
+
+        :Parameters:
+            `owner` : object
+                Hashable identifier of the frames' source.
+            `timestamp` : float
+                Timestamp of the keyframe.
+
+        :rtype: list of (float, `pyglet.image.AbstractImage`)
+        :return: The timestamp and image of each frame of the run, in
+            decoding order; or None if the run is not recorded or any of
+            its frames is not cached.
+        '''
+        self._lock.acquire()
+        timestamps = self._runs.get((owner, timestamp))
+        if timestamps is None:
+            result = None
+        else:
+            result = []
+            for frame_timestamp in timestamps:
+                entry = self._frames.get((owner, frame_timestamp))
+                if entry is None:
+                    result = None
+                    break
+                result.append((frame_timestamp, entry[0]))
+
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += len(result)
+            for frame_timestamp in timestamps:
+                key = (owner, frame_timestamp)
+                self._order.remove(key)
+                self._order.append(key)
+        self._lock.release()
+        return result
+
+    def _remove(self, key):
+        self.size -= self._frames.pop(key)[1]
+        self._order.remove(key)
+
+    def discard(self, owner):
+        '''Remove all frames and runs of an owner.'''
+        self._lock.acquire()
+        for key in [key for key in self._order if key[0] == owner]:
+            self._remove(key)
+        for key in [key for key in self._runs if key[0] == owner]:
+            del self._runs[key]
+        self._lock.release()
+
+    def clear(self):
+        '''Remove all frames and runs.'''
+        self._lock.acquire()
+        self._frames.clear()
+        del self._order[:]
+        self._runs.clear()
+        self.size = 0
+        self._lock.release()
+
+def get_video_frame_cache():
+    '''Get the decoded frame cache shared by all video sources.
+
+    The cache is created on first use with the size given by the
+    ``video_frame_cache`` option.
+
+    :since: pyglet 1.2
+
+    :rtype: `VideoFrameCache`
+    :return: The cache, or None if ``video_frame_cache`` is 0.
+    '''
+    global _video_frame_cache
+
+    if not _video_frame_cache and pyglet.options['video_frame_cache'] > 0:
+        _video_frame_cache = VideoFrameCache(
+            pyglet.options['video_frame_cache'])
+    return _video_frame_cache
+
+_video_frame_cache = None
+
+class PipelineTimings(object):
+    '''Recent durations of each stage of the video pipeline.
+
+    Video sources and players record how long each stage took for each
+    frame; the most recent `capacity` samples of each stage are kept in a
+    ring buffer.  Use `get_summary` to get percentiles, for example to find
+    the cause of stutter in a running application.
+
+    The stages are:
+
+    ``demux``
+        Reading a packet from the container.
+    ``queue_wait``
+        Time the player waited for a frame to finish decoding.
+    ``decode``
+        Decoding a frame (including conversion to RGB, unless the source
+        decodes to YUV).
+    ``convert``
+        Converting a YUV frame to RGB.
+    ``upload``
+        Copying a frame into the player's texture.
+    ``present``
+        How late a frame was uploaded, relative to its timestamp.
+
+    :since: pyglet 1.2
+
+    :Ivariables:
+        `capacity` : int
+            Number of samples kept for each stage.
+
+    '''
+    stages = ('demux', 'queue_wait', 'decode', 'convert', 'upload', 'present')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._samples = {}
+        self._next = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+        self.clear()
+
+    def record(self, stage, duration):
+        '''Record the duration of a stage for one frame.
+
+        :Parameters:
+            `stage` : str
+                Name of the stage; one of `stages`.
+            `duration` : float
+                Duration, in seconds.
+
+        '''
+        self._lock.acquire()
+        samples = self._samples[stage]
+        i = self._next[stage]
+        if len(samples) < self.capacity:
+            samples.append(duration)
+        else:
+            samples[i] = duration
+        self._next[stage] = (i + 1) % self.capacity
+        self._counts[stage] += 1
+        self._lock.release()
+
+    def get_samples(self, stage):
+        '''Get the recorded durations of a stage, oldest first.
+
+        :rtype: list of float
+        '''
+        self._lock.acquire()
+        samples = self._samples[stage]
+        if len(samples) < self.capacity:
+            result = list(samples)
+        else:
+            i = self._next[stage]
+            result = samples[i:] + samples[:i]
+        self._lock.release()
+        return result
+
+    def get_summary(self):
+        '''Get percentiles of the recorded durations of each stage.
+
+        :rtype: dict
+        :return: A dict mapping stage names to dicts with the keys
+            ``count`` (samples recorded since the last `clear`), ``mean``,
+            ``p50``, ``p95``, ``p99`` and ``max``, in seconds.  Stages with
+            no samples are omitted.
+        '''
+        summary = {}
+        for stage in self.stages:
+            samples = self.get_samples(stage)
+            if not samples:
+                continue
+            samples.sort()
+            n = len(samples)
+            summary[stage] = {
+                'count': self._counts[stage],
+                'mean': sum(samples) / n,
+                'p50': samples[min(n // 2, n - 1)],
+                'p95': samples[min(int(n * 0.95), n - 1)],
+                'p99': samples[min(int(n * 0.99), n - 1)],
+                'max': samples[-1],
+            }
+        return summary
+
+    def clear(self):
+        '''Discard all samples.'''
+        self._lock.acquire()
+        for stage in self.stages:
+            self._samples[stage] = []
+            self._next[stage] = 0
+            self._counts[stage] = 0
+        self._lock.release()
+
+def get_video_timings():
+    '''Get the pipeline timings shared by all video sources and players.
+
+    The ring buffers hold the number of samples given by the
+    ``video_timing_samples`` option.
+
+    :since: pyglet 1.2
+
+    :rtype: `PipelineTimings`
+    :return: The timings, or None if ``video_timing_samples`` is 0.
+    '''
+    global _video_timings
+
+    if not _video_timings and pyglet.options['video_timing_samples'] > 0:
+        _video_timings = PipelineTimings(
+            pyglet.options['video_timing_samples'])
+    return _video_timings
+
+_video_timings = None
+
 class MediaEvent(object):
     def __init__(self, timestamp, event, *args):
         # Meaning of timestamp is dependent on context; and not seen by
@@ -528,6 +1645,49 @@ class Source(object):
         '''
         pass
 
+    def skip_video_frames(self, timestamp):
+        '''Discard all video frames with a timestamp earlier than the
+        given timestamp.
+
+        The default implementation decodes and releases each frame in turn;
+        sources may override this to avoid decoding late frames into
+        images.
+
+        :since: pyglet 1.2
+
+        :Parameters:
+            `timestamp` : float
+                Time of the next frame wanted, in seconds.
+
+        :rtype: int
+        :return: The number of frames discarded.
+        '''
+        count = 0
+        ts = self.get_next_video_timestamp()
+        while ts is not None and ts < timestamp:
+            image = self.get_next_video_frame()
+            if image is not None:
+                self.release_video_frame(image)
+            count += 1
+            ts = self.get_next_video_timestamp()
+        return count
+
+    def release_video_frame(self, image):
+        '''Return a video frame to the source once it is no longer needed.
+
+        Sources that recycle frame memory may overwrite the image after
+        this call.  Frames that are never released remain valid.  The
+        default implementation does nothing.
+
+        :since: pyglet 1.2
+
+        :Parameters:
+            `image` : `pyglet.image.AbstractImage`
+                Image previously returned by `get_next_video_frame`.
+
+        '''
+        pass
+
     # Internal methods that SourceGroup calls on the source:
 
     def seek(self, timestamp):
@@ -540,6 +1700,14 @@ class Source(object):
         Default implementation returns self.'''
         return self
 
+    def _get_static_data(self):
+        '''Return the remaining audio data as a str or ctypes array, if it
+        is already in memory (or mapped into it) in `audio_format`, so that
+        `StaticSource` can refer to it instead of copying it.
+
+        Default implementation returns None.'''
+        return None
+
     def get_audio_data(self, bytes):
         '''Get next packet of audio data.
 
@@ -553,6 +1721,18 @@ class Source(object):
         '''
         return None
 
+    def prefetch(self):
+        '''Prepare to begin playing, by reading and decoding ahead.
+
+        Called on a background thread while the previous source in a
+        `SourceGroup` is about to end, so that starting this source does not
+        delay the audio thread.  It is not called concurrently with any other
+        method of the source.  The default implementation does nothing.
+
+        :since: pyglet 1.2
+        '''
+        pass
+
 class StreamingSource(Source):
     '''A source that is decoded as it is being played, and can only be
     queued once.
@@ -581,102 +1761,303 @@ class StreamingSource(Source):
 class StaticSource(Source):
     '''A source that has been completely decoded in memory.  This source can
     be queued onto multiple players any number of times.
+
+    Video frames are stored decoded, so players of the source do no decoding
+    of their own.  They can be compressed with zlib, which takes much less
+    memory for typical animations but is decompressed by each player.  If
+    the source can decode to planar YUV 4:2:0 (`AVbinSource` only can with a
+    patched AVbin), they can be stored that way instead, which takes half
+    the memory of RGB but is converted for display by each player.
     '''
+
+    #: Default maximum size of the stored video frames, in bytes.
+    #:
+    #: :since: pyglet 1.2
+    max_video_size = 64 << 20
+
+    _data = None
+    _video_frames = None
     
-    def __init__(self, source):
+    def __init__(self, source, planar_video=False, compress_video=False,
+                 max_video_size=None):
         '''Construct a `StaticSource` for the data in `source`.
 
         :Parameters:
             `source` : `Source`
                 The source to read and decode audio and video data from.
+            `planar_video` : bool
+                If True, store video frames as planar YUV 4:2:0.  The source
+                must be able to decode to YUV; `AVbinSource` cannot with any
+                released AVbin, only with one patched to add YUV output (see
+                `AVbinSource.can_output_yuv`).  If it cannot,
+                `MediaException` is raised.  **Since:** pyglet 1.2.
+            `compress_video` : bool
+                If True, store video frames compressed with zlib.
+                **Since:** pyglet 1.2.
+            `max_video_size` : int
+                Maximum size of the stored video frames, in bytes; if
+                exceeded, `MediaException` is raised.  Defaults to the
+                `max_video_size` class attribute.  **Since:** pyglet 1.2.
 
         '''
         source = source._get_queue_source()
-        if source.video_format:
-            raise NotImplementedError(
-                'Static sources not supported for video yet.')
-
         self.audio_format = source.audio_format
+        self.video_format = source.video_format
+
+        if self.video_format:
+            if max_video_size is None:
+                max_video_size = self.max_video_size
+            if planar_video:
+                if not getattr(source, 'can_output_yuv', False):
+                    raise MediaException(
+                        'Source cannot decode video to planar YUV')
+                source.output_yuv = True
+            self._video_frames = _StaticVideoFrames(self.video_format,
+                planar_video, compress_video, max_video_size)
+
         if not self.audio_format:
+            if self._video_frames:
+                self._read_video(source, None)
+                self._duration = source.duration
+                if self._duration is None:
+                    self._duration = self._video_frames.get_duration()
             return
 
-        # Arbitrary: number of bytes to request at a time.
-        buffer_size = 1 << 20 # 1 MB
-
-        # Naive implementation.  Driver-specific implementations may override
-        # to load static audio data into device (or at least driver) memory. 
-        data = StringIO.StringIO()
-        while True:
-            audio_data = source.get_audio_data(buffer_size)
-            if not audio_data:
-                break
-            data.write(audio_data.get_string_data())
-        self._data = data.getvalue()
+        # Share the data if the source already has it in memory.
+        if not self._video_frames:
+            self._data = source._get_static_data()
+        if self._data is None:
+            # Arbitrary: number of bytes to request at a time.
+            buffer_size = 1 << 20 # 1 MB
+            if self._video_frames:
+                # Keep the source's video queue short.
+                buffer_size = 4096
+
+            # Naive implementation.  Driver-specific implementations may
+            # override to load static audio data into device (or at least
+            # driver) memory. 
+            chunks = []
+            while True:
+                audio_data = source.get_audio_data(buffer_size)
+                if not audio_data:
+                    break
+                chunks.append(audio_data.get_string_data())
+                if self._video_frames:
+                    self._read_video(source, 
+                        audio_data.timestamp + audio_data.duration)
+                audio_data.release()
+            self._data = ''.join(chunks)
+            if self._video_frames:
+                self._read_video(source, None)
 
         self._duration = len(self._data) / \
                 float(self.audio_format.bytes_per_second)
 
+    def _read_video(self, source, timestamp):
+        # Store the source's frames up to `timestamp`, or all frames if
+        # None.
+        frames = self._video_frames
+        while True:
+            frame_timestamp = source.get_next_video_timestamp()
+            if frame_timestamp is None or (timestamp is not None and 
+                                           frame_timestamp >= timestamp):
+                break
+            image = source.get_next_video_frame()
+            if image is not None:
+                frames.add(frame_timestamp, image)
+                source.release_video_frame(image)
+
     def _get_queue_source(self):
-        return StaticMemorySource(self._data, self.audio_format)
+        return StaticMemorySource(self._data, self.audio_format,
+                                  self._video_frames)
 
     def get_audio_data(self, bytes):
         raise RuntimeError('StaticSource cannot be queued.')
 
+class _StaticVideoFrames(object):
+    # Decoded video frames of a StaticSource, shared by its queue sources.
+
+    def __init__(self, video_format, planar, compressed, max_size):
+        self.video_format = video_format
+        self.planar = planar
+        self.compressed = compressed
+        self.max_size = max_size
+        self.size = 0
+        self.timestamps = []
+        self.frames = []
+
+        # Format and pitch of RGB frames, taken from the first frame.
+        self._format = None
+        self._pitch = None
+
+    def add(self, timestamp, image):
+        width = self.video_format.width
+        height = self.video_format.height
+        if self.planar:
+            from pyglet.image import yuv
+            data = image.planar_data
+            size = yuv.get_plane_sizes(width, height)[2]
+        else:
+            if self._format is None:
+                self._format = image.format
+                self._pitch = image.pitch
+            data = image.get_data(self._format, self._pitch)
+            size = abs(self._pitch) * height
+        if type(data) is not str:
+            data = ctypes.string_at(ctypes.addressof(data), size)
+        if self.compressed:
+            data = zlib.compress(data, 1)
+
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise MediaException(
+                'Decoded video exceeds %d bytes' % self.max_size)
+        self.timestamps.append(timestamp)
+        self.frames.append(data)
+
+    def get_image(self, index):
+        from pyglet import image
+        data = self.frames[index]
+        if self.compressed:
+            data = zlib.decompress(data)
+        width = self.video_format.width
+        height = self.video_format.height
+        if self.planar:
+            return image.YUVImageData(width, height, data)
+        return image.ImageData(width, height, self._format, data, self._pitch)
+
+    def get_duration(self):
+        if not self.timestamps:
+            return 0.
+        period = 0.
+        if self.video_format.frame_rate:
+            period = 1. / self.video_format.frame_rate
+        return self.timestamps[-1] + period
+
 class StaticMemorySource(StaticSource):
     '''Helper class for default implementation of `StaticSource`.  Do not use
     directly.'''
 
-    def __init__(self, data, audio_format):
-        '''Construct a memory source over the given data buffer.
+    def __init__(self, data, audio_format, video_frames=None):
+        '''Construct a memory source over the given data buffer, a str or
+        ctypes array.  Audio data returned refers to the buffer rather than
+        copying it.
         '''
-        self._file = StringIO.StringIO(data)
-        self._max_offset = len(data)
+        self._data = data
+        self._offset = 0
         self.audio_format = audio_format
-        self._duration = len(data) / float(audio_format.bytes_per_second)
+        if data is not None:
+            self._max_offset = len(data)
+            self._duration = len(data) / float(audio_format.bytes_per_second)
+
+        self._video_frames = video_frames
+        self._video_index = 0
+        if video_frames:
+            self.video_format = video_frames.video_format
+            if data is None:
+                self._duration = video_frames.get_duration()
 
     def seek(self, timestamp):
+        if self._video_frames:
+            self._video_index = bisect.bisect_left(
+                self._video_frames.timestamps, timestamp)
+        if self._data is None:
+            return
+
         offset = int(timestamp * self.audio_format.bytes_per_second)
 
+        # Bound within duration
+        offset = min(max(offset, 0), self._max_offset)
+
         # Align to sample
-        if self.audio_format.bytes_per_sample == 2:
-            offset &= 0xfffffffe
-        elif self.audio_format.bytes_per_sample == 4:
-            offset &= 0xfffffffc
+        offset -= offset % self.audio_format.bytes_per_sample
 
-        self._file.seek(offset)
+        self._offset = offset
 
     def get_audio_data(self, bytes):
-        offset = self._file.tell()
+        if self._data is None:
+            return None
+
+        offset = self._offset
         timestamp = float(offset) / self.audio_format.bytes_per_second
 
         # Align to sample size
-        if self.audio_format.bytes_per_sample == 2:
-            bytes &= 0xfffffffe
-        elif self.audio_format.bytes_per_sample == 4:
-            bytes &= 0xfffffffc
-
-        data = self._file.read(bytes)
-        if not len(data):
+        bytes = min(bytes, self._max_offset - offset)
+        bytes -= bytes % self.audio_format.bytes_per_sample
+        if bytes <= 0:
             return None
 
-        duration = float(len(data)) / self.audio_format.bytes_per_second
-        return AudioData(data, len(data), timestamp, duration, [])
+        self._offset += bytes
+        duration = float(bytes) / self.audio_format.bytes_per_second
+        return AudioData(self._data, bytes, timestamp, duration, [], offset)
+
+    def _get_static_data(self):
+        if self._offset == 0:
+            return self._data
+
+    def get_next_video_timestamp(self):
+        frames = self._video_frames
+        if frames and self._video_index < len(frames.timestamps):
+            return frames.timestamps[self._video_index]
+
+    def get_next_video_frame(self):
+        frames = self._video_frames
+        if frames and self._video_index < len(frames.timestamps):
+            self._video_index += 1
+            return frames.get_image(self._video_index - 1)
+
+    def skip_video_frames(self, timestamp):
+        # Frames are already decoded, so skipping costs nothing.
+        frames = self._video_frames
+        if not frames:
+            return 0
+        index = max(self._video_index, 
+                    bisect.bisect_left(frames.timestamps, timestamp))
+        count = index - self._video_index
+        self._video_index = index
+        return count
 
 class SourceGroup(object):
-    '''Read data from a queue of sources, with support for looping.  All
-    sources must share the same audio format.
+    '''Read data from a queue of sources, with support for looping.
+
+    Audio from sources whose format differs from the group's is converted
+    to the group's format with an `AudioConverter`, so sources of mixed
+    sample rates, channel counts and sample sizes play without reopening
+    the driver stream.
     
+    When the current source comes within `prefetch_time` of its end, the
+    next source is prefetched on a background thread (see
+    `Source.prefetch`) so that the change is gapless.
+
     :Ivariables:
         `audio_format` : `AudioFormat`
-            Required audio format for queued sources.
+            Audio format of data returned by `get_audio_data`.
 
     '''
 
     # TODO can sources list go empty?  what behaviour (ignore or error)?
 
+    #: Time before the end of the current source at which to prefetch the
+    #: next, in seconds.  If None, sources are not prefetched.
+    #:
+    #: :since: pyglet 1.2
+    prefetch_time = 2.0
+
+    #: Time to wait for the prefetch of the next source to finish when the
+    #: current source ends, in seconds.  A prefetch that has not started by
+    #: then is abandoned.  A prefetch that is still running is waited for,
+    #: since the source cannot be read until it returns, and a warning is
+    #: printed.
+    #:
+    #: :since: pyglet 1.2
+    prefetch_timeout = 1.0
+
     _advance_after_eos = False
     _loop = False
 
+    # _PrefetchJob started for the next source.
+    _prefetch = None
+
     def __init__(self, audio_format, video_format):
         self.audio_format = audio_format
         self.video_format = video_format
@@ -685,13 +2066,35 @@ class SourceGroup(object):
         self._dequeued_durations = []
         self._sources = []
 
+        # Converter for each queued source not in `audio_format`.
+        self._converters = {}
+
     def seek(self, time):
         if self._sources:
             self._sources[0].seek(time)
+            self._reset_converter()
+
+    def can_queue(self, source):
+        '''Determine if a source can be queued on this group.
+
+        The source must have the same video format as the group, and must
+        have audio if and only if the group does.  Its audio format need not
+        match.
+
+        :since: pyglet 1.2
+
+        :rtype: bool
+        '''
+        if source.video_format != self.video_format:
+            return False
+        return (source.audio_format is None) == (self.audio_format is None)
 
     def queue(self, source):
         source = source._get_queue_source()
-        assert(source.audio_format == self.audio_format)
+        assert self.can_queue(source)
+        if source.audio_format and source.audio_format != self.audio_format:
+            self._converters[source] = AudioConverter(source.audio_format,
+                                                      self.audio_format)
         self._sources.append(source)
         self.duration += source.duration
 
@@ -708,12 +2111,65 @@ class SourceGroup(object):
         if self._sources:
             return self._sources[0]
 
+    def _start_prefetch(self):
+        source = self._sources[1]
+        if self._prefetch and self._prefetch.source is source:
+            return
+
+        self._prefetch = _PrefetchJob(source)
+        _get_prefetch_thread().put_job(self._prefetch)
+
+    def _wait_prefetch(self):
+        # Wait for a prefetch of the next source to finish before it is
+        # used, and report any error it raised.
+        job = self._prefetch
+        self._prefetch = None
+        if not job or len(self._sources) < 2 or \
+           job.source is not self._sources[1]:
+            return
+
+        if not job.wait(self.prefetch_timeout):
+            print >> sys.stderr, \
+                'Prefetch of %r is taking more than %r seconds' % \
+                (job.source, self.prefetch_timeout)
+            job.join()
+        if job.error:
+            print >> sys.stderr, 'Error prefetching %r:' % job.source
+            traceback.print_exception(*job.error)
+
     def _advance(self):
         if self._sources:
+            self._wait_prefetch()
             self._timestamp_offset += self._sources[0].duration
             self._dequeued_durations.insert(0, self._sources[0].duration)
             old_source = self._sources.pop(0)
             self.duration -= old_source.duration
+            self._converters.pop(old_source, None)
+
+    def _reset_converter(self):
+        converter = self._converters.get(self._sources[0])
+        if converter:
+            converter.reset()
+
+    def _get_source_audio_data(self, bytes):
+        # Get the next packet of the current source in the group's format.
+        source = self._sources[0]
+        converter = self._converters.get(source)
+        if not converter:
+            return source.get_audio_data(bytes)
+
+        bytes = converter.get_source_bytes(bytes)
+        events = []
+        while True:
+            data = source.get_audio_data(bytes)
+            if not data:
+                return None
+            converted = converter.convert(data.get_string_data())
+            data.release()
+            events.extend(data.events)
+            if converted:
+                return AudioData(converted, len(converted), data.timestamp,
+                                 data.duration, events)
 
     def _get_loop(self):
         return self._loop
@@ -739,7 +2195,16 @@ class SourceGroup(object):
         :return: Audio data, or None if there is no more data.
         '''
 
-        data = self._sources[0].get_audio_data(bytes)
+        data = self._get_source_audio_data(bytes)
+        if (data and len(self._sources) > 1 and 
+            self.prefetch_time is not None and 
+            not (self._loop and not self._advance_after_eos)):
+            duration = self._sources[0].duration
+            if (duration is not None and 
+                data.timestamp + data.duration >= 
+                    duration - self.prefetch_time):
+                self._start_prefetch()
+
         eos = False
         while not data:
             eos = True
@@ -747,6 +2212,7 @@ class SourceGroup(object):
                 self._timestamp_offset += self._sources[0].duration
                 self._dequeued_durations.insert(0, self._sources[0].duration)
                 self._sources[0].seek(0)
+                self._reset_converter()
             else:
                 self._advance_after_eos = False
 
@@ -757,7 +2223,7 @@ class SourceGroup(object):
                 else:
                     return None
                 
-            data = self._sources[0].get_audio_data(bytes) # TODO method rename
+            data = self._get_source_audio_data(bytes) # TODO method rename
 
         data.timestamp += self._timestamp_offset
         if eos:
@@ -808,6 +2274,31 @@ class SourceGroup(object):
         '''
         return self._sources[0].get_next_video_frame()
 
+    def skip_video_frames(self, timestamp):
+        '''Discard video frames of the current source earlier than the
+        given group timestamp.
+
+        :Parameters:
+            `timestamp` : float
+                Time of the next frame wanted, in seconds.
+
+        :rtype: int
+        :return: The number of frames discarded.
+        '''
+        return self._sources[0].skip_video_frames(
+            timestamp - self._timestamp_offset)
+
+    def release_video_frame(self, image):
+        '''Return a video frame obtained from `get_next_video_frame`.
+
+        :Parameters:
+            `image` : `pyglet.image.AbstractImage`
+                Image that is no longer needed.
+
+        '''
+        if self._sources:
+            self._sources[0].release_video_frame(image)
+
 class AbstractAudioPlayer(object):
     '''Base class for driver audio players.
     '''
@@ -856,6 +2347,23 @@ class AbstractAudioPlayer(object):
         '''
         raise NotImplementedError('abstract')
 
+    def seek(self, timestamp):
+        '''Seek the source group and clear all buffered data.
+
+        The default implementation calls `SourceGroup.seek` and then
+        `clear`.  Players that read the source group on another thread
+        override it so that the group is not read while it is seeked.
+
+        :since: pyglet 1.2
+
+        :Parameters:
+            `timestamp` : float
+                Time to seek to, in seconds.
+
+        '''
+        self.source_group.seek(timestamp)
+        self.clear()
+
     def get_time(self):
         '''Return approximation of current playback time within current source.
 
@@ -949,6 +2457,16 @@ class Player(pyglet.event.EventDispatcher):
     #: :deprecated:
     _eos_action = EOS_NEXT
 
+    #: Audio driver used to play this player's audio, or None for the
+    #: default driver.  Set to a `pyglet.media.mixer.MixerBus` to mix this
+    #: player with others into one driver stream, or to a
+    #: `pyglet.media.render.RenderDriver` to render it to files.  Takes
+    #: effect the next time the player creates an audio player (when it
+    #: starts playing a new source group).
+    #:
+    #: :since: pyglet 1.2
+    audio_driver = None
+
     def __init__(self):
         # List of queued source groups
         self._groups = []
@@ -961,9 +2479,7 @@ class Player(pyglet.event.EventDispatcher):
         self._paused_time = 0.0
 
     def queue(self, source):
-        if (self._groups and
-            source.audio_format == self._groups[-1].audio_format and
-            source.video_format == self._groups[-1].video_format):
+        if self._groups and self._groups[-1].can_queue(source):
             self._groups[-1].queue(source)
         else:
             group = SourceGroup(source.audio_format, source.video_format)
@@ -985,7 +2501,7 @@ class Player(pyglet.event.EventDispatcher):
                 self._create_audio_player()
             self._audio_player.play()
 
-            if source.video_format:
+            if source.video_format and not self._is_offline():
                 if not self._texture:
                     self._create_texture()
 
@@ -1046,9 +2562,11 @@ class Player(pyglet.event.EventDispatcher):
             print 'Player.seek(%r)' % time
 
         self._paused_time = time
-        self.source.seek(time)
-        if self._audio_player: self._audio_player.clear()
-        if self.source.video_format:
+        if self._audio_player:
+            self._audio_player.seek(time)
+        else:
+            self._groups[0].seek(time)
+        if self.source.video_format and not self._is_offline():
             self._last_video_timestamp = None
             self.update_texture(time=time)
 
@@ -1059,7 +2577,9 @@ class Player(pyglet.event.EventDispatcher):
         group = self._groups[0]
         audio_format = group.audio_format
         if audio_format:
-            audio_driver = get_audio_driver()
+            audio_driver = self.audio_driver or get_audio_driver()
+        elif self._is_offline():
+            audio_driver = self.audio_driver
         else:
             audio_driver = get_silent_audio_driver()
         self._audio_player = audio_driver.create_audio_player(group, self)
@@ -1080,6 +2600,10 @@ class Player(pyglet.event.EventDispatcher):
         _set('cone_outer_angle')
         _set('cone_outer_gain')
 
+    def _is_offline(self):
+        # True if the audio driver renders video frames itself.
+        return self.audio_driver is not None and self.audio_driver.offline
+
     def _get_source(self):
         if not self._groups:
             return None
@@ -1133,10 +2657,8 @@ class Player(pyglet.event.EventDispatcher):
                 time <= self._last_video_timestamp):
                 return
 
+            self._groups[0].skip_video_frames(time)
             ts = self._groups[0].get_next_video_timestamp()
-            while ts is not None and ts < time:
-                self._groups[0].get_next_video_frame() # Discard frame
-                ts = self._groups[0].get_next_video_timestamp()
 
             if ts is None:
                 self._last_video_timestamp = None
@@ -1146,7 +2668,24 @@ class Player(pyglet.event.EventDispatcher):
         if image is not None:
             if self._texture is None:
                 self._create_texture()
-            self._texture.blit_into(image, 0, 0, 0)
+
+            timings = get_video_timings()
+            if timings:
+                start = _timer()
+                if isinstance(image, pyglet.image.YUVImageData):
+                    # YUV frame: convert now to time it separately
+                    image._ensure_rgb()
+                    end = _timer()
+                    timings.record('convert', end - start)
+                    start = end
+                self._texture.blit_into(image, 0, 0, 0)
+                timings.record('upload', _timer() - start)
+                if not _profile:
+                    timings.record('present', max(0., time - ts))
+            else:
+                self._texture.blit_into(image, 0, 0, 0)
+
+            self._groups[0].release_video_frame(image)
             self._last_video_timestamp = ts
 
     def _set_eos_action(self, eos_action):
@@ -1276,6 +2815,14 @@ class PlayerGroup(object):
             player.pause()
 
 class AbstractAudioDriver(object):
+    #: True if the driver renders source groups faster than real time
+    #: instead of playing them.  Such a driver also times source groups
+    #: without audio, and takes their video frames itself, so a player using
+    #: it does not update its texture.
+    #:
+    #: :since: pyglet 1.2
+    offline = False
+
     def create_audio_player(self, source_group, player):
         raise NotImplementedError('abstract')
 
@@ -1393,14 +2940,16 @@ class RIFFSourceLoader(AbstractSourceLoader):
 def load(filename, file=None, streaming=True):
     '''Load a source from a file.
 
-    Currently the `file` argument is not supported; media files must exist
-    as real paths.
-
     :Parameters:
         `filename` : str
-            Filename of the media file to load.
+            Filename of the media file to load.  If `file` is given, the
+            filename is only used as a hint of the file format.
         `file` : file-like object
-            Not yet supported.
+            Optional file object to read the media from.  AVbin can only
+            open files by name, so when it is used the whole contents of
+            the file object (or in-memory buffer, such as a ``StringIO``)
+            are first copied to a temporary file, which is removed when the
+            source is deleted.
         `streaming` : bool
             If False, a `StaticSource` will be returned; otherwise (default) a
             `StreamingSource` is created.
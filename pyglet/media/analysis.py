@@ -0,0 +1,271 @@
+# ----------------------------------------------------------------------------
+# pyglet
+# Copyright (c) 2006-2008 Alex Holkner
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions 
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of pyglet nor the names of its
+#    contributors may be used to endorse or promote products
+#    derived from this software without specific prior written
+#    permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ----------------------------------------------------------------------------
+
+
+'''Loudness and waveform analysis of sources.
+
+`analyse` reads a source to its end, without playing it, and measures its
+peak and RMS level along with a coarse waveform overview suitable for
+drawing a scrub bar::
+
+    levels = analysis.analyse(media.load('speech.ogg'), buckets=200)
+    gain = 0.1 / levels.rms
+
+Audio is converted to 16-bit samples and measured a packet at a time with
+the `audioop` module, so memory use does not grow with the length of the
+source.  No audio driver or window is needed.  For audio that does not come
+from a source, feed packets to an `AudioAnalyser` directly.
+
+:since: pyglet 1.2
+'''
+
+__docformat__ = 'restructuredtext'
+__version__ = '$Id: $'
+
+import audioop
+import math
+
+from pyglet.media import AudioConverter, AudioFormat
+
+class AudioAnalysis(object):
+    '''Levels measured by an `AudioAnalyser`.
+
+    Levels are given as a fraction of full scale, over all channels.
+
+    :Ivariables:
+        `duration` : float
+            Length of audio analysed, in seconds.
+        `peak` : float
+            Largest absolute sample value, between 0 and 1.
+        `rms` : float
+            Root mean square sample value, between 0 and 1.
+        `bucket_duration` : float
+            Length of each bucket of `buckets`, in seconds.  The last bucket
+            may be shorter.
+        `buckets` : list of (float, float, float)
+            Waveform overview; for each consecutive period of
+            `bucket_duration` seconds, a tuple of the minimum sample value
+            (between -1 and 0), maximum sample value (between 0 and 1) and
+            RMS sample value (between 0 and 1).
+
+    '''
+    def __init__(self, duration, peak, rms, bucket_duration, buckets):
+        self.duration = duration
+        self.peak = peak
+        self.rms = rms
+        self.bucket_duration = bucket_duration
+        self.buckets = buckets
+
+    peak_db = property(lambda self: _to_db(self.peak),
+                       doc='''Peak level in decibels relative to full scale.
+
+    :type: float
+    ''')
+
+    rms_db = property(lambda self: _to_db(self.rms),
+                      doc='''RMS level in decibels relative to full scale.
+
+    :type: float
+    ''')
+
+def _to_db(level):
+    if level <= 0:
+        return float('-inf')
+    return 20 * math.log10(level)
+
+class AudioAnalyser(object):
+    '''Accumulate levels of a stream of audio data.
+
+    Pass each packet to `add` in order, then call `get_result`.  Only the
+    waveform buckets are kept, so any length of audio can be analysed.
+
+    If the duration of the stream is not known in advance, buckets start
+    short and are merged in pairs whenever there are twice as many as
+    asked for; the result then has between `buckets` and twice `buckets`
+    buckets.
+
+    :Ivariables:
+        `audio_format` : `AudioFormat`
+            Format of data passed to `add`.
+        `buckets` : int
+            Number of waveform buckets wanted.
+
+    '''
+    #: Length of the first bucket, in seconds, when the duration of the
+    #: stream is not known.
+    initial_bucket_duration = 0.01
+
+    def __init__(self, audio_format, buckets=100, duration=None):
+        assert buckets > 0
+        self.audio_format = audio_format
+        self.buckets = buckets
+        self._duration = duration
+
+        channels = min(audio_format.channels, 2)
+        self._format = AudioFormat(channels, 16, audio_format.sample_rate)
+        self._converter = AudioConverter(audio_format, self._format)
+
+        if duration:
+            frames = int(math.ceil(duration * audio_format.sample_rate))
+            self._bucket_frames = max(1, 
+                int(math.ceil(frames / float(buckets))))
+        else:
+            self._bucket_frames = max(1, 
+                int(self.initial_bucket_duration * audio_format.sample_rate))
+
+        self._frames = 0
+        self._peak = 0
+        self._sum_squares = 0.
+
+        # Completed buckets as [minimum, maximum, sum of squares, frames];
+        # the current bucket is kept separately.
+        self._buckets = []
+        self._bucket = None
+
+    def add(self, audio_data):
+        '''Add a packet of audio data.
+
+        :Parameters:
+            `audio_data` : `AudioData`
+                Next packet, in `audio_format`.
+
+        '''
+        self.add_string(audio_data.get_string_data())
+
+    def add_string(self, data):
+        '''Add a string of samples.
+
+        :Parameters:
+            `data` : str
+                Next samples, in `audio_format`.  They need not end on a
+                sample boundary.
+
+        '''
+        data = self._converter.convert(data)
+        if not data:
+            return
+
+        bytes_per_frame = self._format.bytes_per_sample
+        frames = len(data) // bytes_per_frame
+        self._frames += frames
+        self._peak = max(self._peak, audioop.max(data, 2))
+        self._sum_squares += \
+            float(audioop.rms(data, 2)) ** 2 * (len(data) // 2)
+
+        offset = 0
+        while offset < len(data):
+            bucket = self._bucket
+            if bucket is None:
+                bucket = self._bucket = [0, 0, 0., 0]
+            count = min(self._bucket_frames - bucket[3], 
+                        (len(data) - offset) // bytes_per_frame)
+            end = offset + count * bytes_per_frame
+            chunk = data[offset:end]
+            minimum, maximum = audioop.minmax(chunk, 2)
+            bucket[0] = min(bucket[0], minimum)
+            bucket[1] = max(bucket[1], maximum)
+            bucket[2] += float(audioop.rms(chunk, 2)) ** 2 * (len(chunk) // 2)
+            bucket[3] += count
+            offset = end
+
+            if bucket[3] == self._bucket_frames:
+                self._buckets.append(bucket)
+                self._bucket = None
+                if not self._duration and \
+                   len(self._buckets) >= 2 * self.buckets:
+                    self._merge_buckets()
+
+    def _merge_buckets(self):
+        # Halve the number of buckets by combining neighbours.
+        buckets = self._buckets
+        self._buckets = [[min(a[0], b[0]), max(a[1], b[1]), 
+                          a[2] + b[2], a[3] + b[3]]
+                         for a, b in zip(buckets[0::2], buckets[1::2])]
+        self._bucket_frames *= 2
+
+    def get_result(self):
+        '''Get the levels of the audio added so far.
+
+        :rtype: `AudioAnalysis`
+        '''
+        buckets = list(self._buckets)
+        if self._bucket:
+            buckets.append(self._bucket)
+
+        channels = self._format.channels
+        rate = float(self._format.sample_rate)
+        samples = self._frames * channels
+        if samples:
+            rms = math.sqrt(self._sum_squares / samples) / 32768
+        else:
+            rms = 0.
+        overview = [(minimum / 32768., maximum / 32768.,
+                     math.sqrt(sum_squares / (frames * channels)) / 32768)
+                    for minimum, maximum, sum_squares, frames in buckets]
+        return AudioAnalysis(self._frames / rate, self._peak / 32768., rms,
+                             self._bucket_frames / rate, overview)
+
+def analyse(source, buckets=100, packet_size=65536):
+    '''Measure the levels of a source.
+
+    The source is read from its current position to its end.  Video frames
+    are decoded only as far as is needed to keep the audio flowing.
+
+    :Parameters:
+        `source` : `Source`
+            Source to analyse.  Streaming sources cannot be reused
+            afterwards.
+        `buckets` : int
+            Number of waveform overview buckets wanted.
+        `packet_size` : int
+            Number of bytes of audio to request from the source at a time.
+
+    :rtype: `AudioAnalysis`
+    :return: The levels of the source, or None if it has no audio.
+    '''
+    source = source._get_queue_source()
+    if not source.audio_format:
+        return None
+
+    analyser = AudioAnalyser(source.audio_format, buckets, source.duration)
+    while True:
+        audio_data = source.get_audio_data(packet_size)
+        if not audio_data:
+            break
+        analyser.add(audio_data)
+        audio_data.release()
+        if source.video_format:
+            source.skip_video_frames(
+                audio_data.timestamp + audio_data.duration)
+    return analyser.get_result()
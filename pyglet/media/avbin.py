@@ -33,6 +33,27 @@
 # ----------------------------------------------------------------------------
 
 '''Use avbin to decode audio and video media.
+
+Locking
+-------
+
+When decoding is multithreaded, calls into AVbin are serialised with locks.
+FFmpeg allows different files, and different streams within a file, to be
+used from different threads at once; only opening and closing files and
+codecs must be serialised globally.  The locking policy is selected by the
+module variable `lock_mode`, which must be set before any source is loaded:
+
+``'stream'`` (default)
+    Opening and closing files and streams is serialised by one global lock.
+    Each source has a file lock for demuxing and seeking, and one lock per
+    decoded stream.  Sources never block each other while decoding, and a
+    source's video decoder does not block its own demuxer or audio decoder.
+``'global'``
+    Every AVbin call takes the same global lock (the behaviour of earlier
+    pyglet versions).
+
+The number of times a thread had to wait for one of these locks is reported
+by `get_lock_stats`.
 '''
 
 __docformat__ = 'restructuredtext'
@@ -42,8 +63,14 @@ import pyglet
 _profile = pyglet.options['profile_media']
 _multithreaded = True
 
+#: Locking policy for AVbin calls; either ``'stream'`` or ``'global'``.
+lock_mode = 'stream'
+
 
+import bisect
 import ctypes
+import os
+import tempfile
 import threading
 import time
 
@@ -53,7 +80,9 @@ from pyglet import image
 import pyglet.lib
 from pyglet.media import \
     MediaFormatException, StreamingSource, VideoFormat, AudioFormat, \
-    AudioData, MediaEvent, WorkerThread, SourceInfo
+    AudioData, AudioConverter, MediaEvent, MediaThread, SourceInfo, \
+    VideoFrameBufferPool, get_video_decode_pool, get_video_frame_cache, \
+    get_video_timings
 
 av = pyglet.lib.load_library('avbin', 
                              darwin='/usr/local/lib/libavbin.dylib')
@@ -182,11 +211,113 @@ av.avbin_decode_video.argtypes = [AVbinStreamP,
     ctypes.c_void_p, ctypes.c_size_t,
     ctypes.c_void_p]
 
+# Optional: decode to planar YUV 4:2:0 without colourspace conversion.  This
+# entry point is not part of any AVbin release; it is only bound if a locally
+# patched AVbin exports it.  Stock AVbin always decodes to RGB.
+_have_yuv_output = hasattr(av, 'avbin_decode_video_yuv420p')
+if _have_yuv_output:
+    av.avbin_decode_video_yuv420p.restype = ctypes.c_int
+    av.avbin_decode_video_yuv420p.argtypes = [AVbinStreamP,
+        ctypes.c_void_p, ctypes.c_size_t,
+        ctypes.c_void_p]
+
+
+class AVbinLock(object):
+    '''A lock that counts how often it had to be waited for.
+
+    :Ivariables:
+        `name` : str
+            Description of what the lock protects, for diagnostics.
+        `acquisitions` : int
+            Number of times the lock was acquired.
+        `contentions` : int
+            Number of acquisitions that had to wait for another thread.
+        `wait_time` : float
+            Total time spent waiting, in seconds.
+
+    '''
+    def __init__(self, name):
+        self.name = name
+        self.acquisitions = 0
+        self.contentions = 0
+        self.wait_time = 0.
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self._lock.acquire(False):
+            self.acquisitions += 1
+            return
+
+        start = time.time()
+        self._lock.acquire()
+        wait_time = time.time() - start
+        self.acquisitions += 1
+        self.contentions += 1
+        self.wait_time += wait_time
+
+        _lock_stats_lock.acquire()
+        _lock_stats['contentions'] += 1
+        _lock_stats['wait_time'] += wait_time
+        _lock_stats_lock.release()
+
+    def release(self):
+        self._lock.release()
+
+    def __repr__(self):
+        return '%s(%r, acquisitions=%d, contentions=%d)' % (
+            self.__class__.__name__, self.name, self.acquisitions,
+            self.contentions)
+
+_lock_stats_lock = threading.Lock()
+_lock_stats = {
+    'contentions': 0,
+    'wait_time': 0.,
+}
+
+def get_lock_stats():
+    '''Get the number of contended AVbin lock acquisitions.
+
+    Counts cover all locks (global, file and stream) of all sources since
+    the module was loaded or `reset_lock_stats` was last called.  See
+    `AVbinSource.get_locks` for the locks of a single source.
+
+    :rtype: dict
+    :return: Dictionary with keys ``contentions`` and ``wait_time`` (in
+        seconds).
+    '''
+    _lock_stats_lock.acquire()
+    stats = dict(_lock_stats)
+    _lock_stats_lock.release()
+    return stats
+
+def reset_lock_stats():
+    '''Reset the counters returned by `get_lock_stats`.'''
+    _lock_stats_lock.acquire()
+    _lock_stats['contentions'] = 0
+    _lock_stats['wait_time'] = 0.
+    _lock_stats_lock.release()
+
+_avbin_lock = AVbinLock('global')
+
+def _create_lock(name):
+    if lock_mode == 'global':
+        return _avbin_lock
+    return AVbinLock(name)
+
+def _acquire_locks(locks):
+    # Acquire each distinct lock once, in the given order.
+    acquired = []
+    for lock in locks:
+        if lock is not None and lock not in acquired:
+            lock.acquire()
+            acquired.append(lock)
+    return acquired
+
+def _release_locks(acquired):
+    for lock in acquired[::-1]:
+        lock.release()
 
 if _multithreaded:
-    # XXX lock all avbin calls.  not clear from ffmpeg documentation if this
-    # is necessary.  leaving it on while debugging to rule out the possiblity
-    # of a problem.
     def synchronize(func, lock):
         def f(*args):
             lock.acquire()
@@ -195,10 +326,16 @@ if _multithreaded:
             return result
         return f 
 
-    _avbin_lock = threading.Lock()
-    for name in dir(av):
-        if name.startswith('avbin_'):
-            setattr(av, name, synchronize(getattr(av, name), _avbin_lock))
+    # Opening and closing formats and codecs is not thread-safe in FFmpeg;
+    # all other calls are locked per file or per stream by AVbinSource.
+    for name in ('avbin_init',
+                 'avbin_set_log_level',
+                 'avbin_set_log_callback',
+                 'avbin_open_filename',
+                 'avbin_close_file',
+                 'avbin_open_stream',
+                 'avbin_close_stream'):
+        setattr(av, name, synchronize(getattr(av, name), _avbin_lock))
 
 def get_version():
     return av.avbin_get_version()
@@ -212,30 +349,452 @@ def timestamp_from_avbin(timestamp):
 def timestamp_to_avbin(timestamp):
     return int(timestamp * 1000000)
 
+class KeyframeIndex(object):
+    '''Sorted list of known keyframe timestamps of a video stream.
+
+    AVbin does not report which packets are keyframes, but a seek always
+    lands on one: the index is filled with the timestamp of the first video
+    packet read after each seek.  An index can be saved to and loaded from
+    a small sidecar file.
+
+    :Ivariables:
+        `timestamps` : list of float
+            Known keyframe timestamps, in ascending order.
+        `complete` : bool
+            True if the whole file has been probed for keyframes.
+
+    '''
+    _header = 'pyglet keyframe index 1'
+
+    def __init__(self):
+        self.timestamps = []
+        self.complete = False
+        self._lock = threading.Lock()
+
+    def add(self, timestamp):
+        '''Record a keyframe timestamp.'''
+        self._lock.acquire()
+        i = bisect.bisect_left(self.timestamps, timestamp)
+        if i == len(self.timestamps) or self.timestamps[i] != timestamp:
+            self.timestamps.insert(i, timestamp)
+        self._lock.release()
+
+    def find(self, timestamp):
+        '''Find the last known keyframe at or before a timestamp.
+
+        :rtype: float
+        :return: The keyframe timestamp, or None if none is known.
+        '''
+        self._lock.acquire()
+        i = bisect.bisect_right(self.timestamps, timestamp)
+        if i:
+            result = self.timestamps[i - 1]
+        else:
+            result = None
+        self._lock.release()
+        return result
+
+    def _get_signature(self, media_filename):
+        st = os.stat(media_filename)
+        return '%d %d' % (st.st_size, int(st.st_mtime))
+
+    def load(self, filename, media_filename):
+        '''Load a complete index saved with `save`.
+
+        :Parameters:
+            `filename` : str
+                Filename of the index.
+            `media_filename` : str
+                Filename of the indexed media; the index is rejected if the
+                media has changed since it was saved.
+
+        :rtype: bool
+        :return: True if the index was loaded.
+        '''
+        try:
+            file = open(filename, 'r')
+            try:
+                lines = file.read().splitlines()
+            finally:
+                file.close()
+            if (len(lines) < 2 or lines[0] != self._header or 
+                lines[1] != self._get_signature(media_filename)):
+                return False
+            timestamps = [float(line) for line in lines[2:]]
+        except (IOError, OSError, ValueError):
+            return False
+
+        for timestamp in timestamps:
+            self.add(timestamp)
+        self.complete = True
+        return True
+
+    def save(self, filename, media_filename):
+        '''Save the index to a file.
+
+        :Parameters:
+            `filename` : str
+                Filename of the index.
+            `media_filename` : str
+                Filename of the indexed media.
+
+        :rtype: bool
+        :return: True if the index was saved.
+        '''
+        try:
+            signature = self._get_signature(media_filename)
+        except OSError:
+            return False
+
+        self._lock.acquire()
+        lines = [self._header, signature]
+        lines.extend(['%r' % timestamp for timestamp in self.timestamps])
+        self._lock.release()
+        try:
+            file = open(filename, 'w')
+            try:
+                file.write('\n'.join(lines) + '\n')
+            finally:
+                file.close()
+        except (IOError, OSError):
+            return False
+        return True
+
+class PacketBuffer(object):
+    '''Reference-counted buffer holding the payload of a demuxed packet or
+    decoded audio.
+
+    Buffers are obtained from a `PacketBufferPool` and return to it
+    when the last reference is released.
+
+    :Ivariables:
+        `data` : ctypes array
+            Packet payload, followed by at least `_packet_padding` zero
+            bytes.
+        `capacity` : int
+            Size of `data` available for payload, in bytes.
+
+    '''
+    def __init__(self, pool, capacity):
+        self.pool = pool
+        self.capacity = capacity
+        self.data = (ctypes.c_uint8 * (capacity + _packet_padding))()
+        self._refs = 0
+
+    def acquire(self):
+        self.pool._lock.acquire()
+        self._refs += 1
+        self.pool._lock.release()
+
+    def release(self):
+        self.pool._lock.acquire()
+        self._refs -= 1
+        refs = self._refs
+        self.pool._lock.release()
+        assert refs >= 0, 'Packet buffer released too many times'
+        if refs == 0:
+            self.pool._put(self)
+
+class PacketBufferPool(object):
+    '''Arena of reusable packet buffers.
+
+    Buffer capacities are rounded up to a power of two so that buffers can
+    be reused by packets of similar size.  Released buffers are retained
+    until `max_size` bytes are held in the free lists; any further buffers
+    are left to the garbage collector.
+
+    The pool keeps counters of the bytes it copies and allocates; see
+    `get_stats`.
+    '''
+
+    #: Smallest buffer capacity handed out, in bytes.
+    min_capacity = 4096
+
+    def __init__(self, max_size=32 << 20):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._free = {}
+        self._free_size = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        '''Reset all counters to zero.'''
+        self._lock.acquire()
+        self._stats_time = time.time()
+        self.bytes_copied = 0
+        self.bytes_allocated = 0
+        self.allocations = 0
+        self.reuses = 0
+        self._lock.release()
+
+    def get_stats(self):
+        '''Get the pool counters.
+
+        Rates are averaged over the time since the pool was created or
+        `reset_stats` was last called.
+
+        :rtype: dict
+        :return: Dictionary with keys ``bytes_copied``, ``bytes_allocated``,
+            ``allocations``, ``reuses``, ``free_bytes``,
+            ``bytes_copied_per_second`` and
+            ``bytes_allocated_per_second``.
+        '''
+        self._lock.acquire()
+        elapsed = max(time.time() - self._stats_time, 1e-6)
+        stats = {
+            'bytes_copied': self.bytes_copied,
+            'bytes_allocated': self.bytes_allocated,
+            'allocations': self.allocations,
+            'reuses': self.reuses,
+            'free_bytes': self._free_size,
+            'bytes_copied_per_second': self.bytes_copied / elapsed,
+            'bytes_allocated_per_second': self.bytes_allocated / elapsed,
+        }
+        self._lock.release()
+        return stats
+
+    def copy_packet(self, packet):
+        '''Copy the payload of an `AVbinPacket` into a pooled buffer.
+
+        AVbin reuses the packet data on the next call to ``avbin_read``, so
+        one copy is unavoidable; the buffer it is copied into is recycled.
+
+        :rtype: `PacketBuffer`
+        :return: A buffer holding one reference.
+        '''
+        return self.copy(packet.data, packet.size)
+
+    def copy(self, data, size):
+        '''Copy `size` bytes from a ctypes object or address into a pooled
+        buffer.
+
+        :rtype: `PacketBuffer`
+        :return: A buffer holding one reference.
+        '''
+        capacity = self.min_capacity
+        while capacity < size:
+            capacity <<= 1
+
+        self._lock.acquire()
+        free = self._free.get(capacity)
+        if free:
+            buffer = free.pop()
+            self._free_size -= capacity
+            self.reuses += 1
+        else:
+            buffer = None
+            self.allocations += 1
+            self.bytes_allocated += capacity + _packet_padding
+        self.bytes_copied += size
+        self._lock.release()
+
+        if buffer is None:
+            buffer = PacketBuffer(self, capacity)
+        buffer._refs = 1
+
+        ctypes.memmove(buffer.data, data, size)
+        # Decoders may read past the end of the packet; keep the padding
+        # zeroed as FFmpeg requires.
+        ctypes.memset(ctypes.addressof(buffer.data) + size, 0,
+                      _packet_padding)
+        return buffer
+
+    def _put(self, buffer):
+        self._lock.acquire()
+        if self._free_size + buffer.capacity <= self.max_size:
+            self._free.setdefault(buffer.capacity, []).append(buffer)
+            self._free_size += buffer.capacity
+        self._lock.release()
+
+    def clear(self):
+        '''Discard all free buffers.'''
+        self._lock.acquire()
+        self._free.clear()
+        self._free_size = 0
+        self._lock.release()
+
+# FFmpeg's FF_INPUT_BUFFER_PADDING_SIZE.
+_packet_padding = 16
+
+_packet_buffer_pool = PacketBufferPool()
+_audio_buffer_pool = PacketBufferPool()
+
+def get_packet_buffer_stats():
+    '''Get copy and allocation counters for demuxed video packets.
+
+    See `PacketBufferPool.get_stats`.
+
+    :rtype: dict
+    '''
+    return _packet_buffer_pool.get_stats()
+
+def get_audio_buffer_stats():
+    '''Get copy and allocation counters for decoded audio.
+
+    See `PacketBufferPool.get_stats`.
+
+    :rtype: dict
+    '''
+    return _audio_buffer_pool.get_stats()
+
 class VideoPacket(object):
     _next_id = 0
 
     def __init__(self, packet):
         self.timestamp = timestamp_from_avbin(packet.timestamp)
-        self.data = (ctypes.c_uint8 * packet.size)()
+        self._buffer = _packet_buffer_pool.copy_packet(packet)
+        self.data = self._buffer.data
         self.size = packet.size
-        ctypes.memmove(self.data, packet.data, self.size)
 
         # Decoded image.  0 == not decoded yet; None == Error or discarded
         self.image = 0
 
+        # True if the packet must still be decoded (to keep the decoder's
+        # reference frames intact) but no image is wanted.
+        self.discard = False
+
+        # True if the packet is discarded and a later discarded packet is a
+        # known keyframe, so the decoder need not see it at all.
+        self.skip_decode = False
+
+        # True if the packet is known to be a keyframe.
+        self.keyframe = False
+
         self.id = self._next_id
         self.__class__._next_id += 1
 
+    def release(self):
+        '''Return the packet payload to the pool.  The packet data must not
+        be used afterwards.'''
+        if self._buffer:
+            self.data = None
+            self._buffer.release()
+            self._buffer = None
+
 class AVbinSource(StreamingSource):
+    '''Source decoded by AVbin.
+
+    :Ivariables:
+        `dropped_frames` : int
+            Number of video frames discarded by `skip_video_frames`
+            without being returned as images.
+
+    '''
+
+    #: If True, frames discarded by `skip_video_frames` are not waited for
+    #: and no image is created for them.  Frames before the last known
+    #: keyframe (see `get_keyframe_index`) that is also discarded are not
+    #: decoded at all.  Other discarded frames must still be decoded, to
+    #: keep the decoder's reference frames correct; AVbin converts each
+    #: decoded frame to RGB in the same call, so for them only the
+    #: presentation is skipped.  If False, late frames are fully decoded
+    #: and returned to the pool like any other frame.
+    skip_late_frames = True
+
+    dropped_frames = 0
+
+    _output_yuv = False
+
+    #: True if the loaded AVbin library can decode video to planar YUV, so
+    #: that `output_yuv` can be set.  This requires an AVbin patched to
+    #: export ``avbin_decode_video_yuv420p``; it is always False with
+    #: released versions of AVbin.
+    can_output_yuv = _have_yuv_output
+
+    #: Size of the blocks copied from a file object to a temporary file, in
+    #: bytes.  Only applies to sources subsequently created with a ``file``
+    #: argument.
+    io_block_size = 64 << 10
+
+    _temp_filename = None
+    _filename = None
+
+    #: If True, the keyframe index of a video file opened by name is built
+    #: by a background thread on open.  See `build_keyframe_index`.
+    background_keyframe_index = False
+
+    #: If True, a completed keyframe index is saved to a sidecar file next
+    #: to the media file (with `keyframe_index_extension` appended to its
+    #: name), and loaded from there when the file is next opened.
+    cache_keyframe_index = False
+
+    #: Filename extension of keyframe index sidecar files.
+    keyframe_index_extension = '.keyframes'
+
+    #: Seeks at most this many seconds ahead of the current video position
+    #: decode forward instead of seeking the file, even if no keyframe is
+    #: known in between.
+    seek_decode_ahead_time = 0.5
+
+    _index_thread = None
+    _frame_cache = None
+
+    # Remaining (timestamp, image) of the cached run of frames being served
+    # instead of decoding, if any.
+    _cached_run = None
+
+    # Timestamps of the frames decoded since the last known keyframe, or
+    # None if decoding did not start at a keyframe.
+    _decoded_run = None
+
+    _timings = None
+    _audio_converter = None
+
+    # Maximum number of video packets waiting to be decoded; demuxing
+    # blocks until the decoder catches up.
+    _max_decode_jobs = 64
+
+    #: Maximum duration of audio, in seconds, buffered while reading ahead
+    #: for video.  When exceeded, reading ahead stops until audio is
+    #: consumed; until then, `get_next_video_timestamp` and
+    #: `get_next_video_frame` return None if no video frame is queued.
+    #: Buffered audio is never discarded.
+    max_audio_queue_time = 10.0
+
+    #: Maximum size of buffered audio, in bytes.  See
+    #: `max_audio_queue_time`.
+    max_audio_queue_bytes = 16 << 20
+
+    #: Maximum time span, in seconds, of queued video frames.  When
+    #: exceeded, `get_audio_data` stops reading ahead for video, unless no
+    #: audio is buffered; it then reads on until audio is found or
+    #: `max_video_queue_bytes` is reached.
+    max_video_queue_time = 5.0
+
+    #: Maximum size of queued video, in bytes, counting both the compressed
+    #: packets and their decoded frames.  If this is reached with no audio
+    #: buffered (in a gap of a sparse audio track), silence is returned so
+    #: that playback time can advance and the queued video be consumed;
+    #: audio found later that overlaps the silence is trimmed, so that it
+    #: keeps its timing.
+    max_video_queue_bytes = 256 << 20
+
     def __init__(self, filename, file=None):
-        if file is not None:
-            raise NotImplementedError('TODO: Load from file stream')
+        '''Open a media file.
+
+        :Parameters:
+            `filename` : str
+                Filename of the media file.  If `file` is given, this is
+                only used as a hint of the file format.
+            `file` : file-like object or str
+                Optional file object or string of data to read the media
+                from instead of the filename.  Its whole contents are
+                copied to a temporary file, as AVbin can only open files
+                by name.
 
-        self._file = av.avbin_open_filename(filename)
+        '''
+        if file is not None:
+            self._file = self._open_file(filename, file)
+        else:
+            self._file = av.avbin_open_filename(filename)
+            self._filename = filename
         if not self._file:
             raise AVbinException('Could not open "%s"' % filename)
 
+        self._file_lock = _create_lock('file %s' % filename)
+        self._video_lock = None
+        self._audio_lock = None
+
         self._video_stream = None
         self._video_stream_index = -1
         self._audio_stream = None
@@ -282,22 +841,38 @@ class AVbinSource(StreamingSource):
                             info.u.video.frame_rate_den)
                 self._video_stream = stream
                 self._video_stream_index = i
+                self._video_lock = _create_lock('video %s' % filename)
 
             elif (info.type == AVBIN_STREAM_TYPE_AUDIO and
-                  info.u.audio.sample_bits in (8, 16) and
-                  info.u.audio.channels in (1, 2) and 
+                  info.u.audio.sample_bits in (8, 16, 24, 32) and
+                  info.u.audio.channels > 0 and 
                   not self._audio_stream and not _profile):
 
                 stream = av.avbin_open_stream(self._file, i)
                 if not stream:
                     continue
 
-                self.audio_format = AudioFormat(
+                # Surround and 24 and 32-bit streams are converted to 16-bit
+                # stereo as they are decoded.
+                decoded_format = AudioFormat(
                     channels=info.u.audio.channels,
                     sample_size=info.u.audio.sample_bits,
                     sample_rate=info.u.audio.sample_rate)
+                float_samples = (info.u.audio.sample_format == 
+                                 AVBIN_SAMPLE_FORMAT_FLOAT)
+                sample_size = decoded_format.sample_size
+                if float_samples or sample_size not in (8, 16):
+                    sample_size = 16
+                self.audio_format = AudioFormat(
+                    channels=min(decoded_format.channels, 2),
+                    sample_size=sample_size,
+                    sample_rate=decoded_format.sample_rate)
+                if float_samples or self.audio_format != decoded_format:
+                    self._audio_converter = AudioConverter(decoded_format,
+                        self.audio_format, float_samples=float_samples)
                 self._audio_stream = stream
                 self._audio_stream_index = i
+                self._audio_lock = _create_lock('audio %s' % filename)
 
         self._packet = AVbinPacket()
         self._packet.structure_size = ctypes.sizeof(self._packet)
@@ -309,16 +884,70 @@ class AVbinSource(StreamingSource):
         self._video_timestamp = 0
         self._buffered_audio_data = []
 
+        # End time of the last audio data returned.
+        self._audio_timeend = 0.
+
+        # End time of silence returned for a gap in the audio, until audio
+        # after it is buffered.
+        self._silence_timeend = None
+
+        # Queue depth accounting; see get_queue_stats.
+        self._audio_queue_bytes = 0
+        self._audio_queue_time = 0.
+        self._video_queue_bytes = 0
+        self._queue_stats = {
+            'audio_stalls': 0,
+            'silence_inserted': 0,
+            'video_stalls': 0,
+        }
+
         if self.audio_format:
             self._audio_buffer = \
                 (ctypes.c_uint8 * av.avbin_get_audio_buffer_size())()
             
+        # Set when the next video packet read is known to be a keyframe.
+        self._expect_keyframe = True
+        self._keyframe_index = KeyframeIndex()
+
         if self.video_format:
+            self._frame_buffers = VideoFrameBufferPool(
+                self.video_format.width * self.video_format.height * 3)
             self._video_packets = []
-            self._decode_thread = WorkerThread()
-            self._decode_thread.start()
+            self._frame_cache = get_video_frame_cache()
+            self._timings = get_video_timings()
+            self._decode_thread = get_video_decode_pool().create_channel(
+                self._max_decode_jobs)
             self._condition = threading.Condition()
 
+            if self._filename:
+                if not (self.cache_keyframe_index and
+                        self._keyframe_index.load(
+                            self._get_keyframe_index_filename(),
+                            self._filename)):
+                    if self.background_keyframe_index:
+                        self.build_keyframe_index()
+
+    def _open_file(self, filename, file):
+        # AVbin can only open files by name, so copy the data to a temporary
+        # file, removed when the source is deleted.
+        if type(file) is not str and hasattr(file, 'getvalue'):
+            file = file.getvalue()
+
+        if _debug:
+            print 'AVbin cannot read file objects; using a temporary file'
+        fd, self._temp_filename = tempfile.mkstemp(
+            suffix=os.path.splitext(filename or '')[1])
+        temp_file = os.fdopen(fd, 'wb')
+        if type(file) is str:
+            temp_file.write(file)
+        else:
+            data = file.read(self.io_block_size)
+            while data:
+                temp_file.write(data)
+                data = file.read(self.io_block_size)
+        temp_file.close()
+        return av.avbin_open_filename(self._temp_filename)
+
     def __del__(self):
         if _debug:
             print 'del avbin source'
@@ -330,36 +959,188 @@ class AVbinSource(StreamingSource):
             av.avbin_close_file(self._file)
         except:
             pass
+        if self._frame_cache:
+            self._frame_cache.discard(id(self))
+        if self._temp_filename:
+            try:
+                os.remove(self._temp_filename)
+            except:
+                pass
 
     # XXX TODO call this / add to source api
     def delete(self):
         if self.video_format:
             self._decode_thread.stop()
+        if self._index_thread:
+            self._index_thread.stop()
+
+    def _get_keyframe_index_filename(self):
+        return self._filename + self.keyframe_index_extension
+
+    def build_keyframe_index(self, step=1.0):
+        '''Probe the file for keyframes in a background thread.
+
+        The file is opened a second time and seeked every `step` seconds;
+        the keyframe each seek lands on is added to the index.  Playback is
+        not interrupted.  When the index is complete it is saved if
+        `cache_keyframe_index` is set.
+
+        Only sources opened by filename can be indexed in the background;
+        otherwise the index is built as the source is seeked.
+
+        :Parameters:
+            `step` : float
+                Interval between probes, in seconds.  Keyframes spaced more
+                closely than this may be missed.
+
+        '''
+        if not self.video_format or not self._filename or self._index_thread:
+            return
+        self._index_thread = MediaThread(
+            target=lambda: self._index_keyframes(step))
+        self._index_thread.start()
+
+    def _index_keyframes(self, step):
+        file = av.avbin_open_filename(self._filename)
+        if not file:
+            return
+
+        index = self._keyframe_index
+        thread = self._index_thread
+        packet = AVbinPacket()
+        packet.structure_size = ctypes.sizeof(packet)
+        timestamp = 0.
+        while timestamp < self._duration and not thread.stopped:
+            av.avbin_seek_file(file, timestamp_to_avbin(timestamp))
+            while av.avbin_read(file, packet) == AVBIN_RESULT_OK:
+                if (packet.stream_index == self._video_stream_index and 
+                    packet.timestamp >= 0):
+                    index.add(timestamp_from_avbin(packet.timestamp))
+                    break
+            timestamp += step
+        av.avbin_close_file(file)
+
+        if not thread.stopped:
+            index.complete = True
+            if _debug:
+                print 'Keyframe index complete:', len(index.timestamps)
+            if self.cache_keyframe_index:
+                index.save(self._get_keyframe_index_filename(), 
+                           self._filename)
+
+    def get_keyframe_index(self):
+        '''Get the keyframe index of the video stream.
+
+        :rtype: `KeyframeIndex`
+        '''
+        return self._keyframe_index
+
+    def _get_video_position(self):
+        # Timestamp of the next video frame to be returned, if known.
+        if self._video_packets:
+            return self._video_packets[0].timestamp
+        if self._expect_keyframe:
+            return None
+        return self._video_timestamp
+
+    def _seek_forward(self, timestamp):
+        # Reach `timestamp` by decoding forward from the current position,
+        # without seeking the file.  Returns False if that is not cheaper
+        # than a seek.
+        position = self._get_video_position()
+        if position is None or timestamp < position:
+            return False
+
+        keyframe = self._keyframe_index.find(timestamp)
+        if (timestamp - position > self.seek_decode_ahead_time and
+            (keyframe is None or keyframe > position)):
+            return False
+
+        if _debug:
+            print 'AVbin seek forward from', position, 'to', timestamp
+        self.skip_video_frames(timestamp)
+        while (self._buffered_audio_data and
+               self._buffered_audio_data[0].timestamp + 
+               self._buffered_audio_data[0].duration <= timestamp):
+            self._pop_audio_data().release()
+        self._audio_timeend = timestamp
+        self._silence_timeend = None
+        while self._events and self._events[0].timestamp < timestamp:
+            del self._events[0]
+        return True
 
     def seek(self, timestamp):
         if _debug:
             print 'AVbin seek', timestamp
+
+        if self.video_format and self._seek_forward(timestamp):
+            return
+
+        # Seeking flushes the decoders of all open streams.
+        locks = _acquire_locks(
+            [self._file_lock, self._video_lock, self._audio_lock])
         av.avbin_seek_file(self._file, timestamp_to_avbin(timestamp))
+        _release_locks(locks)
+        self._expect_keyframe = True
 
         self._audio_packet_size = 0
+        if self._audio_converter:
+            self._audio_converter.reset()
         del self._events[:]
+        for audio_data in self._buffered_audio_data:
+            audio_data.release()
         del self._buffered_audio_data[:]
+        self._audio_queue_bytes = 0
+        self._audio_queue_time = 0.
+        self._audio_timeend = timestamp
+        self._silence_timeend = None
 
         if self.video_format:
             self._video_timestamp = 0
+            self._cached_run = None
+            self._decoded_run = None
             self._condition.acquire()
             for packet in self._video_packets:
+                packet.discard = True
+                if packet.image:
+                    self.release_video_frame(packet.image)
                 packet.image = None
             self._condition.notify()
             self._condition.release()
-            del self._video_packets[:]
+            packets = self._video_packets
+            self._video_packets = []
+            self._video_queue_bytes = 0
 
             self._decode_thread.clear_jobs()
 
+            # Packets whose decode job was cleared still hold pooled
+            # buffers.  Release them on the decoder thread, after any
+            # decode job currently in progress has finished with its data.
+            if _multithreaded:
+                self._decode_thread.put_job(
+                    lambda: self._release_video_packets(packets))
+            else:
+                self._release_video_packets(packets)
+
+    def _release_video_packets(self, packets):
+        for packet in packets:
+            packet.release()
+
     def _get_packet(self):
         # Read a packet into self._packet.  Returns True if OK, False if no
         # more packets are in stream.
-        return av.avbin_read(self._file, self._packet) == AVBIN_RESULT_OK
+        if self._timings:
+            start = time.time()
+        self._file_lock.acquire()
+        result = av.avbin_read(self._file, self._packet)
+        self._file_lock.release()
+        if self._timings:
+            self._timings.record('demux', time.time() - start)
+        if result != AVBIN_RESULT_OK and self._decoded_run:
+            # The last run of frames ends at the end of the file.
+            self._frame_cache.put_run(id(self), self._decoded_run)
+            self._decoded_run = None
+        return result == AVBIN_RESULT_OK
 
     def _process_packet(self):
         # Returns (packet_type, packet), where packet_type = 'video' or
@@ -380,6 +1161,14 @@ class AVbinSource(StreamingSource):
 
             video_packet = VideoPacket(self._packet)
 
+            if self._expect_keyframe:
+                self._keyframe_index.add(video_packet.timestamp)
+                self._expect_keyframe = False
+                video_packet.keyframe = True
+            else:
+                video_packet.keyframe = (video_packet.timestamp == 
+                    self._keyframe_index.find(video_packet.timestamp))
+
             if _debug:
                 print 'Created and queued frame %d (%f)' % \
                     (video_packet.id, video_packet.timestamp)
@@ -387,6 +1176,15 @@ class AVbinSource(StreamingSource):
             self._video_timestamp = max(self._video_timestamp,
                                         video_packet.timestamp)
             self._video_packets.append(video_packet)
+            self._video_queue_bytes += \
+                video_packet.size + self._frame_buffers.size
+
+            if self._frame_cache:
+                image = self._get_cached_frame(video_packet)
+                if image is not None:
+                    video_packet.image = image
+                    video_packet.release()
+                    return 'video', video_packet
             
             if _multithreaded:
                 self._decode_thread.put_job(
@@ -399,14 +1197,153 @@ class AVbinSource(StreamingSource):
             if audio_data:
                 if _debug:
                     print 'Got an audio packet at', audio_data.timestamp
-                self._buffered_audio_data.append(audio_data)
-                return 'audio', audio_data
+                if self._buffer_audio_data(audio_data):
+                    return 'audio', audio_data
 
         return None, None
 
+    def _get_cached_frame(self, packet):
+        # Return the cached image of a video packet that need not be
+        # decoded, or None.  The decoder must see every frame that later
+        # frames refer to, so cached frames are only served for a whole run
+        # from a keyframe up to the next known keyframe.  Runs are recorded
+        # in the cache as they are decoded.
+        cache = self._frame_cache
+        if packet.keyframe:
+            if self._decoded_run:
+                cache.put_run(id(self), self._decoded_run)
+            self._decoded_run = []
+            self._cached_run = cache.get_run(id(self), packet.timestamp)
+
+        if self._cached_run:
+            timestamp, image = self._cached_run.pop(0)
+            if timestamp == packet.timestamp:
+                return image
+            # The packets do not match the recorded run; decode from here.
+            self._cached_run = None
+            self._decoded_run = None
+
+        if self._decoded_run is not None:
+            self._decoded_run.append(packet.timestamp)
+        return None
+
+    def prefetch(self):
+        '''Read ahead until the first audio packet is decoded and the first
+        video packet is queued for decoding.
+
+        :since: pyglet 1.2
+        '''
+        while ((self._audio_stream and not self._buffered_audio_data) or
+               (self._video_stream and not self._video_packets)):
+            if self._video_stream and self._video_queue_full():
+                break
+            if self._audio_stream and self._audio_queue_full():
+                break
+            if not self._get_packet():
+                break
+            self._process_packet()
+
+        if (not _multithreaded and self._video_packets and 
+            self._video_packets[0].image == 0):
+            self._decode_video_packet(self._video_packets[0])
+
+    def _buffer_audio_data(self, audio_data):
+        # Queue decoded audio for get_audio_data, trimming any part that
+        # was already played as silence.  Return False if all of it was.
+        silence_timeend = self._silence_timeend
+        if silence_timeend is not None:
+            audio_format = self.audio_format
+            samples = int(round((silence_timeend - audio_data.timestamp) *
+                                audio_format.sample_rate))
+            bytes = samples * audio_format.bytes_per_sample
+            if bytes >= audio_data.length:
+                audio_data.release()
+                return False
+            if bytes > 0:
+                audio_data.consume(bytes, audio_format)
+            self._silence_timeend = None
+
+        self._buffered_audio_data.append(audio_data)
+        self._audio_queue_bytes += audio_data.length
+        self._audio_queue_time += audio_data.duration
+        return True
+
+    def _pop_audio_data(self):
+        audio_data = self._buffered_audio_data.pop(0)
+        self._audio_queue_bytes -= audio_data.length
+        self._audio_queue_time -= audio_data.duration
+        return audio_data
+
+    def _pop_video_packet(self):
+        packet = self._video_packets.pop(0)
+        self._video_queue_bytes -= packet.size + self._frame_buffers.size
+        return packet
+
+    def _audio_queue_full(self):
+        return (self._audio_queue_time > self.max_audio_queue_time or
+                self._audio_queue_bytes > self.max_audio_queue_bytes)
+
+    def _video_queue_full(self):
+        packets = self._video_packets
+        return packets and (
+            packets[-1].timestamp - packets[0].timestamp > 
+                self.max_video_queue_time or 
+            self._video_queue_bytes > self.max_video_queue_bytes)
+
+    def _create_silence(self, bytes):
+        audio_format = self.audio_format
+        bytes -= bytes % audio_format.bytes_per_sample
+        if audio_format.sample_size == 8:
+            data = '\x80' * bytes
+        else:
+            data = '\0' * bytes
+        duration = float(bytes) / audio_format.bytes_per_second
+        return AudioData(data, bytes, self._audio_timeend, duration, [])
+
+    def get_queue_stats(self):
+        '''Get the current depth of the read-ahead queues.
+
+        :rtype: dict
+        :return: Dictionary with keys:
+
+            ``audio_packets``, ``audio_bytes``, ``audio_time``
+                Decoded audio waiting to be returned by `get_audio_data`.
+            ``video_packets``, ``video_bytes``, ``video_time``
+                Video frames queued for decoding or display.
+            ``audio_stalls``
+                Number of times reading ahead for video was stopped
+                because the audio queue was full.
+            ``silence_inserted``
+                Number of times silence was returned because the video
+                queue reached `max_video_queue_bytes` and no audio was
+                available.
+            ``video_stalls``
+                Number of times reading ahead for video was stopped
+                because the video queue was full.
+
+        '''
+        stats = dict(self._queue_stats)
+        stats['audio_packets'] = len(self._buffered_audio_data)
+        stats['audio_bytes'] = self._audio_queue_bytes
+        stats['audio_time'] = self._audio_queue_time
+        if self.video_format:
+            packets = self._video_packets
+            stats['video_packets'] = len(packets)
+            stats['video_bytes'] = self._video_queue_bytes
+            if packets:
+                stats['video_time'] = \
+                    packets[-1].timestamp - packets[0].timestamp
+            else:
+                stats['video_time'] = 0.
+        else:
+            stats['video_packets'] = 0
+            stats['video_bytes'] = 0
+            stats['video_time'] = 0.
+        return stats
+
     def get_audio_data(self, bytes):
         try:
-            audio_data = self._buffered_audio_data.pop(0)
+            audio_data = self._pop_audio_data()
             audio_data_timeend = audio_data.timestamp + audio_data.duration
         except IndexError:
             audio_data = None
@@ -421,6 +1358,30 @@ class AVbinSource(StreamingSource):
         # associated video packets have been enqueued on the decoder thread.
         while not audio_data or (
             self._video_stream and self._video_timestamp < audio_data_timeend):
+            if (self._video_stream and self._video_queue_full() and
+                (audio_data or 
+                 self._video_queue_bytes > self.max_video_queue_bytes)):
+                # Backpressure: don't demux further ahead for video.  With
+                # no audio buffered, read on past the time limit to find
+                # some; only at the byte limit is silence returned.
+                self._queue_stats['video_stalls'] += 1
+                if not audio_data:
+                    self._queue_stats['silence_inserted'] += 1
+                    audio_data = self._create_silence(bytes)
+                    if _debug:
+                        print 'Video queue full, inserting silence at', \
+                            audio_data.timestamp
+                    audio_data_timeend = \
+                        audio_data.timestamp + audio_data.duration
+                    self._silence_timeend = audio_data_timeend
+                break
+
+            if audio_data and self._audio_queue_full():
+                # Backpressure: don't demux further ahead for video while
+                # the audio queue is full.
+                self._queue_stats['audio_stalls'] += 1
+                break
+
             if not self._get_packet():
                 break
 
@@ -429,7 +1390,7 @@ class AVbinSource(StreamingSource):
             if packet_type == 'video':
                 have_video_work = True
             elif not audio_data and packet_type == 'audio':
-                audio_data = self._buffered_audio_data.pop(0)
+                audio_data = self._pop_audio_data()
                 if _debug:
                     print 'Got requested audio packet at', audio_data.timestamp
                 audio_data_timeend = audio_data.timestamp + audio_data.duration
@@ -444,6 +1405,8 @@ class AVbinSource(StreamingSource):
                 print 'get_audio_data returning None'
             return None
 
+        self._audio_timeend = audio_data_timeend
+
         while self._events and self._events[0].timestamp <= audio_data_timeend:
             event = self._events.pop(0)
             if event.timestamp >= audio_data.timestamp:
@@ -464,9 +1427,11 @@ class AVbinSource(StreamingSource):
             audio_packet_ptr = ctypes.cast(packet.data, ctypes.c_void_p)
             audio_packet_size = packet.size
 
+            self._audio_lock.acquire()
             used = av.avbin_decode_audio(self._audio_stream,
                 audio_packet_ptr, audio_packet_size,
                 self._audio_buffer, size_out)
+            self._audio_lock.release()
 
             if used < 0:
                 self._audio_packet_size = 0
@@ -478,54 +1443,109 @@ class AVbinSource(StreamingSource):
             if size_out.value <= 0:
                 continue
 
-            # XXX how did this ever work?  replaced with copy below
-            # buffer = ctypes.string_at(self._audio_buffer, size_out)
-
-            # XXX to actually copy the data.. but it never used to crash, so
-            # maybe I'm  missing something
-            buffer = ctypes.create_string_buffer(size_out.value)
-            ctypes.memmove(buffer, self._audio_buffer, len(buffer))
-            buffer = buffer.raw
+            # The decode buffer is reused for the next packet, so copy the
+            # samples out once, into a pooled buffer that the driver reads
+            # from directly.  It returns to the pool on AudioData.release.
+            size = size_out.value
+            if self._audio_converter:
+                data = self._audio_converter.convert(
+                    ctypes.string_at(self._audio_buffer, size))
+                size = len(data)
+                if not size:
+                    continue
+                buffer = _audio_buffer_pool.copy(data, size)
+            else:
+                buffer = _audio_buffer_pool.copy(self._audio_buffer, size)
 
-            duration = float(len(buffer)) / self.audio_format.bytes_per_second
+            duration = float(size) / self.audio_format.bytes_per_second
             self._audio_packet_timestamp = \
                 timestamp = timestamp_from_avbin(packet.timestamp)
-            return AudioData(buffer, len(buffer), timestamp, duration, []) 
+            audio_data = AudioData(buffer.data, size, timestamp, duration, [])
+            audio_data._buffer = buffer
+            return audio_data
 
     def _decode_video_packet(self, packet):
-        width = self.video_format.width
-        height = self.video_format.height
-        
-        pitch = width * 3
-        buffer = (ctypes.c_uint8 * (pitch * height))()
-        result = av.avbin_decode_video(self._video_stream, 
-                                       packet.data, packet.size, 
-                                       buffer)
-        if result < 0:
-            image_data = None
-        else:
-            image_data = image.ImageData(width, height, 'RGB', buffer, pitch)
-            
-        packet.image = image_data
+        # Set the image of a queued packet; None if the packet was skipped
+        # or could not be decoded.  Waiters are notified however decoding
+        # ends, so that get_next_video_frame never waits on a failed job.
+        frame = None
+        try:
+            frame = self._decode_video_frame(packet)
+        finally:
+            self._condition.acquire()
+            if frame and packet.discard:
+                self._frame_buffers.release(frame._frame_buffer)
+                frame = None
+            packet.image = frame
+
+            if frame and self._frame_cache:
+                # The cache keeps the frame, so its buffer cannot be reused.
+                frame._frame_buffer = None
+                self._frame_cache.put(id(self), packet.timestamp, frame,
+                                      self._frame_buffers.size)
+
+            if _multithreaded:
+                # Notify get_next_video_frame() that another one is ready.
+                self._condition.notify()
+            self._condition.release()
 
-        if _multithreaded:
-            # Notify get_next_video_frame() that another one is ready.
+    def _decode_video_frame(self, packet):
+        # Decode a packet into a pooled frame buffer; return the image, or
+        # None if the packet is skipped or fails to decode.
+        try:
             self._condition.acquire()
-            self._condition.notify()
+            skip_decode = packet.skip_decode
             self._condition.release()
+            if skip_decode:
+                return None
+
+            width = self.video_format.width
+            height = self.video_format.height
+            pitch = width * 3
+            buffer = self._frame_buffers.get()
+            if self._output_yuv:
+                decode = av.avbin_decode_video_yuv420p
+            else:
+                decode = av.avbin_decode_video
+            if self._timings:
+                start = time.time()
+            self._video_lock.acquire()
+            try:
+                result = decode(self._video_stream, packet.data, packet.size, 
+                                buffer)
+            finally:
+                self._video_lock.release()
+            if self._timings:
+                self._timings.record('decode', time.time() - start)
+        finally:
+            packet.release()
+
+        if result < 0:
+            self._frame_buffers.release(buffer)
+            return None
+        elif self._output_yuv:
+            frame = image.YUVImageData(width, height, buffer)
+        else:
+            frame = image.ImageData(width, height, 'RGB', buffer, pitch)
+        frame._frame_buffer = buffer
+        return frame
 
     def _ensure_video_packets(self):
         '''Process packets until a video packet has been queued (and begun
-        decoding).  Return False if EOS.
+        decoding).  Return False if EOS, or if the audio queue is full and
+        no video packet is queued yet.
         '''
         if not self._video_packets:
             if _debug:
                 print 'No video packets...'
             # Read ahead until we have another video packet
-            if not self._get_packet():
-                return False
-            packet_type, _ = self._process_packet()
+            packet_type = None
             while packet_type != 'video':
+                if self._audio_stream and self._audio_queue_full():
+                    # Backpressure: the buffered audio must be played
+                    # before reading further.
+                    self._queue_stats['audio_stalls'] += 1
+                    return False
                 if not self._get_packet():
                     return False    
                 packet_type, _ = self._process_packet()
@@ -545,19 +1565,23 @@ class AVbinSource(StreamingSource):
             return
 
         if self._ensure_video_packets():
-            packet = self._video_packets.pop(0)
+            packet = self._pop_video_packet()
             
             if _multithreaded:
                 if _debug:
                     print 'Waiting for', packet
 
                 # Block until decoding is complete
+                if self._timings:
+                    start = time.time()
                 self._condition.acquire()
                 while packet.image == 0:
                     self._condition.wait()
                 self._condition.release()
+                if self._timings:
+                    self._timings.record('queue_wait', time.time() - start)
 
-            else:
+            elif packet.image == 0:
                 # when we are profiling, the main thread
                 # does all the work
                 self._decode_video_packet(packet)
@@ -566,6 +1590,97 @@ class AVbinSource(StreamingSource):
                 print 'Returning', packet
             return packet.image
 
+    def skip_video_frames(self, timestamp):
+        if not self.video_format:
+            return 0
+
+        if not self.skip_late_frames:
+            return super(AVbinSource, self).skip_video_frames(timestamp)
+
+        packets = []
+        while (self._ensure_video_packets() and
+               self._video_packets[0].timestamp < timestamp):
+            packets.append(self._pop_video_packet())
+
+        # Packets before the last discarded keyframe (or before the next
+        # packet, if that is a keyframe) are not needed by the decoder.
+        skip = 0
+        if self._video_packets and self._video_packets[0].keyframe:
+            skip = len(packets)
+        else:
+            for i, packet in enumerate(packets):
+                if packet.keyframe:
+                    skip = i
+
+        # The decoder thread drops the image (or skips decoding) if it has
+        # not got to a packet yet; otherwise release the finished frame
+        # here.
+        self._condition.acquire()
+        images = []
+        for i, packet in enumerate(packets):
+            packet.discard = True
+            packet.skip_decode = i < skip
+            images.append(packet.image)
+            packet.image = None
+        self._condition.release()
+
+        for packet, image_data in zip(packets, images):
+            if image_data:
+                self.release_video_frame(image_data)
+            elif image_data == 0 and not _multithreaded:
+                self._decode_video_packet(packet)
+        count = len(packets)
+
+        if _debug and count:
+            print 'Dropped %d late frames' % count
+        self.dropped_frames += count
+        return count
+
+    def _set_output_yuv(self, output_yuv):
+        if output_yuv and not self.can_output_yuv:
+            raise AVbinException('This version of AVbin cannot decode to YUV')
+        if self._frame_cache and output_yuv != self._output_yuv:
+            self._frame_cache.discard(id(self))
+            self._cached_run = None
+            self._decoded_run = None
+        self._output_yuv = output_yuv
+
+    output_yuv = property(lambda self: self._output_yuv, _set_output_yuv,
+                          doc='''Decode video frames to planar YUV.
+
+        **Requires a patched AVbin.**  No released AVbin provides the
+        ``avbin_decode_video_yuv420p`` entry point this needs (see
+        `can_output_yuv`); with stock AVbin, setting True raises
+        `AVbinException` and frames are always decoded to RGB.  The
+        default is False.
+
+        If True, `get_next_video_frame` returns `pyglet.image.YUVImageData`
+        images instead of RGB images, leaving colourspace conversion to the
+        consumer (or to the CPU, lazily, if the image is used as RGB).  This
+        halves the memory written per frame.  Set this before the source
+        is played; frames already decoded are not affected.
+
+        :type: bool
+        ''')
+
+    def get_locks(self):
+        '''Get the AVbin locks used by this source.
+
+        The locks are shared with other sources if `lock_mode` is
+        ``'global'``.
+
+        :rtype: list of `AVbinLock`
+        '''
+        return [lock for lock in 
+                (self._file_lock, self._video_lock, self._audio_lock)
+                if lock is not None]
+
+    def release_video_frame(self, image):
+        buffer = getattr(image, '_frame_buffer', None)
+        if buffer is not None:
+            image._frame_buffer = None
+            self._frame_buffers.release(buffer)
+
 av.avbin_init()
 if pyglet.options['debug_media']:
     _debug = True
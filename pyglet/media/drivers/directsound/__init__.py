@@ -262,6 +262,15 @@ class DirectSoundAudioPlayer(AbstractAudioPlayer):
         del self._timestamps[:]
         self.unlock()
 
+    def seek(self, timestamp):
+        # Hold the lock so that the worker does not refill while seeking.
+        self.lock()
+        try:
+            self.source_group.seek(timestamp)
+            self.clear()
+        finally:
+            self.unlock()
+
     def refill(self, write_size):
         self.lock()
         while write_size > 0:
@@ -368,10 +377,10 @@ class DirectSoundAudioPlayer(AbstractAudioPlayer):
         assert length == l1.value + l2.value
 
         if audio_data:
-            ctypes.memmove(p1, audio_data.data, l1.value)
+            ctypes.memmove(p1, audio_data.get_pointer(), l1.value)
             audio_data.consume(l1.value, self.source_group.audio_format)
             if l2.value:
-                ctypes.memmove(p2, audio_data.data, l2.value)
+                ctypes.memmove(p2, audio_data.get_pointer(), l2.value)
                 audio_data.consume(l2.value, self.source_group.audio_format)
         else:
             ctypes.memset(p1, 0, l1.value)
@@ -77,11 +77,29 @@ format_map = {
 }
 
 class OpenALWorker(MediaThread):
+    '''Thread that refills the buffers of playing players and dispatches
+    their events.
+
+    Rather than polling, the worker asks each player how long it can wait
+    before it next needs refilling or has an event due, and sleeps until
+    the earliest of these deadlines.  Every player that needs data is
+    refilled on each wake-up.
+
+    :Ivariables:
+        `wakeups` : int
+            Number of times the worker has woken.
+        `refills` : int
+            Number of player refills.
+        `underruns` : int
+            Number of times a playing player ran out of data.
+
+    '''
     # Minimum size to bother refilling (bytes)
     _min_write_size = 512
 
-    # Time to wait if there are players, but they're all full.
-    _nap_time = 0.05
+    # Shortest and longest time to wait while there are players.
+    _min_sleep_time = 0.002
+    _max_sleep_time = 0.5
 
     # Time to wait if there are no players.
     _sleep_time = None
@@ -89,41 +107,40 @@ class OpenALWorker(MediaThread):
     def __init__(self):
         super(OpenALWorker, self).__init__()
         self.players = set()
+        self.wakeups = 0
+        self.refills = 0
+        self.underruns = 0
 
     def run(self):
-        while True:
-            # This is a big lock, but ensures a player is not deleted while
-            # we're processing it -- this saves on extra checks in the
-            # player's methods that would otherwise have to check that it's
-            # still alive.
-            self.condition.acquire()
-
-            if self.stopped:
-                self.condition.release()
-                break
-            sleep_time = -1
-
-            # Refill player with least write_size
-            if self.players:
-                player = None
-                write_size = 0
-                for p in self.players:
-                    s = p.get_write_size()
-                    if s > write_size:
-                        player = p
-                        write_size = s
+        # This is a big lock, but ensures a player is not deleted while
+        # we're processing it -- this saves on extra checks in the player's
+        # methods that would otherwise have to check that it's still alive.
+        # Waiting on the condition releases it while asleep.
+        self.condition.acquire()
+        while not self.stopped:
+            self.wakeups += 1
 
+            sleep_time = self._sleep_time
+            for player in self.players:
+                write_size = player.get_write_size()
                 if write_size > self._min_write_size:
                     player.refill(write_size)
-                else:
-                    sleep_time = self._nap_time
-            else:
-                sleep_time = self._sleep_time
+                    self.refills += 1
 
-            self.condition.release()
+                delay = player.get_service_delay()
+                if delay is not None and (sleep_time is None or 
+                                          delay < sleep_time):
+                    sleep_time = delay
 
-            if sleep_time != -1:
-                self.sleep(sleep_time)
+            if self.players:
+                if sleep_time is None:
+                    sleep_time = self._max_sleep_time
+                sleep_time = min(max(sleep_time, self._min_sleep_time),
+                                 self._max_sleep_time)
+            if _debug:
+                print 'OpenALWorker sleep', sleep_time
+            self.condition.wait(sleep_time)
+        self.condition.release()
 
     def add(self, player):
         self.condition.acquire()
@@ -138,6 +155,24 @@ class OpenALWorker(MediaThread):
         self.condition.notify()
         self.condition.release()
 
+    def get_stats(self):
+        '''Get the worker's counters.
+
+        :rtype: dict
+        :return: Dictionary with keys ``wakeups``, ``refills``,
+            ``underruns`` and ``players`` (the number of players currently
+            being serviced).
+        '''
+        self.condition.acquire()
+        stats = {
+            'wakeups': self.wakeups,
+            'refills': self.refills,
+            'underruns': self.underruns,
+            'players': len(self.players),
+        }
+        self.condition.release()
+        return stats
+
 class OpenALAudioPlayer(AbstractAudioPlayer):
     #: Minimum size of an OpenAL buffer worth bothering with, in bytes
     _min_buffer_size = 512
@@ -145,6 +180,14 @@ class OpenALAudioPlayer(AbstractAudioPlayer):
     #: Aggregate (desired) buffer size, in bytes
     _ideal_buffer_size = 44800
 
+    #: Refill once this many bytes of the buffer have played
+    _refill_size = 22400
+
+    #: Number of times playback ran out of data
+    underruns = 0
+
+    _pitch = 1.0
+
     def __init__(self, source_group, player):
         super(OpenALAudioPlayer, self).__init__(source_group, player)
         audio_format = source_group.audio_format
@@ -278,6 +321,15 @@ class OpenALAudioPlayer(AbstractAudioPlayer):
         context.unlock()
         self._lock.release()
 
+    def seek(self, timestamp):
+        # Hold the lock so that the worker does not refill while seeking.
+        self._lock.acquire()
+        try:
+            self.source_group.seek(timestamp)
+            self.clear()
+        finally:
+            self._lock.release()
+
     def _update_play_cursor(self):
         if not self._al_source:
             return
@@ -344,6 +396,27 @@ class OpenALAudioPlayer(AbstractAudioPlayer):
 
         return write_size
 
+    def get_service_delay(self):
+        '''Return the time until this player needs refilling or has an
+        event to dispatch, in seconds, or None if it needs neither.  The play
+        cursor must have been updated by `get_write_size`.
+        '''
+        self._lock.acquire()
+        cursors = []
+        if not self._eos:
+            cursors.append(self._write_cursor - self._ideal_buffer_size + 
+                           self._refill_size)
+        if self._events:
+            cursors.append(self._events[0][0])
+        play_cursor = self._play_cursor
+        self._lock.release()
+
+        if not cursors:
+            return None
+        bytes_per_second = self.source_group.audio_format.bytes_per_second * \
+            max(self._pitch, 0.01)
+        return max(0., (min(cursors) - play_cursor) / float(bytes_per_second))
+
     def refill(self, write_size):
         if _debug:
             print 'refill', write_size
@@ -370,11 +443,12 @@ class OpenALAudioPlayer(AbstractAudioPlayer):
             al.alGenBuffers(1, buffer)
             al.alBufferData(buffer, 
                             self._al_format,
-                            audio_data.data,
+                            audio_data.get_pointer(),
                             audio_data.length,
                             self.source_group.audio_format.sample_rate)
             al.alSourceQueueBuffers(self._al_source, 1, ctypes.byref(buffer)) 
             context.unlock()
+            audio_data.release()
 
             self._write_cursor += audio_data.length
             self._buffer_sizes.append(audio_data.length)
@@ -389,6 +463,8 @@ class OpenALAudioPlayer(AbstractAudioPlayer):
             if state.value != al.AL_PLAYING:
                 if _debug:
                     print 'underrun'
+                self.underruns += 1
+                context.worker.underruns += 1
                 al.alSourcePlay(self._al_source)
             context.unlock()
 
@@ -429,6 +505,7 @@ class OpenALAudioPlayer(AbstractAudioPlayer):
         context.unlock()
 
     def set_pitch(self, pitch):
+        self._pitch = max(0, pitch)
         context.lock()
         al.alSourcef(self._al_source, al.AL_PITCH, max(0, pitch))
         context.unlock()
@@ -487,6 +564,17 @@ class OpenALDriver(AbstractAudioDriver):
     def delete(self):
         self.worker.stop()
 
+    def get_stats(self):
+        '''Get refill and underrun counters of the driver's worker thread.
+
+        See `OpenALWorker.get_stats`.
+
+        :since: pyglet 1.2
+
+        :rtype: dict
+        '''
+        return self.worker.get_stats()
+
     def lock(self):
         self._lock.acquire()
 
@@ -10,7 +10,7 @@ import sys
 
 import lib_pulseaudio as pa
 from pyglet.media import AbstractAudioDriver, AbstractAudioPlayer, \
-    AbstractListener, MediaException, MediaEvent
+    AbstractListener, AudioRingBuffer, MediaException, MediaEvent
 
 import pyglet
 _debug = pyglet.options['debug_media']
@@ -170,8 +170,18 @@ class PulseAudioListener(AbstractListener):
         self._up_orientation = orientation
 
 class PulseAudioPlayer(AbstractAudioPlayer):
+    #: Time of audio decoded ahead of the stream, in seconds.  Decoding
+    #: happens on a separate thread; the stream's write callback only copies
+    #: out of this buffer.
+    #:
+    #: :since: pyglet 1.2
+    ring_buffer_time = 0.5
+
     _volume = 1.0
 
+    # Set when the write callback could not supply all the data requested.
+    _write_short = False
+
     def __init__(self, source_group, player):
         super(PulseAudioPlayer, self).__init__(source_group, player)
 
@@ -181,13 +191,17 @@ class PulseAudioPlayer(AbstractAudioPlayer):
         self._read_index_valid = False # True only if buffer has non-stale data
 
         self._clear_write = False
-        self._buffered_audio_data = None
         self._underflow_is_eos = False
         self._playing = False
 
         audio_format = source_group.audio_format
         assert audio_format
 
+        self._ring = AudioRingBuffer(source_group, 
+            int(self.ring_buffer_time * audio_format.bytes_per_second),
+            self._ring_filled)
+        self._ring.fill()
+
         # Create sample_spec
         sample_spec = pa.pa_sample_spec()
         if audio_format.sample_size == 8:
@@ -258,6 +272,7 @@ class PulseAudioPlayer(AbstractAudioPlayer):
             context.unlock()
 
         self.set_volume(self._volume)
+        self._ring.start()
 
         if _debug:
             print 'stream ready'
@@ -282,60 +297,25 @@ class PulseAudioPlayer(AbstractAudioPlayer):
                                                 self._success_cb_func, None)
             )
 
-        # Grab next audio packet, or leftovers from last callback.
-        if self._buffered_audio_data:
-            audio_data = self._buffered_audio_data
-            self._buffered_audio_data = None
-        else:
-            audio_data = self.source_group.get_audio_data(bytes)
-
-        seek_flag = pa.PA_SEEK_RELATIVE
-        if self._clear_write:
-            if _debug:
-                print 'seek PA_SEEK_RELATIVE_ON_READ'
-            seek_flag = pa.PA_SEEK_RELATIVE_ON_READ
-            self._clear_write = False
+        # Copy out of the ring buffer; the stream copies the data too.
+        length, timestamps, events = self._ring.read(bytes, self._write)
+        self._write_short = length < bytes and not self._ring.eos
 
-        # Keep writing packets until `bytes` is depleted
-        while audio_data and bytes > 0:
+        for offset, timestamp in timestamps:
+            self._timestamps.append((self._write_index + offset, timestamp))
+        for offset, event in events:
             if _debug:
-                print 'packet', audio_data.timestamp
-            if _debug and audio_data.events:
-                print 'events', audio_data.events
-            for event in audio_data.events:
-                event_index = self._write_index + event.timestamp * \
-                    self.source_group.audio_format.bytes_per_second
-                self._events.append((event_index, event))
-
-            consumption = min(bytes, audio_data.length)
-            
-            check(
-                pa.pa_stream_write(self.stream,
-                                   audio_data.data,
-                                   consumption,
-                                   pa.pa_free_cb_t(0),  # Data is copied
-                                   0,
-                                   seek_flag)
-            )
+                print 'event', event
+            self._events.append((self._write_index + offset, event))
 
-            seek_flag = pa.PA_SEEK_RELATIVE
+        if length:
             self._read_index_valid = True
-            self._timestamps.append((self._write_index, audio_data.timestamp))
-            self._write_index += consumption
+            self._write_index += length
             self._underflow_is_eos = False
-
             if _debug:
-                print 'write', consumption
-            if consumption < audio_data.length:
-                audio_data.consume(consumption, self.source_group.audio_format)
-                self._buffered_audio_data = audio_data
-                break
-
-            bytes -= consumption
-            if bytes > 0:
-                audio_data = self.source_group.get_audio_data(bytes) #XXX name change
+                print 'write', length
 
-        if not audio_data:
+        if self._ring.eos:
             # Whole source group has been written.  Any underflow encountered
             # after now is the EOS.
             self._underflow_is_eos = True
@@ -351,6 +331,47 @@ class PulseAudioPlayer(AbstractAudioPlayer):
 
         self._process_events()
 
+    def _write(self, address, length):
+        # After a clear, the first data written replaces whatever is still
+        # buffered in the stream; the flag is kept until that write is made.
+        seek_flag = pa.PA_SEEK_RELATIVE
+        if self._clear_write:
+            if _debug:
+                print 'seek PA_SEEK_RELATIVE_ON_READ'
+            seek_flag = pa.PA_SEEK_RELATIVE_ON_READ
+        check(
+            pa.pa_stream_write(self.stream,
+                               address,
+                               length,
+                               pa.pa_free_cb_t(0),  # Data is copied
+                               0,
+                               seek_flag)
+        )
+        if length:
+            self._clear_write = False
+
+    def _ring_filled(self):
+        # Called on the fill thread.  The stream does not ask for data again
+        # until it has played more, so make up a short write now.
+        if self._write_short and self.stream:
+            context.lock()
+            if self.stream:
+                self._write_cb(self.stream, 
+                               pa.pa_stream_writable_size(self.stream), None)
+            context.unlock()
+
+    def get_stats(self):
+        '''Get the fill level and underrun count of the ring buffer between
+        the decoder and the stream.
+
+        See `AudioRingBuffer.get_stats`.
+
+        :since: pyglet 1.2
+
+        :rtype: dict
+        '''
+        return self._ring.get_stats()
+
     def _underflow_cb(self, stream, data):
         self._process_events()
 
@@ -399,6 +420,7 @@ class PulseAudioPlayer(AbstractAudioPlayer):
         if not self.stream:
             return
 
+        self._ring.stop()
         context.lock()
         pa.pa_stream_disconnect(self.stream)
         context.unlock()
@@ -408,13 +430,26 @@ class PulseAudioPlayer(AbstractAudioPlayer):
     def clear(self):
         if _debug:
             print 'clear'
+        self._clear()
+
+    def seek(self, timestamp):
+        if _debug:
+            print 'seek'
+        self._clear(timestamp)
 
+    def _clear(self, timestamp=None):
+        # Discard buffered data, first seeking the source group to
+        # `timestamp` if it is not None.
         self._clear_write = True
         self._write_index = self._get_read_index()
         self._timestamps = []
         self._events = []
 
         context.lock()
+        if timestamp is None:
+            self._ring.clear()
+        else:
+            self._ring.seek(timestamp)
         self._read_index_valid = False
         context.sync_operation(
             pa.pa_stream_prebuf(self.stream, self._success_cb_func, None)
@@ -94,6 +94,15 @@ class SilentAudioPlayerPacketConsumer(AbstractAudioPlayer):
         del self._events[:]
         self._thread.condition.release()
 
+    def seek(self, timestamp):
+        # Hold the condition so that the worker does not read while seeking.
+        self._thread.condition.acquire()
+        try:
+            self.source_group.seek(timestamp)
+            self.clear()
+        finally:
+            self._thread.condition.release()
+
     def get_time(self):
         if _debug:
             print 'SilentAudioPlayer.get_time()'
@@ -178,8 +187,8 @@ class SilentAudioPlayerPacketConsumer(AbstractAudioPlayer):
                 for event in audio_data.events:
                     event.timestamp += audio_data.timestamp
                     events.append(event)
-                events.extend(audio_data.events)
                 bytes -= audio_data.length
+                audio_data.release()
 
             sleep_time = self._sleep_time
             if not self._playing:
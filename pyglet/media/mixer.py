@@ -0,0 +1,580 @@
+# ----------------------------------------------------------------------------
+# pyglet
+# Copyright (c) 2006-2008 Alex Holkner
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions 
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of pyglet nor the names of its
+#    contributors may be used to endorse or promote products
+#    derived from this software without specific prior written
+#    permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ----------------------------------------------------------------------------
+
+'''Software mixing of many players into a single driver stream.
+
+Each `Player` normally gets its own driver audio player: a PulseAudio
+stream, an OpenAL source or a DirectSound buffer.  When many sounds play at
+once (for example, short sound effects in a game) this can exhaust the
+driver's sources.  A `MixerBus` is an audio driver that instead sums any
+number of players into one stream of a real driver::
+
+    bus = mixer.MixerBus()
+    player = media.Player()
+    player.audio_driver = bus
+    player.queue(source)
+    player.play()
+
+Sources are converted to the bus's audio format (16-bit, with the bus's
+channel count and sample rate), scaled by the player's volume and
+resampled by its pitch.  The mixing is done a block at a time with the
+`audioop` module.  Positional audio properties are ignored.
+
+For short sounds that are played often, such as game sound effects, add
+them to a `SampleBank` on the bus instead of creating a player each time.
+
+Events (such as ``on_eos``) are delivered through the underlying driver, so
+are as accurately timed as for a player with its own stream.  Players start
+and stop at the next mixed block: a player started while the bus is playing
+is heard once the audio already buffered by the driver has played, and a
+paused player is heard until then.
+
+:since: pyglet 1.2
+'''
+
+__docformat__ = 'restructuredtext'
+__version__ = '$Id: $'
+
+import audioop
+import threading
+
+from pyglet.media import AbstractAudioDriver, AbstractAudioPlayer, \
+    AudioConverter, AudioData, AudioFormat, MediaEvent, get_audio_driver
+
+import pyglet
+_debug = pyglet.options['debug_media']
+
+class _ChannelEvent(MediaEvent):
+    # Event of a channel's source group, carried in the bus's audio data so
+    # that the driver times it; dispatched to the channel's player instead
+    # of the bus.
+    def __init__(self, timestamp, event, player):
+        super(_ChannelEvent, self).__init__(timestamp, event.event, 
+                                            *event.args)
+        self.player = player
+
+    def _sync_dispatch_to_player(self, player):
+        if self.player is not None:
+            MediaEvent._sync_dispatch_to_player(self, self.player)
+
+class MixerAudioPlayer(AbstractAudioPlayer):
+    '''Audio player that plays through a `MixerBus`.
+
+    Create instances with `MixerBus.create_audio_player`.
+
+    :Ivariables:
+        `bus` : `MixerBus`
+            The bus this player is mixed into.
+
+    '''
+    _volume = 1.0
+
+    def __init__(self, bus, source_group, player):
+        super(MixerAudioPlayer, self).__init__(source_group, player)
+        self.bus = bus
+        self._converter = AudioConverter(source_group.audio_format,
+                                         bus.audio_format)
+        self._playing = False
+        self._eos = False
+
+        # Converted audio not yet mixed.
+        self._pending = []
+        self._pending_bytes = 0
+
+        # Source group time of the next sample mixed, or None if not known.
+        self._position = None
+
+        # List of (bus time, source group time) of recently mixed blocks.
+        self._timestamps = []
+
+        # List of (bus time, MediaEvent) not yet mixed.
+        self._events = []
+
+    def play(self):
+        self.bus._lock.acquire()
+        self._playing = True
+        self.bus._lock.release()
+        self.bus._update_output()
+
+    def stop(self):
+        self.bus._lock.acquire()
+        self._playing = False
+        self.bus._lock.release()
+        self.bus._update_output()
+
+    def delete(self):
+        self.bus._remove(self)
+
+    def clear(self):
+        self.bus._lock.acquire()
+        self._clear()
+        self.bus._lock.release()
+
+    def seek(self, timestamp):
+        # Hold the bus lock so that the group is not mixed while seeked.
+        self.bus._lock.acquire()
+        try:
+            self.source_group.seek(timestamp)
+            self._clear()
+        finally:
+            self.bus._lock.release()
+
+    def _clear(self):
+        # Called with the bus lock held.
+        self._converter.reset()
+        self._pending = []
+        self._pending_bytes = 0
+        self._position = None
+        self._timestamps = []
+        self._events = []
+        self._eos = False
+
+    def get_time(self):
+        bus_time = self.bus._get_output_time()
+        self.bus._lock.acquire()
+        timestamps = self._timestamps
+        while len(timestamps) > 1 and timestamps[1][0] <= bus_time:
+            del timestamps[0]
+        if bus_time is None or not timestamps:
+            result = None
+        else:
+            start, position = timestamps[0]
+            result = position + max(0., bus_time - start) * self._converter.pitch
+            # Don't run past the end of the data mixed so far.
+            result = min(result, self._position)
+        self.bus._lock.release()
+        return result
+
+    def set_volume(self, volume):
+        self._volume = volume
+
+    def set_pitch(self, pitch):
+        self.bus._lock.acquire()
+        self._converter.set_pitch(pitch)
+        self.bus._lock.release()
+
+    def _fill(self, bytes, bus_time):
+        # Read and convert source data until `bytes` bytes are pending or
+        # the source group ends.  Called with the bus lock held.
+        bytes_per_second = float(self.bus.audio_format.bytes_per_second)
+        converter = self._converter
+        while self._pending_bytes < bytes and not self._eos:
+            start = bus_time + self._pending_bytes / bytes_per_second
+            request = converter.get_source_bytes(bytes - self._pending_bytes)
+            audio_data = self.source_group.get_audio_data(max(request, 1024))
+            if not audio_data:
+                self._eos = True
+                self._events.append((start, MediaEvent(0, 'on_eos')))
+                self._events.append(
+                    (start, MediaEvent(0, 'on_source_group_eos')))
+                break
+
+            if self._position is None:
+                self._position = audio_data.timestamp
+            for event in audio_data.events:
+                self._events.append(
+                    (start + event.timestamp / converter.pitch, event))
+            data = converter.convert(audio_data.get_string_data())
+            audio_data.release()
+            self._pending.append(data)
+            self._pending_bytes += len(data)
+
+    def _mix(self, bytes, bus_time):
+        # Return (data, events) for the block of `bytes` bytes starting at
+        # `bus_time`; data may be shorter at the end of the stream.  Called
+        # with the bus lock held.
+        self._fill(bytes, bus_time)
+
+        data = ''.join(self._pending)
+        data, rest = data[:bytes], data[bytes:]
+        self._pending = [rest]
+        self._pending_bytes = len(rest)
+
+        duration = float(bytes) / self.bus.audio_format.bytes_per_second
+        events = []
+        while self._events and self._events[0][0] < bus_time + duration:
+            event_time, event = self._events.pop(0)
+            events.append(_ChannelEvent(max(0., event_time - bus_time), 
+                                        event, self.player))
+
+        if data and self._position is not None:
+            self._timestamps.append((bus_time, self._position))
+            self._position += \
+                len(data) * self._converter.pitch / \
+                float(self.bus.audio_format.bytes_per_second)
+
+        if data and self._volume != 1.0:
+            data = audioop.mul(data, 2, self._volume)
+        return data, events
+
+class Sample(object):
+    '''Audio held in a `SampleBank`, already converted to the format of
+    the bank's bus.
+
+    :Ivariables:
+        `name` : str
+            Name of the sample in its bank.
+        `data` : str
+            16-bit samples in the bus's audio format.
+        `duration` : float
+            Length of the sample, in seconds.
+
+    '''
+    def __init__(self, name, data, duration):
+        self.name = name
+        self.data = data
+        self.duration = duration
+
+class Voice(object):
+    '''A sample playing on a `SampleBank`.
+
+    Voices are reused: once a voice has finished (or has been stolen for a
+    new sample) this object plays other samples, so do not keep references
+    to it for longer than needed.
+
+    :Ivariables:
+        `sample` : `Sample`
+            The sample being played.
+        `volume` : float
+            Volume of the voice; 1.0 is the sample's own volume.
+
+    '''
+    sample = None
+    volume = 1.0
+
+    def __init__(self):
+        self._offset = 0
+        self._done = True
+        # True while the voice is in its bus's list of voices.
+        self._mixing = False
+
+    playing = property(lambda self: not self._done,
+                       doc='''True until the sample has finished or the
+    voice has been stopped.
+
+    :type: bool
+    ''')
+
+    def stop(self):
+        '''Stop playing.  The voice is returned to its bank.'''
+        self._done = True
+
+    def _mix(self, bytes):
+        # Called with the bus lock held.
+        data = self.sample.data[self._offset:self._offset + bytes]
+        self._offset += bytes
+        if self._offset >= len(self.sample.data):
+            self._done = True
+        if self.volume != 1.0:
+            data = audioop.mul(data, 2, self.volume)
+        return data
+
+class SampleBank(object):
+    '''Set of short sounds that can be triggered with little overhead.
+
+    Sounds are decoded and converted to the bus's format when they are
+    added, and are played by a fixed pool of voices that are mixed directly
+    into the bus, without creating a `Player` or `SourceGroup` per sound.
+    When every voice is busy, the voice that started first is stolen.
+
+    Example::
+
+        bank = mixer.SampleBank(mixer.MixerBus())
+        bank.add('shot', pyglet.media.load('shot.wav', streaming=False))
+        bank.play('shot')
+
+    Samples play at their original pitch.
+
+    :since: pyglet 1.2
+
+    :Ivariables:
+        `bus` : `MixerBus`
+            Bus the samples are played on.
+        `triggers` : int
+            Number of times a sample has been played.
+        `steals` : int
+            Number of voices stolen from playing samples.
+
+    '''
+    def __init__(self, bus, max_voices=32):
+        '''Create a sample bank.
+
+        :Parameters:
+            `bus` : `MixerBus`
+                Bus to play samples on.
+            `max_voices` : int
+                Maximum number of samples playing at once.
+
+        '''
+        self.bus = bus
+        self.triggers = 0
+        self.steals = 0
+        self._samples = {}
+        self._free = [Voice() for i in range(max_voices)]
+        # Playing voices, oldest first.
+        self._active = []
+
+    def add(self, name, source):
+        '''Decode a source and add it to the bank.
+
+        :Parameters:
+            `name` : str
+                Name to play the sample by.
+            `source` : `Source`
+                Source to decode; it must have audio.  A `StaticSource`
+                can be added to several banks.
+
+        :rtype: `Sample`
+        '''
+        source = source._get_queue_source()
+        converter = AudioConverter(source.audio_format, self.bus.audio_format)
+        chunks = []
+        while True:
+            audio_data = source.get_audio_data(65536)
+            if not audio_data:
+                break
+            chunks.append(converter.convert(audio_data.get_string_data()))
+            audio_data.release()
+        data = ''.join(chunks)
+        duration = float(len(data)) / self.bus.audio_format.bytes_per_second
+        sample = self._samples[name] = Sample(name, data, duration)
+        return sample
+
+    def remove(self, name):
+        '''Remove a sample from the bank.  Voices playing it continue.'''
+        del self._samples[name]
+
+    def get_sample(self, name):
+        '''Get a sample by name.
+
+        :rtype: `Sample`
+        '''
+        return self._samples[name]
+
+    def play(self, name, volume=1.0):
+        '''Play a sample.
+
+        :Parameters:
+            `name` : str
+                Name of the sample.
+            `volume` : float
+                Volume to play the sample at.
+
+        :rtype: `Voice`
+        '''
+        sample = self._samples[name]
+        bus = self.bus
+        bus._lock.acquire()
+        if self._free:
+            voice = self._free.pop()
+        else:
+            voice = self._active.pop(0)
+            self.steals += 1
+        voice.sample = sample
+        voice.volume = volume
+        voice._offset = 0
+        voice._done = False
+        self._active.append(voice)
+        if not voice._mixing:
+            voice._mixing = True
+            bus._voices.append((voice, self))
+        self.triggers += 1
+        bus._lock.release()
+
+        bus._update_output()
+        return voice
+
+    def _release(self, voice):
+        # Called by the bus, with its lock held, when a voice has finished.
+        voice._mixing = False
+        if voice in self._active:
+            self._active.remove(voice)
+        self._free.append(voice)
+
+def _add_block(mix, data, bytes):
+    # Add a block of samples, padded to `bytes` bytes, to a mix.
+    if len(data) < bytes:
+        data += '\0' * (bytes - len(data))
+    if mix is None:
+        return data
+    return audioop.add(mix, data, 2)
+
+class MixerBus(AbstractAudioDriver):
+    '''Audio driver that mixes its players into a single stream of another
+    audio driver.
+
+    A bus is also the source group and player of the stream it plays to;
+    applications should only use it as an audio driver.
+
+    :Ivariables:
+        `audio_format` : `AudioFormat`
+            Format of the mixed stream.
+        `driver` : `AbstractAudioDriver`
+            Driver that plays the mixed stream.
+
+    '''
+
+    #: Maximum size of a mixed block, in seconds.  Smaller blocks reduce the
+    #: delay before a newly played sound is heard.
+    block_time = 0.025
+
+    def __init__(self, audio_format=None, driver=None):
+        '''Create a mixer bus.
+
+        :Parameters:
+            `audio_format` : `AudioFormat`
+                Format of the mixed stream.  The sample size must be 16.
+                Defaults to 16-bit stereo at 44100 Hz.
+            `driver` : `AbstractAudioDriver`
+                Driver to play the mixed stream; defaults to the driver
+                returned by `pyglet.media.get_audio_driver`.
+
+        '''
+        if audio_format is None:
+            audio_format = AudioFormat(channels=2, sample_size=16, 
+                                       sample_rate=44100)
+        if driver is None:
+            driver = get_audio_driver()
+        self.audio_format = audio_format
+        self.driver = driver
+
+        self._lock = threading.Lock()
+        # Held while starting or stopping the output, which may read from
+        # the bus (and so take `_lock`) before returning.
+        self._output_lock = threading.Lock()
+        self._channels = []
+        # List of (Voice, SampleBank) being mixed.
+        self._voices = []
+        self._output = None
+        self._output_playing = False
+
+        # Bus time of the next mixed block.
+        self._time = 0.
+
+    def create_audio_player(self, source_group, player):
+        player = MixerAudioPlayer(self, source_group, player)
+        self._lock.acquire()
+        self._channels.append(player)
+        self._lock.release()
+        return player
+
+    def get_listener(self):
+        return self.driver.get_listener()
+
+    def _remove(self, channel):
+        self._lock.acquire()
+        if channel in self._channels:
+            self._channels.remove(channel)
+        self._lock.release()
+        self._update_output()
+
+    def _update_output(self):
+        # Play the output stream while any player is playing.  Called from
+        # any thread.
+        self._output_lock.acquire()
+        try:
+            self._lock.acquire()
+            playing = bool(self._voices)
+            for channel in self._channels:
+                if channel._playing:
+                    playing = True
+            self._lock.release()
+
+            if playing and not self._output:
+                self._output = self.driver.create_audio_player(self, self)
+            if playing != self._output_playing:
+                self._output_playing = playing
+                if playing:
+                    self._output.play()
+                else:
+                    self._output.stop()
+        finally:
+            self._output_lock.release()
+
+    def dispatch_event(self, event_type, *args):
+        # Called with events of the output stream, as for a player.
+        if event_type == 'on_voices_finished':
+            self._update_output()
+
+    def _get_output_time(self):
+        if self._output:
+            return self._output.get_time()
+
+    def get_audio_data(self, bytes):
+        '''Mix the next block of audio.  Called by the output driver.
+
+        :rtype: `AudioData`
+        '''
+        audio_format = self.audio_format
+        block = int(self.block_time * audio_format.bytes_per_second)
+        bytes = min(bytes, block)
+        bytes -= bytes % audio_format.bytes_per_sample
+        bytes = max(bytes, audio_format.bytes_per_sample)
+
+        self._lock.acquire()
+        timestamp = self._time
+        mix = None
+        events = []
+        for channel in self._channels:
+            if not channel._playing:
+                continue
+            data, channel_events = channel._mix(bytes, timestamp)
+            events.extend(channel_events)
+            if data:
+                mix = _add_block(mix, data, bytes)
+
+        finished = []
+        for voice, bank in self._voices:
+            if not voice._done:
+                mix = _add_block(mix, voice._mix(bytes), bytes)
+            if voice._done:
+                finished.append((voice, bank))
+        for voice, bank in finished:
+            self._voices.remove((voice, bank))
+            bank._release(voice)
+
+        duration = float(bytes) / audio_format.bytes_per_second
+        self._time += duration
+        self._lock.release()
+
+        if finished:
+            # Once this block has been heard, stop the output if nothing
+            # else is playing.  The output driver dispatches the event on
+            # the main thread, where it is safe to stop the output.
+            events.append(MediaEvent(duration, 'on_voices_finished'))
+
+        if mix is None:
+            mix = '\0' * bytes
+        events.sort(key=lambda event: event.timestamp)
+        return AudioData(mix, bytes, timestamp, duration, events)
@@ -33,19 +33,116 @@
 # ----------------------------------------------------------------------------
 # $Id:$
 
+'''Sources that synthesise audio.
+
+Periodic waveforms are generated by computing a table of whole cycles
+once and then repeating it with string operations, so the cost per sample
+is that of a memory copy.  Envelopes and mixing are applied to blocks of
+samples with the `audioop` module.
+'''
+
 from pyglet.media import Source, AudioFormat, AudioData
 
-import ctypes
+import array
+import audioop
 import os
 import math
 
+class Envelope(object):
+    '''Base class for amplitude envelopes of procedural sources.
+
+    :since: pyglet 1.2
+    '''
+    def get_gain(self, time, duration):
+        '''Get the gain at a time.
+
+        :Parameters:
+            `time` : float
+                Time since the start of the source, in seconds.
+            `duration` : float
+                Duration of the source, in seconds.
+
+        :rtype: float
+        :return: Gain between 0 and 1.
+        '''
+        raise NotImplementedError('abstract')
+
+class FlatEnvelope(Envelope):
+    '''Constant gain.
+
+    :since: pyglet 1.2
+    '''
+    def __init__(self, amplitude=0.5):
+        self.amplitude = amplitude
+
+    def get_gain(self, time, duration):
+        return self.amplitude
+
+class LinearDecayEnvelope(Envelope):
+    '''Gain falling linearly from `peak` to zero over the source.
+
+    :since: pyglet 1.2
+    '''
+    def __init__(self, peak=1.0):
+        self.peak = peak
+
+    def get_gain(self, time, duration):
+        return self.peak * max(0., 1. - time / duration)
+
+class ADSREnvelope(Envelope):
+    '''Attack, decay, sustain and release envelope.
+
+    The gain rises linearly to 1 over `attack` seconds, falls to
+    `sustain_amplitude` over `decay` seconds, and falls to zero over the
+    last `release` seconds of the source.
+
+    :since: pyglet 1.2
+    '''
+    def __init__(self, attack, decay, release, sustain_amplitude=0.5):
+        self.attack = attack
+        self.decay = decay
+        self.release = release
+        self.sustain_amplitude = sustain_amplitude
+
+    def get_gain(self, time, duration):
+        sustain = self.sustain_amplitude
+        if time < self.attack:
+            gain = time / self.attack
+        elif time < self.attack + self.decay:
+            gain = 1. - (1. - sustain) * (time - self.attack) / self.decay
+        else:
+            gain = sustain
+        if time > duration - self.release:
+            gain = min(gain, 
+                       sustain * max(0., duration - time) / self.release)
+        return gain
+
 class ProceduralSource(Source):
-    def __init__(self, duration, sample_rate=44800, sample_size=16):
+    '''Base class for synthesised mono sources.
+
+    Subclasses implement `_generate_samples`, returning 16-bit samples,
+    which are shaped by the envelope and converted to the source's sample
+    size.  (Subclasses may instead override `_generate_data` to return data
+    in the source's format directly, in which case no envelope is applied.)
+
+    :Ivariables:
+        `envelope` : `Envelope`
+            Amplitude envelope, or None for full scale.  **Since:**
+            pyglet 1.2.
+
+    '''
+
+    #: Number of samples sharing one envelope gain.
+    _envelope_block = 32
+
+    def __init__(self, duration, sample_rate=44100, sample_size=16,
+                 envelope=None):
         self._duration = float(duration)
         self.audio_format = AudioFormat(
             channels=1,
             sample_size=sample_size,
             sample_rate=sample_rate)
+        self.envelope = envelope
 
         self._offset = 0
         self._bytes_per_sample = sample_size >> 3
@@ -55,7 +152,10 @@ class ProceduralSource(Source):
         if self._bytes_per_sample == 2:
             self._max_offset &= 0xfffffffe
 
-    def _get_audio_data(self, bytes):
+    def get_audio_data(self, bytes):
+        # Return whole samples only, so that the offset stays aligned.
+        bytes = max(bytes - bytes % self._bytes_per_sample, 
+                    self._bytes_per_sample)
         bytes = min(bytes, self._max_offset - self._offset)
         if bytes <= 0:
             return None
@@ -76,8 +176,35 @@ class ProceduralSource(Source):
 
         Return data as ctypes array or string.
         '''
+        samples = bytes // self._bytes_per_sample
+        start = offset // self._bytes_per_sample
+        data = self._generate_samples(samples, start)
+        if self.envelope:
+            data = self._apply_envelope(data, start)
+        if self._bytes_per_sample == 1:
+            data = audioop.bias(audioop.lin2lin(data, 2, 1), 1, 128)
+        return data
+
+    def _generate_samples(self, samples, start):
+        '''Generate `samples` 16-bit samples, beginning with sample index
+        `start`.
+
+        :rtype: str
+        '''
         raise NotImplementedError('abstract')
 
+    def _apply_envelope(self, data, start):
+        # Scale each block of samples by the gain at its start.
+        envelope = self.envelope
+        rate = float(self.audio_format.sample_rate)
+        block = self._envelope_block
+        block_bytes = block * 2
+        blocks = []
+        for i in range(0, len(data), block_bytes):
+            gain = envelope.get_gain((start + i // 2) / rate, self._duration)
+            blocks.append(audioop.mul(data[i:i + block_bytes], 2, gain))
+        return ''.join(blocks)
+
     def seek(self, timestamp):
         self._offset = int(timestamp * self._bytes_per_second)
 
@@ -89,93 +216,137 @@ class ProceduralSource(Source):
             self._offset &= 0xfffffffe
 
 class Silence(ProceduralSource):
-    def _generate_data(self, bytes, offset):
-        if self._bytes_per_sample == 1:
-            return '\127' * bytes
-        else:
-            return '\0' * bytes
+    def _generate_samples(self, samples, start):
+        return '\0' * (samples * 2)
 
 class WhiteNoise(ProceduralSource):
-    def _generate_data(self, bytes, offset):
-        return os.urandom(bytes)
+    def _generate_samples(self, samples, start):
+        return os.urandom(samples * 2)
 
-class Sine(ProceduralSource):
-    def __init__(self, duration, frequency=440, **kwargs):
-        super(Sine, self).__init__(duration, **kwargs)
-        self.frequency = frequency
-        
-    def _generate_data(self, bytes, offset):
-        if self._bytes_per_sample == 1:
-            start = offset
-            samples = bytes
-            bias = 127
-            amplitude = 127
-            data = (ctypes.c_ubyte * samples)()
-        else:
-            start = offset >> 1
-            samples = bytes >> 1
-            bias = 0
-            amplitude = 32767
-            data = (ctypes.c_short * samples)()
-        step = self.frequency * (math.pi * 2) / self.audio_format.sample_rate
-        for i in range(samples):
-            data[i] = int(math.sin(step * (i + start)) * amplitude + bias)
-        return data
+class _PeriodicSource(ProceduralSource):
+    # A waveform repeating at `frequency`.  Subclasses implement
+    # `_waveform`.
 
-class Saw(ProceduralSource):
     def __init__(self, duration, frequency=440, **kwargs):
-        super(Saw, self).__init__(duration, **kwargs)
+        super(_PeriodicSource, self).__init__(duration, **kwargs)
         self.frequency = frequency
-        
-    def _generate_data(self, bytes, offset):
-        # XXX TODO consider offset
-        if self._bytes_per_sample == 1:
-            samples = bytes
-            value = 127
-            max = 255
-            min = 0
-            data = (ctypes.c_ubyte * samples)()
-        else:
-            samples = bytes >> 1
-            value = 0
-            max = 32767
-            min = -32768
-            data = (ctypes.c_short * samples)()
-        step = (max - min) * 2 * self.frequency / self.audio_format.sample_rate
-        for i in range(samples):
-            value += step
-            if value > max:
-                value = max - (value - max)
-                step = -step
-            if value < min:
-                value = min - (value - min)
-                step = -step
-            data[i] = value
-        return data
+        self._table = None
 
-class Square(ProceduralSource):
-    def __init__(self, duration, frequency=440, **kwargs):
-        super(Square, self).__init__(duration, **kwargs)
-        self.frequency = frequency
-        
-    def _generate_data(self, bytes, offset):
-        # XXX TODO consider offset
-        if self._bytes_per_sample == 1:
-            samples = bytes
-            value = 0
-            amplitude = 255
-            data = (ctypes.c_ubyte * samples)()
+    def _waveform(self, phase):
+        # Value between -1 and 1 at `phase` (0 to 1) of a cycle.
+        raise NotImplementedError('abstract')
+
+    def _get_table(self):
+        # Whole cycles of the waveform as 16-bit samples.  The number of
+        # cycles is chosen so that the table length in samples is (as near
+        # as possible) an integer, so that it repeats without a click.
+        if self._table is None:
+            period = self.audio_format.sample_rate / float(self.frequency)
+            best = None
+            for cycles in range(1, max(1, int(self.frequency)) + 1):
+                length = max(1, int(round(cycles * period)))
+                error = abs(length - cycles * period)
+                if best is None or error < best[0]:
+                    best = error, cycles, length
+                if error < 1e-6:
+                    break
+            _, cycles, length = best
+
+            step = cycles / float(length)
+            waveform = self._waveform
+            self._table = array.array('h', 
+                [int(waveform((i * step) % 1.) * 32767) 
+                 for i in range(length)]).tostring()
+        return self._table
+
+    def _generate_samples(self, samples, start):
+        table = self._get_table()
+        begin = (start % (len(table) // 2)) * 2
+        end = begin + samples * 2
+        return (table * (end // len(table) + 1))[begin:end]
+
+class Sine(_PeriodicSource):
+    def _waveform(self, phase):
+        return math.sin(phase * math.pi * 2)
+
+class Saw(_PeriodicSource):
+    def _waveform(self, phase):
+        # Rises from zero, as a triangle.
+        if phase < 0.25:
+            return phase * 4
+        elif phase < 0.75:
+            return 2 - phase * 4
         else:
-            samples = bytes >> 1
-            value = -32768
-            amplitude = 65535
-            data = (ctypes.c_short * samples)()
-        period = self.audio_format.sample_rate / self.frequency / 2
-        count = 0
-        for i in range(samples):
-            count += 1
-            if count == period:
-                value = amplitude - value
-                count = 0
-            data[i] = value
-        return data
+            return phase * 4 - 4
+
+class Square(_PeriodicSource):
+    def _waveform(self, phase):
+        if phase < 0.5:
+            return -1.
+        return 1.
+
+class Mix(ProceduralSource):
+    '''Sum of several mono sources with the same sample rate.
+
+    The mix lasts as long as the longest source.  Samples are added with
+    saturation, so the volumes should usually sum to at most 1.
+
+    :since: pyglet 1.2
+    '''
+    def __init__(self, sources, volumes=None, sample_size=16, envelope=None):
+        '''Create a mix.
+
+        :Parameters:
+            `sources` : list of `Source`
+                Mono sources to mix; they must have the same sample rate and
+                be seekable.
+            `volumes` : list of float
+                Gain of each source.  Defaults to 1 for each source.
+            `sample_size` : int
+                Bits per sample of the mix.
+            `envelope` : `Envelope`
+                Envelope applied to the mix.
+
+        '''
+        sample_rate = sources[0].audio_format.sample_rate
+        for source in sources:
+            assert source.audio_format.channels == 1
+            assert source.audio_format.sample_rate == sample_rate
+        super(Mix, self).__init__(max([s.duration for s in sources]),
+            sample_rate, sample_size, envelope)
+        self.sources = [source._get_queue_source() for source in sources]
+        if volumes is None:
+            volumes = [1.] * len(sources)
+        self.volumes = volumes
+
+    def _generate_samples(self, samples, start):
+        mix = '\0' * (samples * 2)
+        for source, volume in zip(self.sources, self.volumes):
+            bytes_per_sample = source.audio_format.bytes_per_sample
+            chunks = []
+            size = 0
+            while size < samples * bytes_per_sample:
+                audio_data = source.get_audio_data(
+                    samples * bytes_per_sample - size)
+                if not audio_data:
+                    break
+                chunks.append(audio_data.get_string_data())
+                size += audio_data.length
+                audio_data.release()
+            if not chunks:
+                continue
+
+            data = ''.join(chunks)
+            if bytes_per_sample == 1:
+                data = audioop.lin2lin(audioop.bias(data, 1, -128), 1, 2)
+            if volume != 1.:
+                data = audioop.mul(data, 2, volume)
+            if len(data) < len(mix):
+                data += '\0' * (len(mix) - len(data))
+            mix = audioop.add(mix, data, 2)
+        return mix
+
+    def seek(self, timestamp):
+        super(Mix, self).seek(timestamp)
+        for source in self.sources:
+            source.seek(timestamp)
@@ -0,0 +1,394 @@
+# ----------------------------------------------------------------------------
+# pyglet
+# Copyright (c) 2006-2008 Alex Holkner
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions 
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of pyglet nor the names of its
+#    contributors may be used to endorse or promote products
+#    derived from this software without specific prior written
+#    permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ----------------------------------------------------------------------------
+
+
+'''Rendering of players to files, faster than real time.
+
+A `RenderDriver` is an audio driver that, instead of playing its players,
+writes their audio and video to files as quickly as they can be decoded.
+It needs no sound device or window::
+
+    driver = render.RenderDriver('out.pcm', 'out.rgb')
+    player = media.Player()
+    player.audio_driver = driver
+    player.queue(source)
+    player.play()
+    driver.render()
+    driver.close()
+
+Audio is written as raw PCM in the driver's `audio_format`, after the
+player's volume and pitch are applied.  Video frames are written as raw
+images, one after another, in the driver's `frame_format` with rows from
+top to bottom.
+
+Player events (``on_eos``, ``on_source_group_eos`` and ``on_player_eos``)
+are dispatched in order, during `RenderDriver.render`, at the point in the
+stream at which they would be heard; handlers may queue or seek, as they
+would during playback.  `Player.time` is the time rendered so far.
+
+:since: pyglet 1.2
+'''
+
+__docformat__ = 'restructuredtext'
+__version__ = '$Id: $'
+
+import audioop
+
+from pyglet.media import AbstractAudioDriver, AbstractAudioPlayer, \
+    AbstractListener, AudioConverter, MediaEvent
+
+import pyglet
+import pyglet.app
+_debug = pyglet.options['debug_media']
+
+class RenderAudioPlayer(AbstractAudioPlayer):
+    '''Audio player that renders through a `RenderDriver`.
+
+    Create instances with `RenderDriver.create_audio_player`.
+
+    :Ivariables:
+        `driver` : `RenderDriver`
+            The driver this player renders to.
+
+    '''
+    _volume = 1.0
+
+    def __init__(self, driver, source_group, player):
+        super(RenderAudioPlayer, self).__init__(source_group, player)
+        self.driver = driver
+        if source_group.audio_format:
+            if driver.audio_format is None:
+                driver.audio_format = source_group.audio_format
+            self._converter = AudioConverter(source_group.audio_format,
+                                             driver.audio_format)
+        else:
+            self._converter = None
+        self._playing = False
+
+        # True once all data is rendered and the EOS events dispatched.
+        self._eos = False
+
+        # Source group time rendered up to, or None if not known.
+        self._time = None
+
+        # When resampling the frame rate, index of the next output frame
+        # and data of the last video frame.
+        self._frame_index = None
+        self._frame = None
+
+    def play(self):
+        self._playing = True
+
+    def stop(self):
+        self._playing = False
+
+    def delete(self):
+        self.driver._remove(self)
+
+    def clear(self):
+        if self._converter:
+            self._converter.reset()
+        self._eos = False
+        self._time = None
+        self._frame_index = None
+        self._frame = None
+
+    def get_time(self):
+        return self._time
+
+    def set_volume(self, volume):
+        self._volume = volume
+
+    def set_pitch(self, pitch):
+        if self._converter:
+            self._converter.set_pitch(pitch)
+
+    def _render(self, duration):
+        # Render about `duration` seconds of output; return the length
+        # rendered, in seconds.
+        group = self.source_group
+        if not self._converter:
+            return self._render_video_only(duration)
+
+        audio_format = self.driver.audio_format
+        bytes = int(duration * audio_format.bytes_per_second)
+        bytes = self._converter.get_source_bytes(
+            max(bytes, audio_format.bytes_per_sample))
+        audio_data = group.get_audio_data(bytes)
+        if not audio_data:
+            self._render_video(None)
+            self._finish()
+            return 0.
+
+        data = self._converter.convert(audio_data.get_string_data())
+        end = audio_data.timestamp + audio_data.duration
+        events = audio_data.events
+        audio_data.release()
+
+        if self._volume != 1.0:
+            data = _scale(data, audio_format.sample_size, self._volume)
+        self.driver._write_audio(data)
+        self._time = end
+        self._render_video(end)
+        self._dispatch(events)
+        return len(data) / float(audio_format.bytes_per_second)
+
+    def _render_video_only(self, duration):
+        # Without audio, advance time by `duration` at a time until there
+        # are no more video frames.
+        group = self.source_group
+        if self._time is None:
+            self._time = group.get_next_video_timestamp()
+            if self._time is None:
+                self._finish()
+                return 0.
+        self._time += duration
+        self._render_video(self._time)
+        if group.get_next_video_timestamp() is None:
+            self._finish()
+        return duration
+
+    def _render_video(self, time):
+        # Write video frames earlier than `time`, or all remaining frames if
+        # `time` is None.
+        group = self.source_group
+        if not group.video_format:
+            return
+
+        frame_rate = self.driver.frame_rate
+        if not frame_rate:
+            while True:
+                ts = group.get_next_video_timestamp()
+                if ts is None or (time is not None and ts >= time):
+                    break
+                image = group.get_next_video_frame()
+                if image is not None:
+                    self.driver._write_frame(self._get_frame_data(image))
+                    group.release_video_frame(image)
+            return
+
+        # Write the latest frame at each output frame time, repeating or
+        # dropping frames.
+        if self._frame_index is None:
+            ts = group.get_next_video_timestamp()
+            if ts is None:
+                return
+            self._frame_index = int(round(ts * frame_rate))
+        while True:
+            frame_time = self._frame_index / float(frame_rate)
+            ts = group.get_next_video_timestamp()
+            if time is None:
+                if ts is None:
+                    break
+            elif frame_time >= time:
+                break
+            while ts is not None and ts <= frame_time:
+                image = group.get_next_video_frame()
+                if image is not None:
+                    self._frame = self._get_frame_data(image)
+                    group.release_video_frame(image)
+                ts = group.get_next_video_timestamp()
+            if self._frame is not None:
+                self.driver._write_frame(self._frame)
+            self._frame_index += 1
+
+    def _get_frame_data(self, image):
+        frame_format = self.driver.frame_format
+        image = image.get_image_data()
+        return image.get_data(frame_format, -image.width * len(frame_format))
+
+    def _finish(self):
+        self._eos = True
+        self._dispatch([MediaEvent(0, 'on_eos'),
+                        MediaEvent(0, 'on_source_group_eos')])
+
+    def _dispatch(self, events):
+        if not events:
+            return
+        for event in events:
+            if _debug:
+                print 'RenderAudioPlayer dispatching', event
+            event._sync_dispatch_to_player(self.player)
+        pyglet.app.platform_event_loop.dispatch_posted_events()
+
+def _scale(data, sample_size, volume):
+    if sample_size == 8:
+        data = audioop.mul(audioop.bias(data, 1, -128), 1, volume)
+        return audioop.bias(data, 1, 128)
+    return audioop.mul(data, 2, volume)
+
+class _RenderListener(AbstractListener):
+    def _set_volume(self, volume):
+        self._volume = volume
+
+    def _set_position(self, position):
+        self._position = position
+
+    def _set_forward_orientation(self, orientation):
+        self._forward_orientation = orientation
+
+    def _set_up_orientation(self, orientation):
+        self._up_orientation = orientation
+
+class RenderDriver(AbstractAudioDriver):
+    '''Audio driver that renders its players to files.
+
+    Nothing happens until `render` is called.  Players are rendered one at
+    a time, in the order in which they were started; to render several
+    players together, mix them with a `pyglet.media.mixer.MixerBus` whose
+    driver is this one.  Positional audio properties are ignored.
+
+    :Ivariables:
+        `audio_format` : `AudioFormat`
+            Format of the audio written; all source groups are converted to
+            it.  If None, the format of the first source group with audio
+            is used.
+        `frame_format` : str
+            Component format of video frames written, such as ``'RGB'``.
+        `frame_rate` : float
+            Number of video frames written per second of video, or None to
+            write each decoded frame once.
+        `time` : float
+            Length rendered so far, in seconds.
+        `frames` : int
+            Number of video frames written so far.
+
+    '''
+    offline = True
+
+    #: Length of audio rendered at a time, in seconds.  Events are
+    #: dispatched after each block.
+    block_time = 0.5
+
+    def __init__(self, audio_file=None, video_file=None, audio_format=None,
+                 frame_format='RGB', frame_rate=None):
+        '''Create a render driver.
+
+        :Parameters:
+            `audio_file` : str or file
+                Filename or file object to write audio to, or None to
+                discard the audio.
+            `video_file` : str or file
+                Filename or file object to write video frames to, or None
+                to discard the video.
+            `audio_format` : `AudioFormat`
+                Format of the audio written.  The sample size must be 8 or
+                16, and there must be 1 or 2 channels.
+            `frame_format` : str
+                Component format of video frames written.
+            `frame_rate` : float
+                Number of video frames to write per second, repeating or
+                dropping decoded frames as needed.  By default each decoded
+                frame is written once.
+
+        '''
+        self.audio_format = audio_format
+        self.frame_format = frame_format
+        self.frame_rate = frame_rate
+        self.time = 0.
+        self.frames = 0
+
+        self._players = []
+        self._listener = _RenderListener()
+        self._opened_files = []
+        self._audio_file = self._open(audio_file)
+        self._video_file = self._open(video_file)
+
+    def _open(self, file):
+        if isinstance(file, basestring):
+            file = open(file, 'wb')
+            self._opened_files.append(file)
+        return file
+
+    def create_audio_player(self, source_group, player):
+        player = RenderAudioPlayer(self, source_group, player)
+        self._players.append(player)
+        return player
+
+    def get_listener(self):
+        return self._listener
+
+    def _remove(self, player):
+        if player in self._players:
+            self._players.remove(player)
+
+    def render(self, duration=None):
+        '''Render players until none is left playing.
+
+        Players that loop must be stopped by an event handler, or
+        rendered for a limited duration.
+
+        :Parameters:
+            `duration` : float
+                Maximum length to render, in seconds.  The length rendered
+                may exceed this by a fraction of `block_time`.
+
+        :rtype: float
+        :return: Length rendered, in seconds.
+        '''
+        start = self.time
+        while duration is None or self.time - start < duration:
+            player = None
+            for p in self._players:
+                if p._playing and not p._eos:
+                    player = p
+                    break
+            if not player:
+                break
+
+            block_time = self.block_time
+            if duration is not None:
+                block_time = min(block_time, duration - (self.time - start))
+            self.time += player._render(block_time)
+        return self.time - start
+
+    def _write_audio(self, data):
+        if self._audio_file:
+            self._audio_file.write(data)
+
+    def _write_frame(self, data):
+        if self._video_file:
+            self._video_file.write(data)
+        self.frames += 1
+
+    def close(self):
+        '''Close the files opened by the driver.
+
+        Files passed to the driver as file objects are left open.
+        '''
+        for file in self._opened_files:
+            file.close()
+        self._opened_files = []
+        self._audio_file = None
+        self._video_file = None
@@ -49,6 +49,8 @@ __version__ = '$Id$'
 from pyglet.media import StreamingSource, AudioData, AudioFormat
 from pyglet.media import MediaFormatException
 
+import ctypes
+import mmap
 import struct
 import StringIO
 
@@ -180,6 +182,14 @@ class WaveForm(RIFFForm):
                 return chunk
 
 class WaveSource(StreamingSource):
+    '''A PCM WAVE file.
+
+    If the file is on disk, it is memory-mapped and the audio data returned
+    refers to the mapping instead of being read into new strings.
+    '''
+
+    _mmap = None
+
     def __init__(self, filename, file=None):
         if file is None:
             file = open(filename, 'rb')
@@ -219,18 +229,52 @@ class WaveSource(StreamingSource):
         self._offset = 0
         self._file.seek(self._start_offset)
 
+        self._mmap = self._map_file(file)
+        if self._mmap is not None:
+            # Don't trust the chunk length of a truncated file.
+            self._max_offset = min(self._max_offset,
+                                   len(self._mmap) - self._start_offset)
+
+    def _map_file(self, file):
+        # Return a copy-on-write mapping of the whole file, which ctypes
+        # arrays can refer to; or None if the file cannot be mapped.
+        try:
+            fileno = file.fileno()
+        except (AttributeError, IOError, ValueError):
+            return None
+
+        try:
+            return mmap.mmap(fileno, 0, access=mmap.ACCESS_COPY)
+        except (EnvironmentError, ValueError, OverflowError):
+            return None
+
+    def _get_view(self, offset, length):
+        # ctypes array referring to `length` bytes of sample data.
+        return (ctypes.c_char * length).from_buffer(self._mmap,
+            self._start_offset + offset)
+
     def get_audio_data(self, bytes):
         bytes = min(bytes, self._max_offset - self._offset)
-        if not bytes:
+        bytes -= bytes % self.audio_format.bytes_per_sample
+        if bytes <= 0:
             return None
 
-        data = self._file.read(bytes)
-        self._offset += len(data)
-
         timestamp = float(self._offset) / self.audio_format.bytes_per_second
         duration = float(bytes) / self.audio_format.bytes_per_second
 
-        return AudioData(data, len(data), timestamp, duration, [])
+        if self._mmap is not None:
+            data = self._get_view(self._offset, bytes)
+        else:
+            data = self._file.read(bytes)
+            bytes = len(data)
+        self._offset += bytes
+
+        return AudioData(data, bytes, timestamp, duration, [])
+
+    def _get_static_data(self):
+        if self._mmap is None or self._offset >= self._max_offset:
+            return None
+        return self._get_view(self._offset, self._max_offset - self._offset)
 
     def seek(self, timestamp):
         offset = int(timestamp * self.audio_format.bytes_per_second)
@@ -239,10 +283,8 @@ class WaveSource(StreamingSource):
         offset = min(max(offset, 0), self._max_offset)
 
         # Align to sample
-        if self.audio_format.bytes_per_sample == 2:
-            offset &= 0xfffffffe
-        elif self.audio_format.bytes_per_sample == 4:
-            offset &= 0xfffffffc
+        offset -= offset % self.audio_format.bytes_per_sample
 
-        self._file.seek(offset + self._start_offset)
+        if self._mmap is None:
+            self._file.seek(offset + self._start_offset)
         self._offset = offset
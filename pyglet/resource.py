@@ -577,8 +577,8 @@ class Loader(object):
         '''Load a sound or video resource.
 
         The meaning of `streaming` is as for `media.load`.  Compressed
-        sources cannot be streamed (that is, video and compressed audio
-        cannot be streamed from a ZIP archive).
+        media in a ZIP archive is copied to a temporary file before AVbin
+        opens it; see `media.load`.
 
         :Parameters:
             `name` : str
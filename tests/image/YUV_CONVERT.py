@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+'''Test that planar YUV 4:2:0 data converts back to the RGB frame it was
+made from, both with the CPU converter and through YUVImageData.
+
+No window is opened.
+'''
+
+__docformat__ = 'restructuredtext'
+__version__ = '$Id: $'
+
+import unittest
+
+from pyglet import image
+from pyglet.image import yuv
+
+# Colours of each 2x2 block; chroma is constant over a block, so 4:2:0
+# subsampling loses nothing.
+colours = [
+    (0, 0, 0), (255, 255, 255), (255, 0, 0), (0, 255, 0),
+    (0, 0, 255), (128, 128, 128), (255, 255, 0), (30, 200, 150),
+    (90, 40, 220),
+]
+
+def rgb_to_yuv(r, g, b):
+    # ITU-R BT.601, studio range.
+    r, g, b = r / 255., g / 255., b / 255.
+    y = 16 + 65.481 * r + 128.553 * g + 24.966 * b
+    u = 128 - 37.797 * r - 74.203 * g + 112.0 * b
+    v = 128 + 112.0 * r - 93.786 * g - 18.214 * b
+    return int(round(y)), int(round(u)), int(round(v))
+
+def make_frame(blocks_x, blocks_y):
+    # Return (width, height, rgb, yuv_data) of a frame of coloured blocks.
+    width, height = blocks_x * 2, blocks_y * 2
+    rgb = []
+    y_plane = []
+    u_plane = []
+    v_plane = []
+    for row in range(height):
+        for column in range(width):
+            colour = colours[(row // 2 * blocks_x + column // 2) % 
+                             len(colours)]
+            rgb.append(colour)
+            y_plane.append(chr(rgb_to_yuv(*colour)[0]))
+    for row in range(blocks_y):
+        for column in range(blocks_x):
+            colour = colours[(row * blocks_x + column) % len(colours)]
+            y, u, v = rgb_to_yuv(*colour)
+            u_plane.append(chr(u))
+            v_plane.append(chr(v))
+    return width, height, rgb, ''.join(y_plane + u_plane + v_plane)
+
+class TEST_CASE(unittest.TestCase):
+    def check_rgba(self, rgba, rgb):
+        self.assertEqual(len(rgba), len(rgb) * 4)
+        for i, colour in enumerate(rgb):
+            pixel = [ord(c) for c in rgba[i * 4:i * 4 + 4]]
+            for expected, actual in zip(colour, pixel[:3]):
+                self.assertTrue(abs(expected - actual) <= 2,
+                    'pixel %d: expected %r, got %r' % (i, colour, pixel))
+            self.assertEqual(pixel[3], 255)
+
+    def test_convert(self):
+        width, height, rgb, data = make_frame(3, 3)
+        y, u, v = yuv.get_planes(data, width, height)
+        self.check_rgba(yuv.yuv420p_to_rgba(width, height, y, u, v), rgb)
+
+    def test_odd_size(self):
+        # A 5x3 frame has 3x2 chroma samples; the last row and column of
+        # chroma cover a single luma row or column.
+        width, height = 5, 3
+        colour = colours[7]
+        y, u, v = rgb_to_yuv(*colour)
+        data = chr(y) * 15 + chr(u) * 6 + chr(v) * 6
+        self.assertEqual(yuv.get_plane_sizes(width, height), (3, 2, 27))
+        planes = yuv.get_planes(data, width, height)
+        self.check_rgba(yuv.yuv420p_to_rgba(width, height, *planes), 
+                        [colour] * 15)
+
+    def test_image_data(self):
+        width, height, rgb, data = make_frame(2, 1)
+        frame = image.YUVImageData(width, height, data)
+        self.assertEqual(frame.get_planes(), 
+                         yuv.get_planes(data, width, height))
+        self.check_rgba(frame.get_data('RGBA', width * 4), rgb)
+
+if __name__ == '__main__':
+    unittest.main()
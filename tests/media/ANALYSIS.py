@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+'''Test that analysing procedural sources measures their peak and RMS
+levels and waveform overview, with and without a known duration.
+
+No sound is played.
+'''
+
+import math
+import unittest
+
+from pyglet.media import AudioFormat, analysis, procedural
+
+class TEST_CASE(unittest.TestCase):
+    def test_sine(self):
+        levels = analysis.analyse(procedural.Sine(1.0, frequency=441), 
+                                  buckets=10)
+        self.assertAlmostEqual(levels.duration, 1.0, 3)
+        self.assertAlmostEqual(levels.peak, 1.0, 2)
+        self.assertAlmostEqual(levels.rms, math.sqrt(0.5), 2)
+        self.assertAlmostEqual(levels.rms_db, -3.01, 1)
+        self.assertEqual(len(levels.buckets), 10)
+        self.assertAlmostEqual(levels.bucket_duration, 0.1, 3)
+        for minimum, maximum, rms in levels.buckets:
+            self.assertTrue(minimum < -0.99)
+            self.assertTrue(maximum > 0.99)
+            self.assertAlmostEqual(rms, math.sqrt(0.5), 2)
+
+    def test_envelope(self):
+        envelope = procedural.LinearDecayEnvelope()
+        source = procedural.Square(1.0, sample_size=8, envelope=envelope)
+        levels = analysis.analyse(source, buckets=4)
+        maxima = [maximum for minimum, maximum, rms in levels.buckets]
+        self.assertEqual(len(maxima), 4)
+        self.assertEqual(maxima, sorted(maxima, reverse=True))
+        self.assertTrue(maxima[-1] < 0.3)
+
+    def test_silence(self):
+        levels = analysis.analyse(procedural.Silence(0.5))
+        self.assertEqual(levels.peak, 0.)
+        self.assertEqual(levels.rms, 0.)
+        self.assertEqual(levels.peak_db, float('-inf'))
+
+    def test_unknown_duration(self):
+        source = procedural.Sine(3.0)
+        analyser = analysis.AudioAnalyser(source.audio_format, buckets=8)
+        while True:
+            audio_data = source.get_audio_data(1001)
+            if not audio_data:
+                break
+            analyser.add(audio_data)
+        levels = analyser.get_result()
+        self.assertAlmostEqual(levels.duration, 3.0, 3)
+        self.assertTrue(8 <= len(levels.buckets) < 16)
+        total = sum([min(levels.bucket_duration, 
+                         levels.duration - i * levels.bucket_duration) 
+                     for i in range(len(levels.buckets))])
+        self.assertAlmostEqual(total, 3.0, 3)
+
+if __name__ == '__main__':
+    unittest.main()
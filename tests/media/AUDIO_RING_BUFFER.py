@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+'''Test that an audio ring buffer reads a source group through its fill
+thread and returns the data, timestamps and events in order, and that
+seeking the ring does not seek the source group while it is being read.
+
+No sound is played.
+'''
+
+import ctypes
+import time
+import unittest
+
+from pyglet import media
+from pyglet.media import procedural
+
+class SlowSilence(procedural.Silence):
+    # Records seeks that happen while audio data is being read.
+    reading = False
+    overlaps = 0
+
+    def get_audio_data(self, bytes):
+        self.reading = True
+        time.sleep(0.002)
+        data = super(SlowSilence, self).get_audio_data(bytes)
+        self.reading = False
+        return data
+
+    def seek(self, timestamp):
+        if self.reading:
+            self.overlaps += 1
+        super(SlowSilence, self).seek(timestamp)
+
+class TEST_CASE(unittest.TestCase):
+    def create_group(self, *sources):
+        group = media.SourceGroup(sources[0].audio_format, None)
+        for source in sources:
+            group.queue(source)
+        return group
+
+    def read_all(self, ring, bytes):
+        chunks = []
+        def write(address, length):
+            chunks.append(ctypes.string_at(address, length))
+        length, timestamps, events = ring.read(bytes, write)
+        data = ''.join(chunks)
+        self.assertEqual(len(data), length)
+        return data, timestamps, events
+
+    def test_read(self):
+        source = procedural.Sine(0.5, sample_rate=22050)
+        expected = procedural.Sine(0.5, sample_rate=22050).get_audio_data(
+            22050).get_string_data()
+        ring = media.AudioRingBuffer(self.create_group(source), 3000)
+
+        data = ''
+        while not ring.eos:
+            ring.fill()
+            chunk, timestamps, events = self.read_all(ring, 1234)
+            if chunk:
+                self.assertEqual(timestamps[0][0], 0)
+                self.assertTrue(abs(timestamps[0][1] - len(data) / 44100.) 
+                                < 1e-6)
+            data += chunk
+        self.assertEqual(data, expected)
+        self.assertEqual(ring.underruns, 0)
+
+    def test_fill_thread(self):
+        ring = media.AudioRingBuffer(self.create_group(
+            procedural.Silence(0.2, sample_rate=22050), 
+            procedural.Silence(0.2, sample_rate=22050)), 4410)
+        ring.start()
+        length = 0
+        eos = 0
+        start = time.time()
+        while not ring.eos:
+            self.assertTrue(time.time() - start < 5)
+            data, timestamps, events = self.read_all(ring, 882)
+            length += len(data)
+            eos += len([e for o, e in events if e.event == 'on_eos'])
+            time.sleep(0.01)
+        ring.stop()
+        self.assertEqual(length, 0.4 * 22050 * 2)
+        self.assertEqual(eos, 1)
+        self.assertEqual(ring.get_stats()['fill'], 0)
+
+    def test_seek(self):
+        source = SlowSilence(10.0, sample_rate=22050)
+        ring = media.AudioRingBuffer(self.create_group(source), 44100)
+        ring.start()
+        try:
+            for i in range(20):
+                time.sleep(0.005)
+                ring.seek(1.0)
+                self.assertEqual(ring.get_stats()['fill'], 0)
+        finally:
+            ring.stop()
+        self.assertEqual(source.overlaps, 0)
+
+        ring.fill()
+        data, timestamps, events = self.read_all(ring, 882)
+        self.assertTrue(abs(timestamps[0][1] - 1.0) < 1e-6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+'''Test that AVbinSource stops reading ahead for video when its audio queue
+is full, without discarding any audio, on a stream whose only video packet
+comes long after the audio (such as an MP3 with cover art); and that a gap
+in the audio of a badly interleaved stream does not shift later audio.
+
+The demuxer is replaced by a scripted packet sequence; no file is read.
+The test will be skipped if AVbin is not installed.
+'''
+
+import unittest
+
+from pyglet import media
+
+try:
+    from pyglet.media import avbin
+except ImportError:
+    avbin = None
+
+packet_time = 0.05
+packet_bytes = 8820
+video_packet_bytes = 1000
+
+class VideoPacket(object):
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+        self.size = video_packet_bytes
+        self.image = 0
+
+if avbin:
+    class ScriptedSource(avbin.AVbinSource):
+        # Demuxes a list of ('audio' or 'video', timestamp) packets.
+        def __init__(self, script):
+            self.audio_format = media.AudioFormat(1, 16, 44100)
+            self.video_format = media.VideoFormat(4, 2)
+            self._audio_stream = True
+            self._video_stream = True
+            self._events = []
+            self._video_timestamp = 0
+            self._buffered_audio_data = []
+            self._video_packets = []
+            self._audio_timeend = 0.
+            self._silence_timeend = None
+            self._audio_queue_bytes = 0
+            self._audio_queue_time = 0.
+            self._video_queue_bytes = 0
+            self._frame_buffers = media.VideoFrameBufferPool(0)
+            self._queue_stats = {
+                'audio_stalls': 0,
+                'silence_inserted': 0,
+                'video_stalls': 0,
+            }
+            self._script = script
+            self._index = 0
+
+        def __del__(self):
+            pass
+
+        def _get_packet(self):
+            return self._index < len(self._script)
+
+        def _process_packet(self):
+            packet_type, timestamp = self._script[self._index]
+            self._index += 1
+            if packet_type == 'video':
+                packet = VideoPacket(timestamp)
+                self._video_timestamp = timestamp
+                self._video_packets.append(packet)
+                self._video_queue_bytes += packet.size
+                return 'video', packet
+
+            audio_data = media.AudioData('\0' * packet_bytes, packet_bytes,
+                                         timestamp, packet_time, [])
+            if self._buffer_audio_data(audio_data):
+                return 'audio', audio_data
+            return None, None
+
+    def sparse_video_script(audio_packets):
+        # Audio packets, then one video packet.
+        return [('audio', i * packet_time) for i in range(audio_packets)] + \
+               [('video', audio_packets * packet_time)]
+
+    def audio_gap_script():
+        # Interleaved audio and video for 0.5 seconds, then the video of
+        # the next 2.5 seconds, then its audio.
+        script = []
+        for i in range(10):
+            script.append(('video', i * packet_time))
+            script.append(('audio', i * packet_time))
+        script.extend([('video', i * packet_time) for i in range(10, 60)])
+        script.extend([('audio', i * packet_time) for i in range(10, 60)])
+        return script
+
+class TEST_CASE(unittest.TestCase):
+    def test_no_audio_dropped(self):
+        if not avbin:
+            print 'AVbin is not installed, skipping test.'
+            return
+
+        source = ScriptedSource(sparse_video_script(100))
+        source.max_audio_queue_time = 1.0
+
+        # Looking for the video frame stops at the audio cap.
+        self.assertEqual(source.get_next_video_timestamp(), None)
+        stats = source.get_queue_stats()
+        self.assertTrue(stats['audio_stalls'] > 0)
+        self.assertTrue(stats['audio_time'] <= 1.0 + packet_time + 1e-6)
+
+        # All audio is returned in order, without gaps, and the video frame
+        # is then found.
+        timestamp = 0.
+        while True:
+            audio_data = source.get_audio_data(packet_bytes)
+            if audio_data is None:
+                break
+            self.assertAlmostEqual(audio_data.timestamp, timestamp)
+            timestamp += audio_data.duration
+            self.assertTrue(source.get_queue_stats()['audio_time'] <= 
+                            1.0 + packet_time + 1e-6)
+        self.assertAlmostEqual(timestamp, 100 * packet_time)
+        self.assertAlmostEqual(source.get_next_video_timestamp(), 
+                               100 * packet_time)
+
+    def play_audio(self, source):
+        # Read all audio, consuming video as it becomes due; return the end
+        # time of the audio, checking that it has no gaps.
+        timestamp = 0.
+        while True:
+            audio_data = source.get_audio_data(packet_bytes)
+            if audio_data is None:
+                break
+            self.assertAlmostEqual(audio_data.timestamp, timestamp)
+            timestamp += audio_data.duration
+            while (source._video_packets and 
+                   source._video_packets[0].timestamp < timestamp):
+                source._pop_video_packet()
+        return timestamp
+
+    def test_audio_gap(self):
+        if not avbin:
+            print 'AVbin is not installed, skipping test.'
+            return
+
+        # Demuxing continues past the time limit to find the audio.
+        source = ScriptedSource(audio_gap_script())
+        source.max_video_queue_time = 0.2
+        self.assertAlmostEqual(self.play_audio(source), 60 * packet_time)
+        self.assertEqual(source.get_queue_stats()['silence_inserted'], 0)
+
+    def test_audio_gap_byte_limit(self):
+        if not avbin:
+            print 'AVbin is not installed, skipping test.'
+            return
+
+        # Silence is returned at the byte limit; the audio found later is
+        # trimmed so that it still ends with the video.
+        source = ScriptedSource(audio_gap_script())
+        source.max_video_queue_time = 0.2
+        source.max_video_queue_bytes = 10 * video_packet_bytes
+        self.assertAlmostEqual(self.play_audio(source), 60 * packet_time)
+        self.assertTrue(source.get_queue_stats()['silence_inserted'] > 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+'''Test that a keyframe index keeps timestamps in order, finds the last
+keyframe at or before a time, and is saved and loaded only for unchanged
+media.
+
+No media is decoded; small temporary files stand in for the media.
+The test will be skipped if AVbin is not installed.
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from pyglet.media import avbin
+except ImportError:
+    avbin = None
+
+class TEST_CASE(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.media_filename = os.path.join(self.directory, 'media.avi')
+        self.index_filename = self.media_filename + '.keyframes'
+        self.write_file(self.media_filename, 'media')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_file(self, filename, data):
+        file = open(filename, 'w')
+        file.write(data)
+        file.close()
+
+    def create_index(self):
+        index = avbin.KeyframeIndex()
+        for timestamp in (4.0, 0.0, 2.0, 2.0, 6.5):
+            index.add(timestamp)
+        return index
+
+    def test_find(self):
+        if not avbin:
+            print 'AVbin is not installed, skipping test.'
+            return
+
+        index = self.create_index()
+        self.assertEqual(index.timestamps, [0.0, 2.0, 4.0, 6.5])
+        self.assertEqual(avbin.KeyframeIndex().find(1.0), None)
+        self.assertEqual(index.find(-1.0), None)
+        self.assertEqual(index.find(0.0), 0.0)
+        self.assertEqual(index.find(3.9), 2.0)
+        self.assertEqual(index.find(4.0), 4.0)
+        self.assertEqual(index.find(100.0), 6.5)
+
+    def test_save_load(self):
+        if not avbin:
+            print 'AVbin is not installed, skipping test.'
+            return
+
+        self.assertTrue(self.create_index().save(self.index_filename,
+                                                 self.media_filename))
+        index = avbin.KeyframeIndex()
+        self.assertTrue(index.load(self.index_filename, self.media_filename))
+        self.assertEqual(index.timestamps, [0.0, 2.0, 4.0, 6.5])
+        self.assertTrue(index.complete)
+
+    def test_changed_media(self):
+        if not avbin:
+            print 'AVbin is not installed, skipping test.'
+            return
+
+        self.create_index().save(self.index_filename, self.media_filename)
+
+        # Changed size.
+        self.write_file(self.media_filename, 'longer media')
+        index = avbin.KeyframeIndex()
+        self.assertFalse(index.load(self.index_filename, self.media_filename))
+        self.assertEqual(index.timestamps, [])
+        self.assertFalse(index.complete)
+
+        # Changed modification time.
+        self.create_index().save(self.index_filename, self.media_filename)
+        st = os.stat(self.media_filename)
+        os.utime(self.media_filename, (st.st_atime, st.st_mtime - 10))
+        self.assertFalse(avbin.KeyframeIndex().load(self.index_filename,
+                                                    self.media_filename))
+
+    def test_bad_header(self):
+        if not avbin:
+            print 'AVbin is not installed, skipping test.'
+            return
+
+        self.create_index().save(self.index_filename, self.media_filename)
+        lines = open(self.index_filename).read().splitlines()
+        lines[0] = 'pyglet keyframe index 0'
+        self.write_file(self.index_filename, '\n'.join(lines))
+        self.assertFalse(avbin.KeyframeIndex().load(self.index_filename,
+                                                    self.media_filename))
+
+        self.write_file(self.index_filename, '')
+        self.assertFalse(avbin.KeyframeIndex().load(self.index_filename,
+                                                    self.media_filename))
+
+    def test_missing_media(self):
+        if not avbin:
+            print 'AVbin is not installed, skipping test.'
+            return
+
+        index = self.create_index()
+        os.remove(self.media_filename)
+        self.assertFalse(index.save(self.index_filename, self.media_filename))
+        self.assertFalse(index.load(self.index_filename, self.media_filename))
+
+        # The index is still usable.
+        index.add(1.0)
+        self.assertEqual(index.find(1.5), 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
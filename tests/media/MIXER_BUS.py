@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+'''Test that a mixer bus plays several players through one silent driver
+stream.
+
+A tone at normal pitch and a tone twice as long at double pitch should both
+end after the same time (allowing for the silent driver's buffering), and
+sample bank voices should be stolen and returned.  No sound is played.
+'''
+
+import time
+import unittest
+
+import pyglet
+import pyglet.app
+from pyglet import media
+from pyglet.media import mixer, procedural
+
+class TEST_CASE(unittest.TestCase):
+    def create_player(self, bus, source):
+        group = media.SourceGroup(source.audio_format, None)
+        group.queue(source)
+        return bus.create_audio_player(group, None)
+
+    def test_convert(self):
+        source_format = media.AudioFormat(1, 8, 22050)
+        converter = mixer.AudioConverter(source_format, 
+            media.AudioFormat(2, 16, 44100))
+        data = converter.convert('\x80' * 2205)
+        self.assertTrue(abs(len(data) - 4410 * 4) <= 8)
+        self.assertEqual(data, '\0' * len(data))
+
+    def test_play(self):
+        bus = mixer.MixerBus(driver=media.get_silent_audio_driver())
+        player1 = self.create_player(bus, 
+            procedural.Sine(0.3, sample_rate=44100))
+        player2 = self.create_player(bus, 
+            procedural.Sine(0.6, sample_rate=22050, sample_size=8))
+        player2.set_pitch(2.0)
+        player2.set_volume(0.5)
+        player1.play()
+        player2.play()
+
+        start = time.time()
+        while (player1.get_time() or 0) < 0.29 or \
+              (player2.get_time() or 0) < 0.59:
+            self.assertTrue(time.time() - start < 5)
+            time.sleep(0.01)
+        self.assertTrue(0.2 < time.time() - start < 1.0)
+        self.assertTrue(player1._eos and player2._eos)
+
+        player1.delete()
+        player2.delete()
+        self.assertFalse(bus._output_playing)
+
+    def test_sample_bank(self):
+        bus = mixer.MixerBus(driver=media.get_silent_audio_driver())
+        bank = mixer.SampleBank(bus, max_voices=2)
+        bank.add('tone', procedural.Sine(2.0, sample_rate=44100))
+        voices = [bank.play('tone') for i in range(3)]
+        self.assertEqual(bank.triggers, 3)
+        self.assertEqual(bank.steals, 1)
+        self.assertTrue(voices[0] is voices[2])
+
+        for voice in voices:
+            voice.stop()
+
+        # The output stops by itself once the finished voices are heard.
+        start = time.time()
+        while len(bank._free) < 2 or bus._output_playing:
+            self.assertTrue(time.time() - start < 5)
+            time.sleep(0.01)
+            pyglet.app.platform_event_loop.dispatch_posted_events()
+
+if __name__ == '__main__':
+    unittest.main()
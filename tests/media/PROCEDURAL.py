@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+'''Test that procedural sources generate continuous waveforms across reads
+and seeks, and that envelopes and mixes shape them.
+
+No sound is played.
+'''
+
+import array
+import math
+import unittest
+
+from pyglet.media import procedural
+
+class TEST_CASE(unittest.TestCase):
+    def read(self, source, bytes):
+        chunks = []
+        while True:
+            audio_data = source.get_audio_data(bytes)
+            if not audio_data:
+                break
+            chunks.append(audio_data.get_string_data())
+        return ''.join(chunks)
+
+    def test_sine(self):
+        source = procedural.Sine(0.5, frequency=441.5)
+        data = self.read(source, 1 << 20)
+        samples = array.array('h', data)
+        self.assertEqual(len(samples), 22050)
+        for i in (0, 100, 22049):
+            expected = math.sin(2 * math.pi * 441.5 * i / 44100) * 32767
+            self.assertTrue(abs(samples[i] - expected) < 200)
+
+        source.seek(0)
+        self.assertEqual(self.read(source, 1002), data)
+        source.seek(0.25)
+        self.assertEqual(self.read(source, 1002), data[22050:])
+
+    def test_silence_8bit(self):
+        data = self.read(procedural.Silence(0.1, sample_size=8), 1000)
+        self.assertEqual(data, '\x80' * 4410)
+
+    def test_envelope(self):
+        source = procedural.Square(1.0, 
+            envelope=procedural.LinearDecayEnvelope(0.5))
+        samples = array.array('h', self.read(source, 4096))
+        self.assertTrue(16000 < max(samples[:1000]) < 16500)
+        self.assertTrue(max(samples[-100:]) < 200)
+
+    def test_mix(self):
+        mix = procedural.Mix([procedural.Sine(0.5), 
+                              procedural.Sine(1.0, sample_size=8)],
+                             [0.5, 0.25])
+        self.assertEqual(mix.duration, 1.0)
+        samples = array.array('h', self.read(mix, 4096))
+        self.assertEqual(len(samples), 44100)
+        self.assertTrue(max(samples[:22050]) > 20000)
+        self.assertTrue(max(samples[22050:]) < 9000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+'''Test that the PulseAudio player writes the first data after a seek with
+PA_SEEK_RELATIVE_ON_READ, even if its ring buffer was empty when the stream
+first asked for data.
+
+No stream is opened; writes are recorded instead of sent to the server.
+The test will be skipped if PulseAudio is not installed.
+'''
+
+import unittest
+
+from pyglet import media
+from pyglet.media import procedural
+
+try:
+    from pyglet.media.drivers import pulse
+except ImportError:
+    pulse = None
+
+class TEST_CASE(unittest.TestCase):
+    def create_player(self, source):
+        group = media.SourceGroup(source.audio_format, None)
+        group.queue(source)
+
+        # Set up only the state used by the write callback.
+        player = pulse.PulseAudioPlayer.__new__(pulse.PulseAudioPlayer)
+        player.source_group = group
+        player.stream = object()
+        player._events = []
+        player._timestamps = []
+        player._write_index = 0
+        player._read_index_valid = False
+        player._clear_write = False
+        player._underflow_is_eos = False
+        player._playing = False
+        player._ring = media.AudioRingBuffer(group, 8820)
+        return player
+
+    def test_seek_empty_ring(self):
+        if not pulse:
+            print 'PulseAudio is not installed, skipping test.'
+            return
+
+        flags = []
+        def pa_stream_write(stream, address, length, free_cb, offset, seek):
+            flags.append(seek)
+            return 0
+
+        pa = pulse.pa
+        old_write = pa.pa_stream_write
+        pa.pa_stream_write = pa_stream_write
+        try:
+            player = self.create_player(procedural.Silence(1.0))
+            player._ring.fill()
+            player._write_cb(player.stream, 4410, None)
+            self.assertEqual(flags, [pa.PA_SEEK_RELATIVE])
+
+            # As PulseAudioPlayer.seek does: the ring is left empty.
+            player._ring.seek(0.5)
+            player._clear_write = True
+            player._write_cb(player.stream, 4410, None)
+            self.assertEqual(len(flags), 1)
+
+            player._ring.fill()
+            player._write_cb(player.stream, 4410, None)
+            player._write_cb(player.stream, 4410, None)
+            self.assertEqual(flags[1:], [pa.PA_SEEK_RELATIVE_ON_READ,
+                                         pa.PA_SEEK_RELATIVE])
+        finally:
+            pa.pa_stream_write = old_write
+
+if __name__ == '__main__':
+    unittest.main()
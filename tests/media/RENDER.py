@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+'''Test that a render driver writes the audio and video of a player to
+files without pacing, and dispatches its events in order.
+
+No sound is played and no window is opened.
+'''
+
+import StringIO
+import unittest
+
+from pyglet import image
+from pyglet import media
+from pyglet.media import procedural, render
+
+class FrameSource(media.StreamingSource):
+    def __init__(self, frames):
+        self.video_format = media.VideoFormat(4, 2)
+        self.video_format.frame_rate = 10.
+        self._frames = frames
+        self._index = 0
+        self._duration = frames / 10.
+
+    def get_next_video_timestamp(self):
+        if self._index < self._frames:
+            return self._index / 10.
+
+    def get_next_video_frame(self):
+        data = chr(self._index) * 24
+        self._index += 1
+        return image.ImageData(4, 2, 'RGB', data, 12)
+
+class TEST_CASE(unittest.TestCase):
+    def create_player(self, driver):
+        events = []
+        player = media.Player()
+        player.audio_driver = driver
+        for name in ('on_eos', 'on_source_group_eos', 'on_player_eos'):
+            def handler(name=name):
+                events.append(name)
+            player.set_handler(name, handler)
+        return player, events
+
+    def test_audio(self):
+        audio_file = StringIO.StringIO()
+        driver = render.RenderDriver(audio_file)
+        player, events = self.create_player(driver)
+        player.queue(procedural.Sine(10.0))
+        player.queue(procedural.Square(5.0))
+        player.play()
+        self.assertEqual(audio_file.getvalue(), '')
+
+        self.assertAlmostEqual(driver.render(), 15.0, 3)
+        self.assertEqual(len(audio_file.getvalue()), 15 * 44100 * 2)
+        self.assertEqual(events, 
+            ['on_eos', 'on_eos', 'on_source_group_eos', 'on_player_eos'])
+        self.assertFalse(player.playing)
+
+        data = procedural.Sine(10.0).get_audio_data(1 << 24).get_string_data()
+        self.assertEqual(audio_file.getvalue()[:len(data)], data)
+
+    def test_duration_and_volume(self):
+        audio_file = StringIO.StringIO()
+        driver = render.RenderDriver(audio_file, 
+            audio_format=media.AudioFormat(2, 16, 22050))
+        player, events = self.create_player(driver)
+        player.volume = 0.
+        player.queue(procedural.Sine(2.0))
+        player.play()
+        self.assertAlmostEqual(driver.render(0.75), 0.75, 2)
+        self.assertAlmostEqual(player.time, 0.75, 2)
+        self.assertEqual(events, [])
+        self.assertAlmostEqual(driver.render(), 1.25, 2)
+        self.assertEqual(len(audio_file.getvalue()) // 4, 44100)
+        self.assertEqual(audio_file.getvalue().strip('\0'), '')
+
+    def test_video(self):
+        video_file = StringIO.StringIO()
+        driver = render.RenderDriver(video_file=video_file)
+        player, events = self.create_player(driver)
+        player.queue(FrameSource(5))
+        player.play()
+        driver.render()
+        self.assertEqual(driver.frames, 5)
+        self.assertEqual(video_file.getvalue(), 
+                         ''.join([chr(i) * 24 for i in range(5)]))
+        self.assertEqual(events[-1], 'on_player_eos')
+
+    def test_frame_rate(self):
+        video_file = StringIO.StringIO()
+        driver = render.RenderDriver(video_file=video_file, frame_rate=20)
+        player, events = self.create_player(driver)
+        player.queue(FrameSource(5))
+        player.play()
+        driver.render()
+        self.assertEqual(driver.frames, 10)
+        self.assertEqual(video_file.getvalue(), 
+                         ''.join([chr(i // 2) * 24 for i in range(10)]))
+
+if __name__ == '__main__':
+    unittest.main()
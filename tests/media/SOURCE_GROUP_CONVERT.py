@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+'''Test that a player queues sources of different audio formats in one
+source group, converting them to the format of the first.
+
+No sound is played.
+'''
+
+import array
+import unittest
+
+from pyglet import media
+from pyglet.media import procedural
+
+class TEST_CASE(unittest.TestCase):
+    def test_convert_surround(self):
+        converter = media.AudioConverter(media.AudioFormat(6, 16, 48000),
+                                         media.AudioFormat(2, 16, 48000))
+        data = converter.convert(array.array('h', [1000] * 60).tostring())
+        self.assertEqual(len(data), 40)
+        for sample in array.array('h', data):
+            self.assertTrue(abs(sample - 1000) <= 2)
+
+    def test_convert_float(self):
+        converter = media.AudioConverter(media.AudioFormat(1, 32, 44100),
+                                         media.AudioFormat(1, 16, 44100),
+                                         float_samples=True)
+        values = [0., -0., 1e-40, 0.5, -0.5, 1., -1., 3.9, -3.9]
+        expected = [0, 0, 0, 16383, -16383, 32767, -32767, 32767, -32767]
+        data = converter.convert(array.array('f', values).tostring())
+        for sample, value in zip(array.array('h', data), expected):
+            self.assertTrue(abs(sample - value) <= 2)
+
+        # Samples beyond the fast path's range are clamped.
+        values = [0.25, 5., -1e30, float('inf')]
+        expected = [8191, 32767, -32767, 32767]
+        data = converter.convert(array.array('f', values).tostring())
+        for sample, value in zip(array.array('h', data), expected):
+            self.assertTrue(abs(sample - value) <= 2)
+
+    def test_queue(self):
+        player = media.Player()
+        player.queue(procedural.Sine(0.1, sample_rate=44100))
+        player.queue(procedural.Sine(0.1, sample_rate=22050, sample_size=8))
+        self.assertEqual(len(player._groups), 1)
+
+        group = player._groups[0]
+        length = 0
+        eos = 0
+        while True:
+            data = group.get_audio_data(4096)
+            if data is None:
+                break
+            length += data.length
+            eos += len([e for e in data.events if e.event == 'on_eos'])
+        self.assertTrue(abs(length - 0.2 * 44100 * 2) <= 16)
+        self.assertEqual(eos, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+'''Test that a source group prefetches the next source on a background
+thread before the current source ends, and waits for the prefetch before
+changing source.  A prefetch that raises is reported without stopping the
+prefetch thread, and a source whose prefetch is slow is waited for with a
+warning.
+
+No sound is played.
+'''
+
+import StringIO
+import sys
+import threading
+import time
+import unittest
+
+from pyglet import media
+from pyglet.media import procedural
+
+class PrefetchSine(procedural.Sine):
+    prefetch_thread = None
+
+    def prefetch(self):
+        time.sleep(0.1)
+        self.prefetch_thread = threading.currentThread()
+
+class FailingSine(procedural.Sine):
+    def prefetch(self):
+        raise IOError('prefetch failed')
+
+class SlowSine(procedural.Sine):
+    prefetched = False
+
+    def prefetch(self):
+        time.sleep(0.2)
+        self.prefetched = True
+
+    def get_audio_data(self, bytes):
+        assert self.prefetched
+        return super(SlowSine, self).get_audio_data(bytes)
+
+class TEST_CASE(unittest.TestCase):
+    def play(self, sources, prefetch_timeout=None):
+        # Read the whole group, returning the sources played and stderr.
+        group = media.SourceGroup(sources[0].audio_format, None)
+        group.prefetch_time = 0.5
+        if prefetch_timeout is not None:
+            group.prefetch_timeout = prefetch_timeout
+        for source in sources:
+            group.queue(source)
+
+        played = []
+        stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()
+        try:
+            while True:
+                source = group.get_current_source()
+                if source not in played:
+                    played.append(source)
+                if not group.get_audio_data(4096):
+                    break
+            output = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        return played, output
+
+    def test_prefetch(self):
+        first = procedural.Sine(1.0)
+        second = PrefetchSine(1.0)
+        group = media.SourceGroup(first.audio_format, None)
+        group.prefetch_time = 0.5
+        group.queue(first)
+        group.queue(second)
+
+        while group.get_audio_data(4096).timestamp < 0.25:
+            self.assertTrue(group._prefetch is None)
+        while group.get_current_source() is first:
+            group.get_audio_data(4096)
+        self.assertTrue(second.prefetch_thread is not None)
+        self.assertTrue(second.prefetch_thread is not 
+                        threading.currentThread())
+
+    def test_prefetch_error(self):
+        first = procedural.Sine(1.0)
+        failing = FailingSine(1.0)
+        last = PrefetchSine(1.0)
+        played, output = self.play([first, failing, last])
+        self.assertEqual(played, [first, failing, last])
+        self.assertTrue('IOError: prefetch failed' in output)
+
+        # The prefetch thread survived the error.
+        self.assertTrue(last.prefetch_thread is not None)
+
+    def test_prefetch_timeout(self):
+        first = procedural.Sine(1.0)
+        slow = SlowSine(1.0)
+        last = procedural.Sine(1.0)
+        played, output = self.play([first, slow, last], 
+                                   prefetch_timeout=0.05)
+        self.assertEqual(played, [first, slow, last])
+        self.assertTrue('taking more than' in output)
+
+if __name__ == '__main__':
+    unittest.main()
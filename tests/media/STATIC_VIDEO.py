@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+'''Test that a static source stores the frames of a video source, in RGB
+or compressed, and that each queue source plays them independently.
+
+No window is opened.
+'''
+
+import unittest
+
+from pyglet import image
+from pyglet import media
+
+class FrameSource(media.StreamingSource):
+    def __init__(self, frames):
+        self.video_format = media.VideoFormat(4, 2)
+        self.video_format.frame_rate = 10.
+        self._frames = frames
+        self._index = 0
+
+    def get_next_video_timestamp(self):
+        if self._index < self._frames:
+            return self._index / 10.
+
+    def get_next_video_frame(self):
+        data = chr(self._index) * 24
+        self._index += 1
+        return image.ImageData(4, 2, 'RGB', data, 12)
+
+class PlanarFrameSource(FrameSource):
+    can_output_yuv = True
+    output_yuv = False
+
+    def get_next_video_frame(self):
+        # Grey frames: luma only varies.
+        data = chr(16 + self._index * 40) * 8 + '\x80' * 4
+        self._index += 1
+        return image.YUVImageData(4, 2, data)
+
+class TEST_CASE(unittest.TestCase):
+    def check_frames(self, source):
+        self.assertTrue(abs(source.duration - 0.5) < 1e-6)
+        player1 = source._get_queue_source()
+        player2 = source._get_queue_source()
+        for i in range(5):
+            self.assertEqual(player1.get_next_video_timestamp(), i / 10.)
+            frame = player1.get_next_video_frame()
+            self.assertEqual(frame.get_data('RGB', 12), chr(i) * 24)
+        self.assertEqual(player1.get_next_video_timestamp(), None)
+
+        self.assertEqual(player2.skip_video_frames(0.25), 3)
+        self.assertEqual(player2.get_next_video_frame().get_data('RGB', 12),
+                         chr(3) * 24)
+        player2.seek(0.1)
+        self.assertEqual(player2.get_next_video_timestamp(), 0.1)
+
+    def test_rgb(self):
+        source = media.StaticSource(FrameSource(5))
+        self.assertEqual(source._video_frames.size, 5 * 24)
+        self.check_frames(source)
+
+    def test_compressed(self):
+        source = media.StaticSource(FrameSource(5), compress_video=True)
+        self.check_frames(source)
+
+    def test_max_size(self):
+        self.assertRaises(media.MediaException, 
+                          media.StaticSource, FrameSource(5), 
+                          max_video_size=100)
+
+    def test_planar(self):
+        source = media.StaticSource(PlanarFrameSource(3), planar_video=True)
+        self.assertEqual(source._video_frames.size, 3 * 12)
+        player = source._get_queue_source()
+        for i in range(3):
+            frame = player.get_next_video_frame()
+            expected = int(round(i * 40 * 255 / 219.))
+            self.assertTrue(abs(ord(frame.get_data('RGB', 12)[0]) - 
+                                expected) <= 1)
+
+    def test_planar_unsupported(self):
+        self.assertRaises(media.MediaException, 
+                          media.StaticSource, FrameSource(5), 
+                          planar_video=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+'''Test that the video frame cache evicts the least recently used frames
+by size, and only serves a run of frames if every frame of it is cached.
+'''
+
+import unittest
+
+from pyglet import media
+
+class TEST_CASE(unittest.TestCase):
+    def test_lru(self):
+        cache = media.VideoFrameCache(300)
+        for i in range(3):
+            cache.put('a', i, 'frame%d' % i, 100)
+        self.assertEqual(cache.get('a', 0), 'frame0')
+        cache.put('a', 3, 'frame3', 100)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.get('a', 1), None)
+        self.assertEqual(cache.get('a', 0), 'frame0')
+        self.assertEqual(cache.size, 300)
+
+    def test_run(self):
+        cache = media.VideoFrameCache(1000)
+        for i in range(4):
+            cache.put('a', i, 'frame%d' % i, 100)
+        self.assertEqual(cache.get_run('a', 0), None)
+        cache.put_run('a', [0, 1, 2, 3])
+        self.assertEqual(cache.get_run('a', 0), 
+                         [(i, 'frame%d' % i) for i in range(4)])
+        self.assertEqual(cache.get_run('b', 0), None)
+
+    def test_partial_eviction(self):
+        cache = media.VideoFrameCache(500)
+        cache.put_run('a', [0, 1, 2])
+        cache.put_run('a', [3, 4, 5])
+        for i in range(6):
+            cache.put('a', i, 'frame%d' % i, 100)
+
+        # Frame 0 is evicted, so the first run cannot be served; the
+        # second run is still whole.
+        self.assertEqual(cache.get_run('a', 0), None)
+        self.assertEqual(cache.get_run('a', 3), 
+                         [(3, 'frame3'), (4, 'frame4'), (5, 'frame5')])
+
+        # Evicting a frame from the middle of a run also stops it being
+        # served, although its keyframe is still cached.
+        cache.get_run('a', 3)
+        cache.put('a', 6, 'frame6', 100)
+        cache.put('a', 7, 'frame7', 100)
+        self.assertEqual(cache.get('a', 1), None)
+        self.assertEqual(cache.get('a', 3), 'frame3')
+        cache.put('a', 8, 'frame8', 100)
+        cache.put('a', 9, 'frame9', 100)
+        self.assertEqual(cache.get('a', 3), 'frame3')
+        self.assertEqual(cache.get_run('a', 3), None)
+
+    def test_discard(self):
+        cache = media.VideoFrameCache(1000)
+        cache.put('a', 0, 'frame0', 100)
+        cache.put_run('a', [0])
+        cache.discard('a')
+        cache.put('a', 0, 'frame0', 100)
+        self.assertEqual(cache.get_run('a', 0), None)
+
+if __name__ == '__main__':
+    unittest.main()
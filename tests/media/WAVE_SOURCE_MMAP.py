@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+'''Test that a WAVE file on disk is memory-mapped, and that audio data and
+static sources refer to the mapping rather than copying it.
+
+No sound is played.
+'''
+
+import ctypes
+import os
+import struct
+import StringIO
+import tempfile
+import unittest
+
+from pyglet import media
+from pyglet.media import riff
+
+class TEST_CASE(unittest.TestCase):
+    def setUp(self):
+        self.samples = ''.join([struct.pack('<h', i) for i in range(4000)])
+        header = 'RIFF' + struct.pack('<I', 36 + len(self.samples)) + \
+            'WAVE' + 'fmt ' + \
+            struct.pack('<IHHIIHH', 16, 1, 1, 8000, 16000, 2, 16) + \
+            'data' + struct.pack('<I', len(self.samples))
+        fd, self.filename = tempfile.mkstemp('.wav')
+        os.write(fd, header + self.samples)
+        os.close(fd)
+
+    def tearDown(self):
+        try:
+            os.remove(self.filename)
+        except OSError:
+            # The mapping may keep the file open on Windows.
+            pass
+
+    def read(self, source, bytes):
+        chunks = []
+        while True:
+            audio_data = source.get_audio_data(bytes)
+            if not audio_data:
+                break
+            chunks.append(audio_data.get_string_data())
+        return ''.join(chunks)
+
+    def test_mapped(self):
+        source = riff.WaveSource(self.filename)
+        audio_data = source.get_audio_data(1000)
+        self.assertTrue(isinstance(audio_data.data, ctypes.Array))
+        self.assertEqual(audio_data.timestamp, 0.)
+        self.assertEqual(audio_data.get_string_data(), self.samples[:1000])
+        self.assertEqual(self.read(source, 999), self.samples[1000:])
+
+        source.seek(0.25)
+        self.assertEqual(source.get_audio_data(10).timestamp, 0.25)
+
+    def test_file_object(self):
+        source = riff.WaveSource(self.filename, 
+            StringIO.StringIO(open(self.filename, 'rb').read()))
+        self.assertEqual(self.read(source, 1000), self.samples)
+
+    def test_static(self):
+        static = media.StaticSource(riff.WaveSource(self.filename))
+        self.assertTrue(isinstance(static._data, ctypes.Array))
+        self.assertEqual(static.duration, 0.5)
+        queue_source = static._get_queue_source()
+        self.assertEqual(self.read(queue_source, 1001), self.samples)
+
+if __name__ == '__main__':
+    unittest.main()
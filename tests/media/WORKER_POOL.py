@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+'''Test that a worker pool runs the jobs of each channel in order, and
+keeps running other channels' jobs after a job raises an exception.
+'''
+
+import StringIO
+import sys
+import threading
+import unittest
+
+from pyglet import media
+
+class TEST_CASE(unittest.TestCase):
+    def setUp(self):
+        self.pool = media.WorkerPool(1)
+
+    def tearDown(self):
+        self.pool.stop()
+
+    def test_order(self):
+        results = []
+        done = threading.Event()
+        channel = self.pool.create_channel(max_jobs=2)
+        for i in range(10):
+            channel.put_job(lambda i=i: results.append(i))
+        channel.put_job(done.set)
+        done.wait(5)
+        self.assertEqual(results, range(10))
+
+    def test_failing_job(self):
+        def fail():
+            raise RuntimeError('decode failed')
+
+        done = threading.Event()
+        failing = self.pool.create_channel()
+        other = self.pool.create_channel()
+
+        stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()
+        try:
+            failing.put_job(fail)
+            other.put_job(done.set)
+            done.wait(5)
+        finally:
+            output = sys.stderr.getvalue()
+            sys.stderr = stderr
+
+        self.assertTrue(done.isSet())
+        self.assertTrue('decode failed' in output)
+
+        # The failing channel still runs later jobs.
+        done.clear()
+        failing.put_job(done.set)
+        done.wait(5)
+        self.assertTrue(done.isSet())
+        self.assertTrue(self.pool.condition.acquire(False))
+        self.pool.condition.release()
+
+if __name__ == '__main__':
+    unittest.main()
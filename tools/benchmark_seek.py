@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------------
+# pyglet
+# Copyright (c) 2006-2008 Alex Holkner
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions 
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of pyglet nor the names of its
+#    contributors may be used to endorse or promote products
+#    derived from this software without specific prior written
+#    permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ----------------------------------------------------------------------------
+
+
+'''Measure AVbin seek latency, with and without a keyframe index.
+
+Each seek is timed up to the first decoded video frame after it.
+'''
+
+__docformat__ = 'restructuredtext'
+__version__ = '$Id: $'
+
+import random
+import sys
+import time
+from optparse import OptionParser
+
+import pyglet
+pyglet.options['shadow_window'] = False
+from pyglet.media import avbin
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+def report(name, latencies):
+    latencies = [t * 1000 for t in latencies]
+    print '%-24s %5d seeks  p50 %7.2f ms  p95 %7.2f ms  max %7.2f ms' % (
+        name, len(latencies), percentile(latencies, 0.5), 
+        percentile(latencies, 0.95), max(latencies))
+
+def time_seek(source, timestamp):
+    start = time.time()
+    source.seek(timestamp)
+    source.get_next_video_frame()
+    return time.time() - start
+
+def random_seeks(source, count, seed):
+    rng = random.Random(seed)
+    return [time_seek(source, rng.uniform(0, source.duration))
+            for i in range(count)]
+
+def frame_steps(source, count):
+    # Seek to each next frame in turn, as Player.seek_next_frame does.
+    source.seek(source.duration / 3)
+    latencies = []
+    for i in range(count):
+        timestamp = source.get_next_video_timestamp()
+        if timestamp is None:
+            break
+        latencies.append(time_seek(source, timestamp))
+    return latencies
+
+def run(filename, options, indexed):
+    source = avbin.AVbinSource(filename)
+    if not source.video_format:
+        print >> sys.stderr, '%s has no video stream' % filename
+        sys.exit(1)
+
+    if indexed:
+        source.build_keyframe_index(options.step)
+        source._index_thread._thread.join()
+        print 'Indexed %d keyframes' % \
+            len(source.get_keyframe_index().timestamps)
+    else:
+        source.seek_decode_ahead_time = 0
+
+    suffix = indexed and ' (indexed)' or ''
+    report('random' + suffix, random_seeks(source, options.count, options.seed))
+    report('frame step' + suffix, frame_steps(source, options.count))
+    source.delete()
+
+if __name__ == '__main__':
+    usage = "usage: %prog [options] <filename>"
+    description = "Measure random seek and frame step latency of a video file."
+    parser = OptionParser(usage=usage, description=description)
+    parser.add_option("-n", "--count", dest="count", default=100, type="int",
+                      help="Number of seeks of each kind (default 100)")
+    parser.add_option("-s", "--step", dest="step", default=1.0, type="float",
+                      help="Keyframe probe interval in seconds (default 1.0)")
+    parser.add_option("--seed", dest="seed", default=0, type="int",
+                      help="Random seed for seek positions")
+    (options, args) = parser.parse_args()
+    if len(args) != 1:
+        parser.error("expected a single video filename")
+
+    run(args[0], options, False)
+    run(args[0], options, True)